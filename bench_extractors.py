@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Benchmarks for the extractors: PDF text backends and regex scaling.
+
+    python bench_extractors.py ~/corpus/*.pdf --repeat 3
+    python bench_extractors.py ~/corpus --check-only
+    python bench_extractors.py --adversarial
+    python bench_extractors.py ~/corpus --check-only --memprofile
+
+Corpus mode: for every backend in core.pdftext this reports pages/sec and
+documents/sec for text extraction. With --parallel the timing includes the
+page-range pool for large PDFs. It also checks that both extractors (contract
+and payslip) return the same fields whichever backend read the PDF. The
+pdfplumber backend is the reference. The exit code is 1 when any backend
+disagrees with it, so the script can gate switching the default backend.
+
+Adversarial mode: feeds the text parsers pathological inputs (repeated
+anchors without a match, long whitespace and digit runs, random keyword
+soup) at doubling sizes. It fails (exit 1) when doubling the text multiplies
+the parse time by more than --max-ratio (default 3: linear scaling gives 2,
+quadratic backtracking 4; the margin absorbs timing noise).
+
+--memprofile adds an untimed pass per backend that traces memory per PDF
+(text extraction plus both parsers) and reports peaks, growth across the
+corpus and the allocation sites that grew; see core.memprofile.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from core.extractors import parse_contract_text, parse_payslip_text
+from core.memprofile import MemoryProfiler
+from core.pdftext import BACKENDS, extract_pages
+
+REFERENCE = "pdfplumber"
+
+
+def collect(paths: List[Path]) -> List[Path]:
+    pdfs: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            pdfs.extend(sorted(path.rglob("*.pdf")))
+        else:
+            pdfs.append(path)
+    return pdfs
+
+
+def extracted_fields(text: str) -> Dict[str, Dict[str, str]]:
+    return {"contract": parse_contract_text(text), "payslip": parse_payslip_text(text)}
+
+
+# Units repeated to the target size; each one is an anchor some pattern scans
+# forward from, without the text that would complete the match.
+ADVERSARIAL_UNITS = {
+    "effect-from": "With effect from ",
+    "maanedsloen": "månedsløn uden beløb ",
+    "bonus-line": "bonus ",
+    "fra-uden-til": "Fra: 1 ",
+    "salary-spaces": "salary" + " " * 40,
+    "whitespace": " ",
+    "newlines": "\n",
+    "digit-run": "1.",
+    "clause-numbers": "1.1.1.1 ",
+    "cvr-cpr": "CVR   CPR   ",
+    "and-lines": "AND\n",
+}
+FUZZ_TOKENS = (
+    "With effect from", "the Employee is employed", "salary", "of", "DKK", "kr.", "per month",
+    "månedsløn", "årsløn", "bonus", "Fra:", "Til:", "Navn:", "løn", "netto", "A-skat", "CVR",
+    "CPR:", "AND", "Section", "Confidentiality", "1.2.3", "12.345,67", "2024", "\n", "  ", ",",
+)
+
+
+def _fuzz_text(size: int, seed: int = 7) -> str:
+    rnd = random.Random(seed)
+    parts: List[str] = []
+    length = 0
+    while length < size:
+        token = rnd.choice(FUZZ_TOKENS)
+        parts.append(token)
+        parts.append(" ")
+        length += len(token) + 1
+    return "".join(parts)[:size]
+
+
+def _parse_seconds(text: str) -> float:
+    started = time.perf_counter()
+    parse_contract_text(text)
+    parse_payslip_text(text)
+    return time.perf_counter() - started
+
+
+def run_adversarial(sizes: List[int], max_ratio: float) -> int:
+    cases: Dict[str, Callable[[int], str]] = {
+        name: (lambda size, unit=unit: (unit * (size // len(unit) + 1))[:size])
+        for name, unit in ADVERSARIAL_UNITS.items()
+    }
+    cases["fuzz"] = _fuzz_text
+
+    failures = 0
+    print(f"{'case':<16}" + "".join(f"{size:>12,}" for size in sizes) + "   worst x2 ratio")
+    for name, make in cases.items():
+        # best of three smooths out scheduler noise on small inputs
+        timings = [min(_parse_seconds(make(size)) for _ in range(3)) for size in sizes]
+        ratios = [
+            later / earlier * (sizes[i] / sizes[i + 1]) * 2
+            for i, (earlier, later) in enumerate(zip(timings, timings[1:]))
+            if earlier > 0.0005
+        ]
+        worst = max(ratios, default=0.0)
+        flag = "  SUPER-LINEAR" if worst > max_ratio else ""
+        failures += bool(flag)
+        print(f"{name:<16}" + "".join(f"{t * 1000:>10.1f}ms" for t in timings) + f"   {worst:5.2f}{flag}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the PDF text backends and the extractor regexes.")
+    parser.add_argument("paths", nargs="*", type=Path, help="PDF files or directories (searched recursively)")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="default: all")
+    parser.add_argument("--repeat", type=int, default=1, help="timed passes over the corpus per backend")
+    parser.add_argument("--check-only", action="store_true", help="skip the timing passes")
+    parser.add_argument("--parallel", action="store_true",
+                        help="time through extract_pages() so large PDFs use the page-range pool")
+    parser.add_argument("--adversarial", action="store_true", help="run the pathological-input scaling suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[25_000, 50_000, 100_000, 200_000],
+                        help="text sizes (characters) for --adversarial")
+    parser.add_argument("--max-ratio", type=float, default=3.0,
+                        help="largest tolerated time ratio when the text size doubles")
+    parser.add_argument("--memprofile", action="store_true",
+                        help="trace memory per PDF and backend in an extra untimed pass")
+    args = parser.parse_args()
+
+    if args.adversarial:
+        sys.exit(1 if run_adversarial(sorted(args.sizes), args.max_ratio) else 0)
+
+    pdfs = collect(args.paths)
+    if not pdfs:
+        parser.error("no PDFs found")
+    backends = args.backend or list(BACKENDS)
+    if REFERENCE not in backends:
+        backends.insert(0, REFERENCE)
+
+    # One untimed pass per backend doubles as the accuracy check.
+    texts = {name: {pdf: "\n".join(BACKENDS[name](str(pdf))) for pdf in pdfs} for name in backends}
+
+    mismatches = 0
+    for pdf in pdfs:
+        reference = extracted_fields(texts[REFERENCE][pdf])
+        for name in backends:
+            if name == REFERENCE:
+                continue
+            candidate = extracted_fields(texts[name][pdf])
+            for kind in ("contract", "payslip"):
+                if candidate[kind] != reference[kind]:
+                    mismatches += 1
+                    keys = sorted(set(candidate[kind]) | set(reference[kind]))
+                    print(f"MISMATCH {pdf} [{name}, {kind}]")
+                    for key in keys:
+                        if candidate[kind].get(key) != reference[kind].get(key):
+                            print(f"  {key}: {reference[kind].get(key)!r} != {candidate[kind].get(key)!r}")
+
+    print(f"Accuracy: {len(pdfs)} PDFs, {mismatches} field-set mismatch(es) against {REFERENCE}")
+
+    if args.memprofile:
+        for name in backends:
+            profiler = MemoryProfiler()
+            for _ in range(args.repeat):
+                for pdf in pdfs:
+                    with profiler.document(pdf.name):
+                        extracted_fields("\n".join(BACKENDS[name](str(pdf))))
+            profiler.report(f"Memory [{name}]")
+            profiler.stop()
+
+    if not args.check_only:
+        for name in backends:
+            page_count = 0
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                for pdf in pdfs:
+                    if args.parallel:
+                        page_count += len(extract_pages(str(pdf), name))
+                    else:
+                        page_count += len(BACKENDS[name](str(pdf)))
+            elapsed = time.perf_counter() - started
+            documents = len(pdfs) * args.repeat
+            print(
+                f"{name:<12} {elapsed:8.2f}s  {page_count / elapsed:8.1f} pages/s  "
+                f"{documents / elapsed:8.1f} docs/s"
+            )
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
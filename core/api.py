@@ -1,29 +1,36 @@
 import os
-from typing import Dict, Generator, Iterable
+from typing import Dict, Iterable, Optional
 
-import requests
 import streamlit as st
 
-BASE_URL = "https://api.app.legis365.com/public/v1.0"
+from . import http
+
+
+def _api_key() -> str:
+    try:
+        key = st.secrets.get("LEGIS_API_KEY", "")
+    except FileNotFoundError:
+        # No secrets.toml (scripts, load tests): fall back to the environment
+        key = ""
+    return key or os.getenv("LEGIS_API_KEY", "")
 
 
 def has_api_key() -> bool:
-    return bool(st.secrets.get("LEGIS_API_KEY", "") or os.getenv("LEGIS_API_KEY", ""))
+    return bool(_api_key())
 
 
 def get_headers() -> Dict[str, str]:
-    key = st.secrets.get("LEGIS_API_KEY", "") or os.getenv("LEGIS_API_KEY", "")
-    return {"Accept": "application/json", "X-API-Key": key}
+    return {"Accept": "application/json", "X-API-Key": _api_key()}
 
 
-def paged(path: str, page_size: int = 500) -> Iterable[dict]:
+def paged(path: str, page_size: int = 500, params: Optional[Dict[str, str]] = None) -> Iterable[dict]:
     page = 1
+    headers = get_headers()
     while True:
-        response = requests.get(
-            f"{BASE_URL}{path}",
-            headers=get_headers(),
-            params={"page": page, "pageSize": page_size},
-            timeout=60,
+        response = http.get(
+            path,
+            headers=headers,
+            params={**(params or {}), "page": page, "pageSize": page_size},
         )
         response.raise_for_status()
         payload = response.json()
@@ -32,6 +39,8 @@ def paged(path: str, page_size: int = 500) -> Iterable[dict]:
             break
         for item in items:
             yield item
-        if len(items) < page_size:
+        # A server may cap pageSize: a short page is only the last one when
+        # measured against the size it echoes; otherwise ask until a page is empty
+        if payload.get("pageSize") and len(items) < payload["pageSize"]:
             break
         page += 1
@@ -1,7 +1,38 @@
-from typing import Tuple
+"""Login for the Streamlit app.
 
+Every widget interaction reruns the script, so the expensive parts are done
+once per process and only repeated when the secrets change:
+
+* The ``[auth]`` secrets are converted to plain dicts, and plain-text
+  passwords are bcrypt-hashed, once per secrets version. The version is the
+  mtimes of the files in Streamlit's ``secrets.files``. Authenticate then
+  finds the passwords hashed already and does not re-hash them.
+* A session that logged in carries an HMAC of (username, expiry, secrets
+  version). Its reruns only check that HMAC. They build no Authenticate,
+  render no cookie component, and skip the 0.7 s pause of the login widget.
+* A new session (page reload) is first checked against the re-authentication
+  cookie in the request headers (``st.context.cookies``). This is the same
+  HS256 token streamlit-authenticator sets, verified with the signature key.
+
+bcrypt runs only when a user submits the login form, or when secrets with
+plain-text passwords are loaded. The bcrypt package releases the GIL while
+hashing, so other sessions keep rerunning meanwhile.
+"""
+import hashlib
+import hmac
+import os
+import time
+from copy import deepcopy
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Optional, Set, Tuple
+
+import jwt
 import streamlit as st
 import streamlit_authenticator as stauth
+from streamlit_authenticator.utilities.hasher import Hasher
+
+SESSION_KEY = "_auth_session"
 
 
 def _to_plain(obj):
@@ -12,21 +43,135 @@ def _to_plain(obj):
     return obj
 
 
-def build_authenticator() -> stauth.Authenticate:
+@dataclass(frozen=True)
+class AuthConfig:
+    version: Tuple
+    credentials: Dict[str, Any]
+    cookie_name: str
+    signature_key: str
+    cookie_expiry_days: float
+
+
+_config: Optional[AuthConfig] = None
+_config_lock = Lock()
+# Re-authentication cookies of sessions that logged out in this process
+_revoked: Set[str] = set()
+
+
+def _secrets_version() -> Tuple:
+    paths = st.config.get_option("secrets.files") or []
+    version = []
+    for path in paths:
+        try:
+            version.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            continue
+    return tuple(version)
+
+
+def _load_config(version: Tuple) -> AuthConfig:
     auth_conf = st.secrets.get("auth", {})
     credentials = _to_plain(auth_conf.get("credentials", {}))
-    cookie_name = auth_conf.get("cookie_name", "contractgen")
-    signature_key = auth_conf.get("signature_key", "CHANGE_ME_SECRET")
-    cookie_expiry_days = auth_conf.get("cookie_expiry_days", 7)
+    users = credentials.setdefault("usernames", {})
+    for user in users.values():
+        password = user.get("password")
+        # Private Hasher API of the pinned streamlit-authenticator (see requirements.txt)
+        if password and not Hasher._is_hash(password):
+            user["password"] = Hasher._hash(password)
+    credentials["usernames"] = {name.lower(): user for name, user in users.items()}
+    return AuthConfig(
+        version=version,
+        credentials=credentials,
+        cookie_name=auth_conf.get("cookie_name", "contractgen"),
+        signature_key=auth_conf.get("signature_key", "CHANGE_ME_SECRET"),
+        cookie_expiry_days=float(auth_conf.get("cookie_expiry_days", 7)),
+    )
+
+
+def auth_config() -> AuthConfig:
+    """The parsed ``[auth]`` secrets, rebuilt when a secrets file changes."""
+    global _config
+    version = _secrets_version()
+    config = _config
+    if config is not None and config.version == version:
+        return config
+    # Built outside the lock: hashing plain-text passwords must not hold up other sessions
+    fresh = _load_config(version)
+    with _config_lock:
+        if _config is None or _config.version != version:
+            _config = fresh
+        return _config
+
+
+def build_authenticator() -> stauth.Authenticate:
+    config = auth_config()
+    # Authenticate records login state in the credentials it is given; keep the cached copy clean
     return stauth.Authenticate(
-        credentials,
-        cookie_name,
-        signature_key,
-        cookie_expiry_days,
+        deepcopy(config.credentials),
+        config.cookie_name,
+        config.signature_key,
+        config.cookie_expiry_days,
     )
 
 
-def require_login(location: str = "main") -> Tuple[stauth.Authenticate, str, str]:
+def _session_mac(config: AuthConfig, username: str, expires: float) -> str:
+    message = f"{username}|{expires}|{config.version!r}".encode("utf-8")
+    return hmac.new(config.signature_key.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def _remember_session(config: AuthConfig, username: str, name: str) -> None:
+    expires = time.time() + config.cookie_expiry_days * 86400
+    st.session_state[SESSION_KEY] = (username, name, expires, _session_mac(config, username, expires))
+
+
+def _valid_session(config: AuthConfig) -> Optional[Tuple[str, str]]:
+    session = st.session_state.get(SESSION_KEY)
+    if not session:
+        return None
+    username, name, expires, mac = session
+    if (
+        expires > time.time()
+        and username in config.credentials["usernames"]
+        and hmac.compare_digest(mac, _session_mac(config, username, expires))
+    ):
+        return name, username
+    del st.session_state[SESSION_KEY]
+    return None
+
+
+def _cookie_login(config: AuthConfig) -> Optional[Tuple[str, str]]:
+    if st.session_state.get("logout"):
+        return None
+    token = st.context.cookies.get(config.cookie_name)
+    if not token or token in _revoked:
+        return None
+    try:
+        claims = jwt.decode(token, config.signature_key, algorithms=["HS256"])
+    except jwt.PyJWTError:
+        return None
+    # The claims streamlit-authenticator 0.3.2 writes; a new version may rename them
+    username = claims.get("username")
+    user = config.credentials["usernames"].get(username)
+    if user is None or claims.get("exp_date", 0) <= time.time():
+        return None
+    st.session_state.update(username=username, name=user.get("name"), authentication_status=True, logout=None)
+    return user.get("name"), username
+
+
+def require_login(location: str = "main") -> Tuple[Optional[stauth.Authenticate], str, str]:
+    """(authenticator, name, username); the authenticator is None when the session was re-validated cheaply.
+
+    Pass the authenticator on to :func:`logout`, which builds one if needed.
+    """
+    config = auth_config()
+    known = _valid_session(config)
+    if known is not None:
+        return None, known[0], known[1]
+    known = _cookie_login(config)
+    if known is not None:
+        _remember_session(config, known[1], known[0])
+        return None, known[0], known[1]
+
     authenticator = build_authenticator()
     name, auth_status, username = authenticator.login(location=location)
 
@@ -37,8 +182,17 @@ def require_login(location: str = "main") -> Tuple[stauth.Authenticate, str, str
         st.info("Indtast brugernavn og adgangskode for at fortsætte")
         st.stop()
 
+    _remember_session(config, username, name)
     return authenticator, name, username
 
 
-def logout(authenticator: stauth.Authenticate, label: str = "Log ud") -> None:
-    authenticator.logout(label)
+def logout(authenticator: Optional[stauth.Authenticate], label: str = "Log ud") -> None:
+    if st.button(label, key="logout_button"):
+        config = auth_config()
+        token = st.context.cookies.get(config.cookie_name)
+        if token:
+            # The cookie component may not get to delete it before the page reloads
+            with _config_lock:
+                _revoked.add(token)
+        st.session_state.pop(SESSION_KEY, None)
+        (authenticator or build_authenticator()).logout(location="unrendered")
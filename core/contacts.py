@@ -0,0 +1,122 @@
+from collections import Counter
+from concurrent.futures import Future
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from cachetools import LRUCache, TTLCache
+
+from .derived import fold, search_key
+from .records import Contact, load_contacts
+
+Fetcher = Callable[[str], Optional[dict]]
+
+
+class ContactResolver:
+    """Look up contacts by id: local store, then the API, with caching.
+
+    * ``local_path`` (usually contacts.json from the last sync) is indexed on
+      the first lookup and always consulted first.
+    * On a local miss the contact is fetched individually through ``fetch``;
+      found contacts go into a bounded LRU cache, unknown ids into a TTL-bound
+      negative cache so repeated "No client found" journals cost nothing.
+    * Concurrent lookups of the same id share one in-flight request.
+    """
+
+    def __init__(
+        self,
+        fetch: Optional[Fetcher] = None,
+        local_path: Optional[Path] = Path("contacts.json"),
+        maxsize: int = 4096,
+        negative_ttl: float = 3600.0,
+    ):
+        self._fetch = fetch
+        self._local_path = Path(local_path) if local_path else None
+        self._local: Optional[Dict[str, Contact]] = None
+        self._local_lock = Lock()
+        self._positive: LRUCache = LRUCache(maxsize=maxsize)
+        self._negative: TTLCache = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+        self._lock = Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.stats: Counter = Counter()
+
+    def _local_store(self) -> Dict[str, Contact]:
+        if self._local is None:
+            with self._local_lock:
+                if self._local is None:
+                    local: Dict[str, Contact] = {}
+                    if self._local_path and self._local_path.exists():
+                        local = load_contacts(self._local_path)
+                    self._local = local
+        return self._local
+
+    def get(self, contact_id: Optional[str]) -> Optional[dict]:
+        if not contact_id:
+            return None
+
+        local = self._local_store().get(contact_id)
+        if local is not None:
+            self.stats["local"] += 1
+            return local
+
+        with self._lock:
+            cached = self._positive.get(contact_id)
+            if cached is not None:
+                self.stats["cache_hit"] += 1
+                return cached
+            if contact_id in self._negative:
+                self.stats["negative_hit"] += 1
+                return None
+            if self._fetch is None:
+                self.stats["miss"] += 1
+                return None
+            future = self._inflight.get(contact_id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[contact_id] = future
+            else:
+                self.stats["coalesced"] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            self.stats["fetched"] += 1
+            contact = self._fetch(contact_id)
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(contact_id, None)
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            if contact:
+                self._positive[contact_id] = contact
+            else:
+                self._negative[contact_id] = True
+            self._inflight.pop(contact_id, None)
+        future.set_result(contact)
+        return contact
+
+    def search(self, query: str, limit: int = 20) -> List[Contact]:
+        """Local contacts whose name, number, CVR or address contain every word of ``query``.
+
+        Matches against the ``searchKey`` stored at sync time, so "rosenørns alle"
+        and "rosenoerns alle" both find "Rosenørns Allé". Older dumps without
+        it are folded on the fly.
+        """
+        words = fold(query).split()
+        if not words:
+            return []
+        found: List[Contact] = []
+        for contact in self._local_store().values():
+            key = contact.searchKey or search_key(contact.name, contact.number, contact.vatNo, contact.address)
+            if all(word in key for word in words):
+                found.append(contact)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def __contains__(self, contact_id: str) -> bool:
+        return self.get(contact_id) is not None
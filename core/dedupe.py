@@ -0,0 +1,184 @@
+"""Near-duplicate contacts without comparing every pair.
+
+Each contact is reduced once to a folded name without legal forms ("Novo
+Nordisk A/S" -> "novo nordisk"), a folded street and a postal code, plus the
+character trigrams of both. Only contacts that share a blocking key are
+scored:
+
+* the same CVR number or e-mail address (which also raises the score);
+* the same postal code and first street word (catches "Allé" vs "All´s");
+* one of the ``rare_grams`` least frequent trigrams of the name. Similar names
+  share most trigrams, so they nearly always share a rare one, while common
+  trigrams ("sen", "aps") never form blocks.
+
+Blocks larger than ``max_block`` are skipped, so the number of scored pairs
+grows with the number of contacts rather than its square. Pairs scoring at
+least ``threshold`` are joined into clusters with a union-find.
+
+With ``changed`` only pairs involving those ids are scored, which is what an
+incremental run after a sync needs (see dedupe_contacts.py).
+"""
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+from .derived import fold, split_address
+
+LEGAL_FORMS = frozenset({
+    "as", "aps", "ivs", "is", "ks", "ps", "amba", "fmba", "smba", "ab", "asa", "oy", "oyj",
+    "ltd", "limited", "plc", "llc", "inc", "gmbh", "bv", "nv", "sa", "sarl", "srl", "spa",
+})
+_PUNCTUATION = re.compile(r"[^\w\s]")
+# Kinds of blocking key that are identifiers: never skipped for size, and a
+# shared one closes half the remaining gap to 1. People are often registered
+# with their company's CVR or mailbox, so an identifier alone is not enough.
+IDENTIFIERS = frozenset({"vat", "email"})
+MIN_NAME_LENGTH = 3
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Folded name without punctuation and legal-form words."""
+    words = _PUNCTUATION.sub(" ", fold((name or "").replace("/", ""))).split()
+    return " ".join(word for word in words if word not in LEGAL_FORMS)
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {text} "
+    return frozenset(map("".join, zip(padded, padded[1:], padded[2:])))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+@dataclass(frozen=True)
+class ContactKey:
+    """What the scorer needs from one contact, computed once."""
+
+    id: str
+    name: str
+    postal_code: str
+    street: str
+    name_grams: FrozenSet[str]
+    street_grams: FrozenSet[str]
+    vat: str
+    emails: FrozenSet[str]
+
+    @classmethod
+    def of(cls, contact: Mapping) -> "ContactKey":
+        postal_code, street = contact.get("postalCode"), contact.get("street")
+        if postal_code is None:
+            street, postal_code, _, _ = split_address(contact.get("address"))
+        name = normalize_name(contact.get("name"))
+        street = " ".join(_PUNCTUATION.sub(" ", fold(street)).split())
+        return cls(
+            id=contact.get("id"),
+            name=name,
+            postal_code=postal_code or "",
+            street=street,
+            name_grams=trigrams(name) if name else frozenset(),
+            street_grams=trigrams(street) if street else frozenset(),
+            vat=re.sub(r"\D", "", contact.get("vatNo") or ""),
+            emails=frozenset(e.strip().lower() for e in contact.get("emails") or () if e and "@" in e),
+        )
+
+
+def score(a: ContactKey, b: ContactKey) -> float:
+    """0..1: name similarity, backed by the address and raised by a shared CVR or e-mail."""
+    if len(a.name) < MIN_NAME_LENGTH or len(b.name) < MIN_NAME_LENGTH:
+        return 0.0
+    name = jaccard(a.name_grams, b.name_grams)
+    if a.postal_code and a.postal_code == b.postal_code and a.street_grams and b.street_grams:
+        value = 0.6 * name + 0.4 * jaccard(a.street_grams, b.street_grams)
+    else:
+        # No shared address to back it up: the name alone must be very close
+        value = 0.85 * name
+    if (a.vat and a.vat == b.vat) or a.emails & b.emails:
+        value += (1.0 - value) / 2
+    return value
+
+
+def blocking_keys(key: ContactKey, gram_counts: Counter, rare_grams: int) -> Set[Tuple[str, str]]:
+    keys: Set[Tuple[str, str]] = set()
+    if key.vat:
+        keys.add(("vat", key.vat))
+    keys.update(("email", email) for email in key.emails)
+    if key.postal_code and key.street:
+        keys.add(("address", f"{key.postal_code} {key.street.split()[0]}"))
+    if len(key.name) < MIN_NAME_LENGTH:
+        return keys
+    grams = sorted((g for g in key.name_grams if g.strip()), key=lambda g: (gram_counts[g], g))
+    keys.update(("gram", gram) for gram in grams[:rare_grams])
+    return keys
+
+
+@dataclass(frozen=True)
+class Match:
+    a: str
+    b: str
+    score: float
+
+
+def find_matches(
+    contacts: Iterable[Mapping],
+    threshold: float = 0.8,
+    changed: Optional[Set[str]] = None,
+    rare_grams: int = 3,
+    max_block: int = 100,
+) -> List[Match]:
+    """Pairs of contacts scoring at least ``threshold``; only pairs touching ``changed`` when given."""
+    keys = [ContactKey.of(contact) for contact in contacts if contact.get("id")]
+    gram_counts: Counter = Counter()
+    for key in keys:
+        gram_counts.update(key.name_grams)
+
+    blocks: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for index, key in enumerate(keys):
+        for block in blocking_keys(key, gram_counts, rare_grams):
+            blocks[block].append(index)
+
+    seen: Set[Tuple[int, int]] = set()
+    matches: List[Match] = []
+    for (kind, _), members in blocks.items():
+        if len(members) < 2 or (kind not in IDENTIFIERS and len(members) > max_block):
+            continue
+        if changed is not None:
+            fresh = [i for i in members if keys[i].id in changed]
+            pairs = ((i, j) for i in fresh for j in members if i != j and (keys[j].id not in changed or i < j))
+        else:
+            pairs = combinations(members, 2)
+        for i, j in pairs:
+            pair = (i, j) if i < j else (j, i)
+            if pair in seen:
+                continue
+            seen.add(pair)
+            value = score(keys[i], keys[j])
+            if value >= threshold:
+                matches.append(Match(keys[pair[0]].id, keys[pair[1]].id, round(value, 3)))
+    return matches
+
+
+def clusters(matches: Iterable[Match]) -> List[List[str]]:
+    """Connected groups of ids, largest first."""
+    parent: Dict[str, str] = {}
+
+    def root(item: str) -> str:
+        parent.setdefault(item, item)
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    for match in matches:
+        a, b = root(match.a), root(match.b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for item in parent:
+        groups[root(item)].append(item)
+    return sorted((sorted(group) for group in groups.values()), key=lambda group: (-len(group), group[0]))
@@ -0,0 +1,154 @@
+"""Fields derived from synced contacts and journals, computed once at ingest.
+
+fetch_data adds these to every record it writes to contacts.json and
+journals.json, so rendering and searching read them instead of re-parsing
+for every document and every keystroke:
+
+* ``street``, ``postalCode``, ``city`` and ``addressLine`` (one line, comma
+  separated) from the raw ``"Teknikervej 2\\r\\n7000 Fredericia"`` address;
+* ``searchKey``: name, number and address casefolded and accent-folded
+  (``"Rosenørns Allé"`` -> ``"rosenoerns alle"``);
+* ``slug``: the filename part for the record (journal number, client name);
+* ``isActive`` (journals): neither inactive nor archived.
+
+``sourceHash`` fingerprints the fields as received from the API. A sync
+reuses the derived fields of records whose hash did not change and records
+which ids were added, changed or removed (see :class:`Ingest`).
+"""
+import hashlib
+import json
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from .records import iter_json_array
+from .utils import normalize_whitespace, safe_slug
+
+ADDRESS_KEYS = ("street", "postalCode", "city", "addressLine")
+CONTACT_KEYS = ADDRESS_KEYS + ("searchKey", "slug", "sourceHash")
+JOURNAL_KEYS = ADDRESS_KEYS + ("searchKey", "slug", "isActive", "sourceHash")
+_ALL_KEYS = frozenset(JOURNAL_KEYS)
+
+# Last line shaped like "2800 Kgs. Lyngby", "DK-1260 København K" or "00150 HELSINKI"
+_POSTAL_LINE = re.compile(r"^(?:DK-?\s*)?(\d{4,5})\s+(\S.*)$", re.I)
+# Letters NFKD does not decompose, spelled the way Danish does without them
+_FOLD = str.maketrans({"æ": "ae", "ø": "oe", "å": "aa", "ß": "ss", "đ": "d", "ł": "l"})
+_COMBINING = re.compile(r"[\u0300-\u036f]")
+
+
+def split_address(raw: Optional[str]) -> Tuple[str, str, str, str]:
+    """(street, postal code, city, one-line address) from a multi-line address."""
+    lines = [line.strip().strip(",").strip() for line in (raw or "").splitlines()]
+    lines = [normalize_whitespace(line) for line in lines if line]
+    for index in range(len(lines) - 1, -1, -1):
+        match = _POSTAL_LINE.match(lines[index])
+        if match:
+            street = ", ".join(lines[:index])
+            return street, match.group(1), match.group(2), ", ".join(lines)
+    return ", ".join(lines), "", "", ", ".join(lines)
+
+
+def fold(text: Optional[str]) -> str:
+    """Casefolded, accent-free, whitespace-normalised text for matching."""
+    text = (text or "").casefold()
+    if not text.isascii():
+        text = _COMBINING.sub("", unicodedata.normalize("NFKD", text.translate(_FOLD)))
+    return normalize_whitespace(text)
+
+
+def search_key(*parts: Optional[str]) -> str:
+    return fold(" ".join(part for part in parts if part))
+
+
+def is_active(journal: Mapping[str, Any]) -> bool:
+    return bool(journal.get("active")) and not journal.get("archived") and journal.get("state") != "Archived"
+
+
+def source_hash(record: Mapping[str, Any]) -> str:
+    source = {key: value for key, value in record.items() if key not in _ALL_KEYS}
+    encoded = json.dumps(source, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def _address_fields(record: Mapping[str, Any]) -> Dict[str, str]:
+    return dict(zip(ADDRESS_KEYS, split_address(record.get("address"))))
+
+
+def derive_contact(contact: Mapping[str, Any]) -> Dict[str, Any]:
+    fields = _address_fields(contact)
+    fields["searchKey"] = search_key(
+        contact.get("name"), contact.get("number"), contact.get("vatNo"), fields["addressLine"]
+    )
+    fields["slug"] = safe_slug(contact.get("name") or "UnknownClient")
+    return fields
+
+
+def derive_journal(journal: Mapping[str, Any]) -> Dict[str, Any]:
+    fields = _address_fields(journal)
+    fields["searchKey"] = search_key(
+        journal.get("number"), journal.get("name"), journal.get("clientReference"), journal.get("courtReference")
+    )
+    fields["slug"] = safe_slug(journal.get("number") or "NoNumber")
+    fields["isActive"] = is_active(journal)
+    return fields
+
+
+def output_basename(journal: Mapping[str, Any], client: Mapping[str, Any]) -> str:
+    """``<journal number>_<client name>`` for generated files, from the stored slugs when present."""
+    number = journal.get("slug") or safe_slug(journal.get("number") or "NoNumber")
+    name = client.get("slug") or safe_slug(client.get("name") or "UnknownClient")
+    return f"{number}_{name}"
+
+
+class Ingest:
+    """Adds derived fields to records on their way into a dump.
+
+    ``previous`` is the dump being replaced. Records whose ``sourceHash`` is
+    unchanged get its derived fields back instead of recomputing them. After
+    the stream is consumed, ``added``, ``changed`` and ``removed`` hold the ids
+    that differ from it.
+    """
+
+    def __init__(self, kind: str, previous: Optional[Union[str, Path]] = None):
+        if kind not in ("contacts", "journals"):
+            raise ValueError(f"Unknown record kind: {kind}")
+        self.kind = kind
+        self._derive = derive_contact if kind == "contacts" else derive_journal
+        self._keys = CONTACT_KEYS if kind == "contacts" else JOURNAL_KEYS
+        self._previous: Dict[str, Dict[str, Any]] = {}
+        if previous is not None and Path(previous).exists():
+            self._previous = self._index(previous)
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.removed: List[str] = []
+        self.reused = 0
+
+    def _index(self, path: Union[str, Path]) -> Dict[str, Dict[str, Any]]:
+        index: Dict[str, Dict[str, Any]] = {}
+        with open(path, encoding="utf-8") as fh:
+            for item in iter_json_array(fh):
+                if item.get("id"):
+                    # Dumps from before derived fields have no hash and count as changed
+                    index[item["id"]] = {key: item.get(key) for key in self._keys}
+        return index
+
+    def __call__(self, records: Iterable[Mapping[str, Any]]) -> Iterator[Dict[str, Any]]:
+        unseen = set(self._previous)
+        for record in records:
+            record_id = record.get("id")
+            digest = source_hash(record)
+            previous = self._previous.get(record_id)
+            unseen.discard(record_id)
+            if previous is not None and previous["sourceHash"] == digest:
+                fields = previous
+                self.reused += 1
+            else:
+                fields = {**self._derive(record), "sourceHash": digest}
+                if record_id:
+                    (self.changed if previous is not None else self.added).append(record_id)
+            yield {**{key: value for key, value in record.items() if key not in _ALL_KEYS}, **fields}
+        self.removed = sorted(unseen)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"added": self.added, "changed": self.changed, "removed": self.removed}
@@ -0,0 +1,85 @@
+"""Document sets: several templates rendered from one context.
+
+A case usually needs more than one document for the same employee or
+journal. A set renders all of them from a single context:
+
+* the extracted inputs are parsed once, and the Fratrædelse context is built
+  once for the union of the fields the templates reference;
+* each template then gets only the fields it references. Its render cache
+  key (see core.render_cache) therefore does not change when a field that
+  only another template uses changes;
+* templates come from the registry, so .docx templates are compiled once
+  per process (core.ooxml.load_compiled).
+
+Output names get the template's stem appended (``<name>_<template>.docx``)
+when a set has more than one template; a one-template set keeps the plain
+name, so existing single-template runs produce the same files.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .render_cache import RenderCache
+from .rendering import build_fratradelse_context, render_document
+from .template_registry import TemplateInfo, registry as template_registry
+from .utils import safe_slug
+
+
+@dataclass(frozen=True)
+class SetMember:
+    info: TemplateInfo
+    suffix: str  # appended to the output name; "" in a one-template set
+
+    def filename(self, stem: str, extension: str = ".docx") -> str:
+        return f"{stem}{self.suffix}{extension}"
+
+
+def output_suffixes(paths: Sequence[Union[str, Path]]) -> List[str]:
+    """``_<template stem>`` per template, or [""] for a single template."""
+    if len(paths) == 1:
+        return [""]
+    suffixes: List[str] = []
+    for path in paths:
+        suffix = f"_{safe_slug(Path(path).stem)}"
+        if suffix in suffixes:  # same stem, e.g. memo.md and memo.docx
+            suffix = f"{suffix}_{Path(path).suffix.lstrip('.')}"
+        suffixes.append(suffix)
+    return suffixes
+
+
+def resolve_set(paths: Sequence[Union[str, Path]]) -> List[SetMember]:
+    """Registry info for each template; raises ValueError for a missing or unparsable one."""
+    if not paths:
+        raise ValueError("A document set needs at least one template")
+    members = []
+    for path, suffix in zip(paths, output_suffixes(paths)):
+        info = template_registry.get(Path(path))
+        if info is None or info.error:
+            raise ValueError(f"Template not usable: {path}" + (f" ({info.error})" if info else ""))
+        members.append(SetMember(info, suffix))
+    return members
+
+
+def set_fields(members: Sequence[SetMember]) -> FrozenSet[str]:
+    """Every field referenced by at least one template of the set."""
+    return frozenset().union(*(member.info.variables for member in members))
+
+
+def narrow(context: Mapping[str, Any], info: TemplateInfo) -> Dict[str, Any]:
+    return {name: value for name, value in context.items() if name in info.variables}
+
+
+def render_set(
+    members: Sequence[SetMember],
+    contract_data: Mapping[str, str],
+    payslip_data: Mapping[str, str],
+    ui_data: Mapping[str, str],
+    engine: str = "ooxml",
+    cache: Optional[RenderCache] = None,
+) -> List[Tuple[SetMember, bytes]]:
+    """Render every template of the set from one Fratrædelse context, in set order."""
+    context = build_fratradelse_context(contract_data, payslip_data, ui_data, fields=set_fields(members))
+    return [
+        (member, render_document(member.info.path, narrow(context, member.info), engine=engine, cache=cache))
+        for member in members
+    ]
@@ -1,12 +1,52 @@
 from typing import Callable, Dict, Optional
 
-import pdfplumber
+import os
 import re
+import time
 
+from .pdftext import extract_text
 from .utils import normalize_whitespace, parse_dk_amount, parse_dk_date
 
 DebugCallback = Optional[Callable[[str], None]]
 DK_POSTAL = r"\b[0-9]{4}\b"
+# Amounts are captured with a bounded run so no scan can grow with the text.
+# Every other quantifier in this module is bounded for the same reason (see
+# bench_extractors.py --adversarial).
+AMOUNT = r"([\d\.,]{1,32})"
+
+
+def _budget_from_env(name: str, default: float) -> Optional[float]:
+    """Seconds from ``name``; 0 or less disables the check, an unparsable value warns and uses ``default``."""
+    value = os.getenv(name, "").strip()
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        print(f"Ignoring {name}={value!r} (not a number of seconds); using {default:g}")
+        return default
+    return seconds if seconds > 0 else None
+
+
+# Seconds per document for parsing the extracted text; None disables the check.
+DEFAULT_TIME_BUDGET = _budget_from_env("CONTRACTGEN_EXTRACTION_BUDGET", 20.0)
+
+
+class ExtractionTimeout(Exception):
+    """The document exceeded its time budget; ``partial`` holds the fields found so far."""
+
+    def __init__(self, partial: Dict[str, str]):
+        super().__init__("Extraction time budget exceeded")
+        self.partial = partial
+
+
+def _deadline(time_budget: Optional[float]) -> Optional[float]:
+    return time.monotonic() + time_budget if time_budget else None
+
+
+def _check(deadline: Optional[float], out: Dict[str, str]) -> None:
+    if deadline is not None and time.monotonic() > deadline:
+        raise ExtractionTimeout(dict(out))
 
 
 def _emit_debug(callback: DebugCallback, raw_text: str) -> None:
@@ -14,24 +54,42 @@ def _emit_debug(callback: DebugCallback, raw_text: str) -> None:
         callback(raw_text[:20000])
 
 
-def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -> Dict[str, str]:
-    """Parse employer/employee data anchored on CVR and CPR markers."""
-    out: Dict[str, str] = {}
-    with pdfplumber.open(pdf_path) as pdf:
-        pages = [page.extract_text() or "" for page in pdf.pages]
-    full_text = "\n".join(pages)
-
+def extract_from_contract(
+    pdf_path: str,
+    debug_callback: DebugCallback = None,
+    backend: Optional[str] = None,
+    time_budget: Optional[float] = DEFAULT_TIME_BUDGET,
+    text_callback: DebugCallback = None,
+) -> Dict[str, str]:
+    """Parse employer/employee data anchored on CVR and CPR markers.
+
+    ``backend`` selects the PDF text backend (see core.pdftext); None uses the default.
+    ``text_callback`` receives the full extracted text, e.g. for the search index.
+    Raises ExtractionTimeout (with the partial fields) when parsing the text takes
+    longer than ``time_budget``; reading the PDF is not counted.
+    """
+    full_text = extract_text(pdf_path, backend)
+    # The budget bounds the parsing; text already read is never thrown away
+    deadline = _deadline(time_budget)
     _emit_debug(debug_callback, full_text)
+    if text_callback:
+        text_callback(full_text)
+    return parse_contract_text(full_text, deadline)
+
 
+def parse_contract_text(full_text: str, deadline: Optional[float] = None) -> Dict[str, str]:
+    """``deadline`` is a time.monotonic() value checked between the parsing steps."""
+    out: Dict[str, str] = {}
+    _check(deadline, out)
     lines = [line.strip() for line in full_text.splitlines()]
     lines = [line for line in lines if line is not None]
 
     cvr_idx = next(
-        (idx for idx, line in enumerate(lines) if re.search(r"\bCVR\b\s*:?\s*\d{8}", line, re.I)),
+        (idx for idx, line in enumerate(lines) if re.search(r"\bCVR\b\s{0,5}:?\s{0,5}\d{8}", line, re.I)),
         None,
     )
     if cvr_idx is not None:
-        match = re.search(r"\bCVR\b\s*:?\s*(\d{8})", lines[cvr_idx], re.I)
+        match = re.search(r"\bCVR\b\s{0,5}:?\s{0,5}(\d{8})", lines[cvr_idx], re.I)
         if match:
             out["C_CoRegCVR"] = match.group(1)
 
@@ -48,12 +106,13 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
             if addr_parts:
                 out["C_Address"] = normalize_whitespace(" ".join(addr_parts))
 
+    _check(deadline, out)
     cpr_idx = next(
         (
             idx
             for idx, line in enumerate(lines)
-            if re.search(r"\bCPR\b\s*:?$", line, re.I)
-            or re.search(r"\bCPR\b\s*:", line, re.I)
+            if re.search(r"\bCPR\b\s{0,5}:?$", line, re.I)
+            or re.search(r"\bCPR\b\s{0,5}:", line, re.I)
         ),
         None,
     )
@@ -82,7 +141,7 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
                 if addr_candidates:
                     out["P_Address"] = normalize_whitespace(addr_candidates[-1])
     else:
-        match = re.search(r"\bAND\b\s*(.+)$", full_text, re.I | re.M)
+        match = re.search(r"\bAND\b\s{0,20}(.+)$", full_text, re.I | re.M)
         if match:
             tail = [segment.strip() for segment in match.group(1).splitlines() if segment.strip()]
             if tail:
@@ -92,8 +151,9 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
                     out.setdefault("P_Address", normalize_whitespace(segment))
                     break
 
+    _check(deadline, out)
     effective_match = re.search(
-        r"With effect from ([A-Za-z0-9,\.\-\/\s]+?),\s*the Employee is employed",
+        r"With effect from ([A-Za-z0-9,\.\-\/\s]{1,60}?),\s{0,5}the Employee is employed",
         full_text,
         re.I,
     )
@@ -101,12 +161,15 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
         out["EmploymentStart"] = parse_dk_date(effective_match.group(1))
 
     patterns = [
-        r"fixed\s+annual\s+salary\s+of\s+(?:DKK|kr\.?)[\s]*([\d\.,]+)",
-        r"(?:gross\s+)?monthly\s+salary\s+(?:is|of)\s+(?:DKK|kr\.?)[\s]*([\d\.,]+)",
-        r"(?:base|fixed)?\s*salary\s*(?:is|of|amounts\s*to)\s*(?:DKK|kr\.?)?\s*([\d\.,]+)\s*(?:per\s*month|pr\.\s*måned|monthly)",
-        r"\bmånedsløn\b[^\d]*([\d\.,]+)",
-        r"\bårsløn\b[^\d]*([\d\.,]+)",
+        r"fixed\s{1,5}annual\s{1,5}salary\s{1,5}of\s{1,5}(?:DKK|kr\.?)\s{0,5}" + AMOUNT,
+        r"monthly\s{1,5}salary\s{1,5}(?:is|of)\s{1,5}(?:DKK|kr\.?)\s{0,5}" + AMOUNT,
+        r"salary\s{0,5}(?:is|of|amounts\s{0,5}to)\s{0,5}(?:DKK|kr\.?)?\s{0,5}"
+        + AMOUNT
+        + r"\s{0,5}(?:per\s{0,5}month|pr\.\s{0,5}måned|monthly)",
+        r"\bmånedsløn\b[^\d]{0,200}" + AMOUNT,
+        r"\bårsløn\b[^\d]{0,200}" + AMOUNT,
     ]
+    _check(deadline, out)
     monthly = None
     for pattern in patterns:
         match = re.search(pattern, full_text, re.I)
@@ -125,11 +188,12 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
     if monthly is not None and monthly > 5000:
         out["MonthlySalary"] = f"{monthly:.2f}".rstrip("0").rstrip(".")
 
-    bonus_year_match = re.search(r"\bbonus(?:året|year)?\s*(?:for\s*)?(20\d{2})\b", full_text, re.I)
+    _check(deadline, out)
+    bonus_year_match = re.search(r"\bbonus(?:året|year)?\s{0,5}(?:for\s{0,5})?(20\d{2})\b", full_text, re.I)
     if bonus_year_match:
         out["BonusYear"] = bonus_year_match.group(1)
 
-    bonus_amount_match = re.search(r"bonus\s*(?:på|of)?\s*(?:DKK|kr\.?)?\s*([\d\.\,]+)", full_text, re.I)
+    bonus_amount_match = re.search(r"bonus\s{0,5}(?:på|of)?\s{0,5}(?:DKK|kr\.?)?\s{0,5}" + AMOUNT, full_text, re.I)
     if bonus_amount_match:
         value = parse_dk_amount(bonus_amount_match.group(1))
         if value:
@@ -137,7 +201,7 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
 
     def _find_clause_number(text: str, keywords) -> Optional[str]:
         pattern_primary = re.compile(
-            r"^(?:\s*(?:Section|Pkt\.?|Punkt)\s*)?(\d{1,2}(?:\.\d+)*)\s*[-–.)]?\s*(%s)\b"
+            r"^(?:[ \t]{0,10}(?:Section|Pkt\.?|Punkt)\s{0,5})?(\d{1,2}(?:\.\d{1,3}){0,4})\s{0,5}[-–.)]?\s{0,5}(%s)\b"
             % "|".join(keywords),
             re.I | re.M,
         )
@@ -146,7 +210,7 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
             return match_primary.group(1)
 
         pattern_inline = re.compile(
-            r"(?:clause|pkt\.?|punkt)\s*(\d+(?:\.\d+)*)\s*(?:om|on)?\s*(%s)"
+            r"(?:clause|pkt\.?|punkt)\s{0,5}(\d{1,3}(?:\.\d{1,3}){0,4})\s{0,5}(?:om|on)?\s{0,5}(%s)"
             % "|".join(keywords),
             re.I,
         )
@@ -156,10 +220,10 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
 
         lines_local = [ln.strip() for ln in text.splitlines() if ln.strip()]
         for idx, line in enumerate(lines_local[:-1]):
-            if re.match(r"^(?:Section\s*)?(\d{1,2}(?:\.\d+)*)\s*[-–.)]?$", line, re.I):
+            if re.match(r"^(?:Section\s{0,5})?(\d{1,2}(?:\.\d{1,3}){0,4})\s{0,5}[-–.)]?$", line, re.I):
                 next_line = lines_local[idx + 1]
                 if re.search(r"\b(?:%s)\b" % "|".join(keywords), next_line, re.I):
-                    num_match = re.match(r"^(?:Section\s*)?(\d{1,2}(?:\.\d+)*)", line, re.I)
+                    num_match = re.match(r"^(?:Section\s{0,5})?(\d{1,2}(?:\.\d{1,3}){0,4})", line, re.I)
                     if num_match:
                         return num_match.group(1)
         return None
@@ -167,11 +231,13 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
     conf_keywords = ["Confidentiality", "Tavshedspligt", "Non\s*Disclosure", "Fortrolighed"]
     ip_keywords = ["Intellectual\s*Property", "Immaterielle\s*rettigheder", "IP\s*Rights", "Immaterial\s*rights"]
 
+    _check(deadline, out)
     if not out.get("ConfidentialityClauseRef"):
         reference = _find_clause_number(full_text, conf_keywords)
         if reference:
             out["ConfidentialityClauseRef"] = reference
 
+    _check(deadline, out)
     if not out.get("EmploymentClauseRef"):
         reference = _find_clause_number(full_text, ip_keywords)
         if reference:
@@ -180,16 +246,29 @@ def extract_from_contract(pdf_path: str, debug_callback: DebugCallback = None) -
     return out
 
 
-def extract_from_payslip(pdf_path: str, debug_callback: DebugCallback = None) -> Dict[str, str]:
-    out: Dict[str, str] = {}
-    with pdfplumber.open(pdf_path) as pdf:
-        pages = [page.extract_text() or "" for page in pdf.pages]
-    full_text = "\n".join(pages)
-    flattened = normalize_whitespace(full_text)
-
+def extract_from_payslip(
+    pdf_path: str,
+    debug_callback: DebugCallback = None,
+    backend: Optional[str] = None,
+    time_budget: Optional[float] = DEFAULT_TIME_BUDGET,
+    text_callback: DebugCallback = None,
+) -> Dict[str, str]:
+    full_text = extract_text(pdf_path, backend)
+    # The budget bounds the parsing; text already read is never thrown away
+    deadline = _deadline(time_budget)
     _emit_debug(debug_callback, full_text)
+    if text_callback:
+        text_callback(full_text)
+    return parse_payslip_text(full_text, deadline)
+
 
-    match = re.search(r"\bFra:\s*([0-9\-\.\/]+).*?\bTil:\s*([0-9\-\.\/]+)", full_text, re.I | re.S)
+def parse_payslip_text(full_text: str, deadline: Optional[float] = None) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    _check(deadline, out)
+
+    match = re.search(
+        r"\bFra:\s{0,10}([0-9\-\.\/]{1,12}).{0,200}?\bTil:\s{0,10}([0-9\-\.\/]{1,12})", full_text, re.I | re.S
+    )
     if match:
         out["PeriodFrom"] = parse_dk_date(match.group(1))
         out["PeriodTo"] = parse_dk_date(match.group(2))
@@ -202,6 +281,7 @@ def extract_from_payslip(pdf_path: str, debug_callback: DebugCallback = None) ->
         r"Løn\s*\(måned\)",
     ]
 
+    _check(deadline, out)
     lines = [line for line in full_text.splitlines() if line.strip()]
     found_label_amount = False
     for label in labels:
@@ -210,7 +290,7 @@ def extract_from_payslip(pdf_path: str, debug_callback: DebugCallback = None) ->
             if not pattern.search(line):
                 continue
             combined = line + (" " + lines[idx + 1] if idx + 1 < len(lines) else "")
-            numbers = re.findall(r"[\d\.,]+", combined)
+            numbers = re.findall(AMOUNT, combined)
             candidates = []
             for raw in numbers:
                 value = parse_dk_amount(raw)
@@ -228,11 +308,12 @@ def extract_from_payslip(pdf_path: str, debug_callback: DebugCallback = None) ->
         if found_label_amount:
             break
 
+    _check(deadline, out)
     if "MonthlySalary" not in out:
         salary_candidates = []
-        for match in re.finditer(r"(?i)l[øo]n[^\n\r]{0,80}?([\d\.,]+)", full_text):
+        for match in re.finditer(r"(?i)l[øo]n[^\n\r]{0,80}?" + AMOUNT, full_text):
             segment = full_text[max(0, match.start() - 20): match.end() + 20]
-            if re.search(r"netto\s*l[øo]n|nettol[øo]n|netto", segment, re.I):
+            if re.search(r"netto", segment, re.I):
                 continue
             if re.search(r"AM\s*-\s*bidrag|AM-bidrag|A\s*-\s*skat|A-skat", segment, re.I):
                 continue
@@ -247,12 +328,14 @@ def extract_from_payslip(pdf_path: str, debug_callback: DebugCallback = None) ->
             best = max(salary_candidates)
             out["MonthlySalary"] = f"{best:.2f}".rstrip("0").rstrip(".")
 
-    name_match = re.search(r"\bNavn\b\s*:\s*([^\n\r]+)", full_text, re.I)
+    _check(deadline, out)
+    name_match = re.search(r"\bNavn\b\s{0,5}:\s{0,10}([^\n\r]{1,200})", full_text, re.I)
     if name_match:
         out["P_Name"] = normalize_whitespace(name_match.group(1))
 
+    _check(deadline, out)
     bonus_candidates = []
-    for match in re.finditer(r"bonus[^\n\r]*?([\d\.,]+)", full_text, re.I):
+    for match in re.finditer(r"bonus[^\n\r]{0,120}?" + AMOUNT, full_text, re.I):
         value = parse_dk_amount(match.group(1))
         try:
             number = float(value)
@@ -264,7 +347,7 @@ def extract_from_payslip(pdf_path: str, debug_callback: DebugCallback = None) ->
         best = max(bonus_candidates)
         out["BonusAmount"] = f"{best:.2f}".rstrip("0").rstrip(".")
 
-    year_match = re.search(r"\bbonus(?:året|year)?\s*(?:for\s*)?(20\d{2})\b", full_text, re.I)
+    year_match = re.search(r"\bbonus(?:året|year)?\s{0,5}(?:for\s{0,5})?(20\d{2})\b", full_text, re.I)
     if not year_match:
         tail = out.get("PeriodTo") or out.get("PeriodFrom")
         if tail and re.match(r"\d{4}-\d{2}-\d{2}", tail):
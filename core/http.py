@@ -0,0 +1,76 @@
+import os
+from collections import Counter
+from typing import Mapping, Optional
+
+import requests
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+DEFAULT_BASE_URL = "https://api.app.legis365.com/public/v1.0"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Process-wide counters (requests, retries, throttled, ...) for load tests/logging.
+stats: Counter = Counter()
+
+
+def base_url() -> str:
+    """API root; LEGIS_API_BASE_URL points the fetchers at e.g. the local mock."""
+    return os.getenv("LEGIS_API_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+
+
+class RetryableHTTPError(requests.HTTPError):
+    """429/5xx response that is worth retrying (honours Retry-After)."""
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, (RetryableHTTPError, requests.ConnectionError, requests.Timeout))
+
+
+_backoff = wait_exponential_jitter(initial=0.5, max=30)
+
+
+def _wait(retry_state) -> float:
+    exc = retry_state.outcome.exception()
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), 60.0)
+        except ValueError:
+            pass
+    return _backoff(retry_state)
+
+
+def _before_sleep(retry_state) -> None:
+    stats["retries"] += 1
+
+
+@retry(
+    retry=retry_if_exception(_is_retryable),
+    wait=_wait,
+    stop=stop_after_attempt(6),
+    before_sleep=_before_sleep,
+    reraise=True,
+)
+def get(
+    path: str,
+    headers: Mapping[str, str],
+    params: Optional[Mapping[str, object]] = None,
+    timeout: float = 60,
+    session: Optional[requests.Session] = None,
+) -> requests.Response:
+    """GET ``base_url() + path`` with retries on throttling and transient errors.
+
+    Non-retryable error statuses are returned to the caller unchanged so it can
+    decide (e.g. 404 = unknown resource, 400 = unsupported filter).
+    """
+    stats["requests"] += 1
+    response = (session or requests).get(f"{base_url()}{path}", headers=headers, params=params, timeout=timeout)
+    if response.status_code in RETRY_STATUSES:
+        stats["throttled" if response.status_code == 429 else "server_errors"] += 1
+        raise RetryableHTTPError(f"{response.status_code} for {path}", response=response)
+    return response
@@ -0,0 +1,248 @@
+"""SQLite-backed job queue for resumable, multi-process batch runs.
+
+Jobs are rows keyed by a caller-chosen id (e.g. the journal id). Workers claim
+jobs by taking a time-limited lease, extend it with heartbeats while working and
+finally mark the job done or failed. A lease that is not renewed expires and the
+job becomes claimable again, so a crashed or killed worker only delays its
+in-flight jobs. Nothing but a shared file is needed: workers on several hosts
+can use the same database on a shared filesystem (the default rollback journal
+is used for that reason; pass ``wal=True`` for single-host runs).
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot help."""
+
+
+@dataclass(frozen=True)
+class Job:
+    key: str
+    payload: Any
+    attempts: int
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: Union[str, Path],
+        lease_seconds: float = 120.0,
+        max_attempts: int = 3,
+        wal: bool = False,
+    ):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        if wal:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front so two workers can
+        # never select the same pending rows.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def enqueue(self, jobs: Iterable[Tuple[str, Any]]) -> int:
+        """Add jobs that are not in the queue yet; existing keys keep their state."""
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (key, payload, updated_at) VALUES (?, ?, ?)",
+                ((key, json.dumps(payload, ensure_ascii=False), now) for key, payload in jobs),
+            )
+            return conn.total_changes - before
+
+    def claim(self, worker: str, limit: int = 1) -> List[Job]:
+        """Lease up to ``limit`` pending (or abandoned) jobs to ``worker``."""
+        now = time.time()
+        with self._transaction() as conn:
+            # Abandoned leases that already used every attempt are given up.
+            conn.execute(
+                "UPDATE jobs SET status = ?, last_error = COALESCE(last_error, 'lease expired'), updated_at = ?"
+                " WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts),
+            )
+            rows = conn.execute(
+                "SELECT key, payload, attempts FROM jobs"
+                " WHERE status = ? OR (status = ? AND lease_expires < ?)"
+                " ORDER BY rowid LIMIT ?",
+                (PENDING, LEASED, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?"
+                " WHERE key = ?",
+                ((LEASED, worker, now + self.lease_seconds, now, key) for key, _, _ in rows),
+            )
+        return [Job(key, json.loads(payload), attempts + 1) for key, payload, attempts in rows]
+
+    def heartbeat(self, worker: str, keys: Iterable[str]) -> None:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE key = ? AND worker = ? AND status = ?",
+                ((now + self.lease_seconds, now, key, worker, LEASED) for key in keys),
+            )
+
+    def complete(self, worker: str, key: str) -> bool:
+        """Mark ``worker``'s job done; False when its lease expired and the job was claimed again."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, last_error = NULL, lease_expires = NULL, updated_at = ?"
+                " WHERE key = ? AND worker = ? AND status = ?",
+                (DONE, time.time(), key, worker, LEASED),
+            )
+            return cursor.rowcount > 0
+
+    def fail(self, worker: str, key: str, error: str, retry: bool = True) -> bool:
+        """Record a failure; the job is retried until ``max_attempts`` is reached.
+
+        Like :meth:`complete`, only while ``worker`` still holds the lease.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN ? AND attempts < ? THEN ? ELSE ? END,"
+                " last_error = ?, lease_expires = NULL, updated_at = ? WHERE key = ? AND worker = ? AND status = ?",
+                (retry, self.max_attempts, PENDING, FAILED, error, time.time(), key, worker, LEASED),
+            )
+            return cursor.rowcount > 0
+
+    def retry_failed(self) -> int:
+        """Put failed jobs back in the queue with a fresh attempt budget."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), FAILED),
+            )
+            return cursor.rowcount
+
+    def reset(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM jobs")
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def failures(self) -> List[Tuple[str, int, str]]:
+        return self._conn.execute(
+            "SELECT key, attempts, last_error FROM jobs WHERE status = ? ORDER BY key", (FAILED,)
+        ).fetchall()
+
+
+class Heartbeat:
+    """Keep the leases of ``keys`` alive from a background thread."""
+
+    def __init__(self, queue: JobQueue, worker: str, keys: Iterable[str], interval: Optional[float] = None):
+        self.queue_path = queue.path
+        self.lease_seconds = queue.lease_seconds
+        self.worker = worker
+        self.keys = list(keys)
+        self.interval = interval or max(1.0, queue.lease_seconds / 3)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        # sqlite3 connections are per-thread, so the heartbeat opens its own.
+        queue = JobQueue(self.queue_path, lease_seconds=self.lease_seconds)
+        try:
+            while not self._stop.wait(self.interval):
+                queue.heartbeat(self.worker, self.keys)
+        finally:
+            queue.close()
+
+    def __enter__(self) -> "Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(
+    queue: JobQueue,
+    handler: Callable[[Any], None],
+    worker: Optional[str] = None,
+    batch_size: int = 10,
+    on_result: Optional[Callable[[Job, Optional[BaseException]], None]] = None,
+    stop: Optional[Callable[[int], bool]] = None,
+) -> int:
+    """Claim and process jobs until none are claimable; returns jobs processed.
+
+    ``stop(processed)`` is asked before each claim; when it returns True the
+    worker returns early and leaves the remaining jobs to others.
+    """
+    worker = worker or default_worker_id()
+    processed = 0
+    while True:
+        if stop is not None and stop(processed):
+            return processed
+        jobs = queue.claim(worker, limit=batch_size)
+        if not jobs:
+            return processed
+        with Heartbeat(queue, worker, [job.key for job in jobs]):
+            for job in jobs:
+                error: Optional[BaseException] = None
+                try:
+                    handler(job.payload)
+                except PermanentJobError as exc:
+                    error = exc
+                    queue.fail(worker, job.key, str(exc), retry=False)
+                except Exception as exc:
+                    error = exc
+                    queue.fail(worker, job.key, f"{type(exc).__name__}: {exc}")
+                else:
+                    queue.complete(worker, job.key)
+                processed += 1
+                if on_result:
+                    on_result(job, error)
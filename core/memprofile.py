@@ -0,0 +1,174 @@
+"""Opt-in memory profiling and per-worker memory budgets for batch runs.
+
+    profiler = MemoryProfiler()            # starts tracemalloc
+    for journal in journals:
+        with profiler.document(journal.number):
+            generate_one(...)
+    profiler.report()
+
+For every document the profiler records the peak of traced Python memory
+while it was processed (above what was allocated when it started), what it
+left allocated afterwards once garbage cycles are collected, and the
+process RSS. The report lists the
+documents with the highest peaks, the growth across the run, and the source
+lines whose allocations grew most since the first document (the warm-up:
+compiled templates, caches, imports).
+
+tracemalloc only sees memory allocated through Python's allocators. libxml2
+(lxml trees) and other C libraries use malloc directly, which shows up in the
+RSS columns but not in the allocation sites. Steady RSS growth with flat
+traced memory points at such a library.
+
+:class:`MemoryBudget` is the ceiling for worker processes: a worker stops
+after ``max_documents`` documents, or once its RSS exceeds ``max_mb``, and
+the parent starts a fresh one (see generate_contracts.py ``--recycle-*``).
+"""
+import gc
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+MB = 1024 * 1024
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (0 when it cannot be read)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    # Peak rather than current RSS here; kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+@dataclass(frozen=True)
+class DocumentMemory:
+    label: str
+    peak: int  # traced bytes above the start of the document
+    retained: int  # traced bytes still allocated after it
+    rss: int
+    seconds: float
+
+
+class MemoryProfiler:
+    """Per-document peak, retained memory and RSS, plus allocation-site growth."""
+
+    def __init__(self, top: int = 10, frames: int = 1):
+        self.top = top
+        self.documents: List[DocumentMemory] = []
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_here = not tracemalloc.is_tracing()
+        if self._started_here:
+            tracemalloc.start(frames)
+        self._start_traced = tracemalloc.get_traced_memory()[0]
+        self._start_rss = rss_bytes()
+
+    @contextmanager
+    def document(self, label: str) -> Iterator[None]:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            peak = tracemalloc.get_traced_memory()[1]
+            # Unreachable cycles (pdfminer layouts, lxml proxies) are not retained
+            gc.collect()
+            current = tracemalloc.get_traced_memory()[0]
+            self.documents.append(DocumentMemory(
+                str(label), peak - before, current - before, rss_bytes(), time.perf_counter() - started
+            ))
+            if self._baseline is None:
+                self._baseline = self._snapshot()
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),  # the profiler's own records
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def report(self, title: str = "Memory") -> str:
+        """Summary of the run so far; also printed."""
+        if not self.documents:
+            return ""
+        docs = self.documents
+        peaks = [doc.peak for doc in docs]
+        traced = tracemalloc.get_traced_memory()[0]
+        lines = [
+            f"{title}: {len(docs)} document(s), peak per document"
+            f" median {statistics.median(peaks) / MB:.1f} MB, max {max(peaks) / MB:.1f} MB",
+            f"  traced {self._start_traced / MB:.1f} -> {traced / MB:.1f} MB,"
+            f" RSS {self._start_rss / MB:.1f} -> {docs[-1].rss / MB:.1f} MB",
+        ]
+        if len(docs) > 1:
+            # After the first document, which also pays for one-off setup
+            retained = sum(doc.retained for doc in docs[1:])
+            rss_growth = docs[-1].rss - docs[0].rss
+            lines.append(
+                f"  growth after the first document: traced {retained / (len(docs) - 1) / 1024:+.1f} KB,"
+                f" RSS {rss_growth / (len(docs) - 1) / 1024:+.1f} KB per document"
+            )
+        lines.append("  highest peaks:")
+        for doc in sorted(docs, key=lambda doc: doc.peak, reverse=True)[:min(5, self.top)]:
+            lines.append(f"    {doc.peak / MB:8.2f} MB  {doc.seconds:6.2f}s  {doc.label}")
+        if self._baseline is not None and len(docs) > 1:
+            lines.append("  allocation sites that grew since the first document:")
+            grown = [
+                stat for stat in self._snapshot().compare_to(self._baseline, "lineno")[:self.top]
+                if stat.size_diff > 0
+            ]
+            for stat in grown:
+                frame = stat.traceback[0]
+                lines.append(
+                    f"    {stat.size_diff / 1024:+10.1f} KB  {stat.count_diff:+7d} blocks"
+                    f"  {frame.filename}:{frame.lineno}"
+                )
+            if not grown:
+                lines.append("    (none)")
+        text = "\n".join(lines)
+        print(text, flush=True)
+        return text
+
+    def stop(self) -> None:
+        if self._started_here:
+            tracemalloc.stop()
+
+
+@dataclass(frozen=True)
+class MemoryBudget:
+    """When a worker process should hand over to a fresh one."""
+
+    max_documents: Optional[int] = None
+    max_mb: Optional[float] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.max_documents or self.max_mb)
+
+    def exceeded(self, documents: int) -> Optional[str]:
+        """Why the worker should stop after ``documents`` documents, or None.
+
+        Never before the first document: a fresh worker whose baseline RSS is
+        already above ``max_mb`` must still make progress.
+        """
+        if documents <= 0:
+            return None
+        if self.max_documents and documents >= self.max_documents:
+            return f"{documents} documents"
+        if self.max_mb:
+            rss = rss_bytes()
+            if rss > self.max_mb * MB:
+                return f"RSS {rss / MB:.0f} MB"
+        return None
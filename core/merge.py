@@ -0,0 +1,286 @@
+"""Merge many rendered .docx files into one document.
+
+Built on docxcompose's Composer. The stock Composer re-walks the whole
+composed document for every append: it inserts by position, renumbers
+bookmarks and drawing ids, lists all styles per element, and counts sections
+and numbering definitions. Merging n documents therefore costs O(n²).
+DocumentMerger keeps that bookkeeping incremental:
+
+* elements are attached before the body's sectPr instead of inserted by
+  index, and the next free numId/abstractNumId is tracked instead of searched
+  for;
+* bookmark and drawing ids are renumbered once, in :meth:`DocumentMerger.save`;
+* section fix-ups only touch the composed document when the appended one has
+  several sections of its own.
+
+Styles are matched by name, as docxcompose does, so each style is copied at
+most once. Identical abstract numbering definitions are shared. Each
+document gets its own ``w:num`` with start overrides, so lists still restart
+at 1 in every agreement. Documents are separated by a next-page section break
+that carries the first document's page setup, headers and footers.
+
+Sources are consumed one at a time. Only the composed document stays in
+memory, never the list of inputs.
+"""
+from copy import deepcopy
+from io import BytesIO
+from pathlib import Path
+from typing import IO, Dict, Iterable, Optional, Set, Union
+
+from docx import Document
+from docx.document import Document as DocxDocument
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml.section import CT_SectPr
+from docxcompose.composer import Composer
+from docxcompose.properties import CustomProperties
+from docxcompose.utils import xpath
+from lxml import etree
+
+Source = Union[str, Path, bytes, DocxDocument]
+
+
+def _open(source: Source) -> DocxDocument:
+    if isinstance(source, DocxDocument):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        return Document(BytesIO(source))
+    return Document(str(source))
+
+
+def _abstract_num_signature(element) -> bytes:
+    """Canonical XML of an ``w:abstractNum`` without its id and random nsid."""
+    element = deepcopy(element)
+    element.attrib.pop(qn("w:abstractNumId"), None)
+    for tag in ("w:nsid", "w:tmpl"):
+        for child in element.findall(qn(tag)):
+            element.remove(child)
+    return etree.tostring(element, method="c14n")
+
+
+class DocumentMerger(Composer):
+    def __init__(self, first: Source, section_breaks: bool = True):
+        super().__init__(_open(first))
+        self.section_breaks = section_breaks
+        self.documents = 1
+        body = self.doc.element.body
+        self._body_sect_pr = body.find(qn("w:sectPr"))
+        self._numbering = None
+        self._next_num_id: Optional[int] = None
+        self._next_anum_id: Optional[int] = None
+        self._anum_by_signature: Dict[bytes, int] = {}
+        numbering = self._numbering_element()
+        nums = numbering.findall(qn("w:num"))
+        self._first_num = nums[0] if nums else None
+        self._last_num = nums[-1] if nums else None
+        for anum in numbering.findall(qn("w:abstractNum")):
+            self._anum_by_signature.setdefault(
+                _abstract_num_signature(anum), int(anum.get(qn("w:abstractNumId")))
+            )
+
+    # -- appending ---------------------------------------------------------
+
+    def add(self, source: Source) -> None:
+        """Append one document, preceded by a section break."""
+        doc = _open(source)
+        if self.section_breaks and self._body_sect_pr is not None:
+            self._insert_section_break()
+        self.append(doc)
+        self.documents += 1
+
+    def _insert_section_break(self) -> None:
+        # A paragraph-level sectPr ends the section before it; copying the body
+        # sectPr keeps page size, margins and header/footer references.
+        sect_pr = deepcopy(self._body_sect_pr)
+        for start_type in sect_pr.findall(qn("w:type")):
+            sect_pr.remove(start_type)
+        paragraph = parse_xml("<w:p %s><w:pPr/></w:p>" % nsdecls("w"))
+        paragraph[0].append(sect_pr)
+        self._body_sect_pr.addprevious(paragraph)
+
+    def append(self, doc, remove_property_fields: bool = True) -> None:
+        """Composer.insert() at the end of the body.
+
+        lxml's ``insert(index, ...)`` walks the children up to ``index``, so the
+        stock loop is O(body) per element; elements go in before the body
+        sectPr instead.
+        """
+        self.reset_reference_mapping()
+        if remove_property_fields:
+            properties = CustomProperties(doc)
+            for name in properties.keys():
+                properties.dissolve_fields(name)
+        self._create_style_id_mapping(doc)
+
+        body = self.doc.element.body
+        for element in doc.element.body:
+            if isinstance(element, CT_SectPr):
+                continue
+            element = deepcopy(element)
+            if self._body_sect_pr is not None:
+                self._body_sect_pr.addprevious(element)
+            else:
+                body.append(element)
+            self.add_referenced_parts(doc.part, self.doc.part, element)
+            self.add_styles(doc, element)
+            self.add_numberings(doc, element)
+            self.restart_first_numbering(doc, element)
+            self.add_images(doc, element)
+            self.add_diagrams(doc, element)
+            self.add_shapes(doc, element)
+            self.add_footnotes(doc, element)
+            self.remove_header_and_footer_references(doc, element)
+
+        self.add_styles_from_other_parts(doc)
+        self.fix_section_types(doc)
+        self.fix_header_and_footers(doc)
+
+    def reset_reference_mapping(self) -> None:
+        super().reset_reference_mapping()
+        self._styles_handled: Set[str] = set()
+
+    # -- styles ----------------------------------------------------------------
+
+    def add_styles(self, doc, element) -> None:
+        # The stock method lists every style of the composed document for each
+        # element; only call it for style ids this document has not used yet.
+        used = {e.val for e in xpath(element, ".//w:tblStyle|.//w:pStyle|.//w:rStyle")}
+        if used <= self._styles_handled:
+            return
+        super().add_styles(doc, element)
+        # Ids that map to another name must still be rewritten in later elements.
+        self._styles_handled.update(s for s in used if self.mapped_style_id(s) == s)
+
+    # -- deferred renumbering ----------------------------------------------
+
+    def renumber_bookmarks(self) -> None:
+        pass
+
+    def renumber_docpr_ids(self) -> None:
+        pass
+
+    def renumber_nvpicpr_ids(self) -> None:
+        pass
+
+    def save(self, target: Union[str, Path, IO[bytes]]) -> None:
+        Composer.renumber_bookmarks(self)
+        Composer.renumber_docpr_ids(self)
+        Composer.renumber_nvpicpr_ids(self)
+        self.doc.save(str(target) if isinstance(target, Path) else target)
+
+    # -- sections ------------------------------------------------------------
+
+    def fix_section_types(self, doc) -> None:
+        # Cheap test first: the stock check counts the composed document's sections.
+        if len(doc.sections) > 1:
+            super().fix_section_types(doc)
+
+    def fix_header_and_footers(self, doc) -> None:
+        if len(doc.sections) > 1:
+            super().fix_header_and_footers(doc)
+
+    # -- numbering -------------------------------------------------------------
+
+    def numbering_part(self):
+        if self._numbering is None:
+            self._numbering = super().numbering_part()
+        return self._numbering
+
+    def _numbering_element(self):
+        return self.numbering_part().element
+
+    def _next_numbering_ids(self):
+        if self._next_num_id is None:
+            self._next_num_id, self._next_anum_id = super()._next_numbering_ids()
+        return self._next_num_id, self._next_anum_id
+
+    def _insert_num(self, element) -> None:
+        self._next_numbering_ids()
+        if self._last_num is not None:
+            self._last_num.addnext(element)
+        else:
+            self._numbering_element().append(element)
+            self._first_num = element
+        self._last_num = element
+        self._next_num_id = max(self._next_num_id, element.numId + 1)
+
+    def _insert_abstract_num(self, element) -> None:
+        self._next_numbering_ids()
+        if self._first_num is not None:
+            self._first_num.addprevious(element)
+        else:
+            self._numbering_element().append(element)
+        anum_id = int(element.get(qn("w:abstractNumId")))
+        self._next_anum_id = max(self._next_anum_id, anum_id + 1)
+
+    def add_numberings(self, doc, element) -> None:
+        """Copy the numbering definitions ``element`` uses, sharing identical abstract ones."""
+        num_ids = {n.val for n in element.iter(qn("w:numId"))}
+        if not num_ids:
+            return
+        src = doc.part.numbering_part.element
+        for num_id in num_ids:
+            if num_id in self.num_id_mapping:
+                continue
+            found = src.xpath('w:num[@w:numId="%s"]' % num_id)
+            if not found:
+                continue
+            num = deepcopy(found[0])
+            src_anum_id = num.abstractNumId.val
+            anum_id = self.anum_id_mapping.get(src_anum_id)
+            if anum_id is None:
+                anum = src.xpath('w:abstractNum[@w:abstractNumId="%s"]' % src_anum_id)
+                if not anum:
+                    continue
+                signature = _abstract_num_signature(anum[0])
+                anum_id = self._anum_by_signature.get(signature)
+                if anum_id is None:
+                    anum_id = self._next_numbering_ids()[1]
+                    copy = deepcopy(anum[0])
+                    copy.set(qn("w:abstractNumId"), str(anum_id))
+                    self._insert_abstract_num(copy)
+                    self._anum_by_signature[signature] = anum_id
+                self.anum_id_mapping[src_anum_id] = anum_id
+                # Shared definitions continue counting across nums; restart them here.
+                self._add_start_overrides(num, anum[0])
+            num.abstractNumId.val = anum_id
+            num.numId = self._next_numbering_ids()[0]
+            self._insert_num(num)
+            self.num_id_mapping[num_id] = num.numId
+
+        for ref in element.iter(qn("w:numId")):
+            ref.val = self.num_id_mapping.get(ref.val, ref.val)
+
+    @staticmethod
+    def _add_start_overrides(num, anum) -> None:
+        overridden = {o.get(qn("w:ilvl")) for o in num.findall(qn("w:lvlOverride"))}
+        for lvl in anum.findall(qn("w:lvl")):
+            ilvl = lvl.get(qn("w:ilvl"))
+            if ilvl in overridden:
+                continue
+            start = lvl.find(qn("w:start"))
+            value = start.get(qn("w:val")) if start is not None else "0"
+            override = etree.SubElement(num, qn("w:lvlOverride"))
+            override.set(qn("w:ilvl"), ilvl)
+            etree.SubElement(override, qn("w:startOverride")).set(qn("w:val"), value)
+
+
+def merge_documents(
+    sources: Iterable[Source],
+    target: Union[str, Path, IO[bytes]],
+    section_breaks: bool = True,
+) -> int:
+    """Merge ``sources`` in order into ``target``; returns the number of documents.
+
+    ``sources`` may be a generator that renders each agreement on demand.
+    """
+    merger: Optional[DocumentMerger] = None
+    for source in sources:
+        if merger is None:
+            merger = DocumentMerger(source, section_breaks=section_breaks)
+        else:
+            merger.add(source)
+    if merger is None:
+        raise ValueError("Nothing to merge")
+    merger.save(target)
+    return merger.documents
@@ -0,0 +1,176 @@
+"""Direct OOXML render engine for .docx templates.
+
+The template package is read once and split into the XML parts that contain
+Jinja markup (compiled up front) and everything else. Rendering writes a new zip
+where the untouched members are copied byte-for-byte in their already
+compressed form and only the rendered XML parts are deflated again.
+"""
+import re
+import struct
+import zlib
+from io import BytesIO
+from pathlib import Path
+from threading import Lock
+from typing import Any, BinaryIO, Dict, List, Mapping, Tuple, Union
+import zipfile
+
+from jinja2 import Environment, Template
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_LOCAL_HEADER_SIZE = 30
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+# Members that may carry template markup; docxtpl renders the same set.
+_TEMPLATE_PARTS = re.compile(r"^word/(?:document|header\d*|footer\d*|footnotes)\.xml$")
+_JINJA_MARKERS = ("{{", "{%", "{#")
+
+
+def _dos_datetime(date_time: Tuple[int, int, int, int, int, int]) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_time, dos_date
+
+
+class _Member:
+    __slots__ = ("name", "flags", "method", "dos_time", "dos_date", "crc", "raw", "size", "external_attr", "template")
+
+    def __init__(self, info: zipfile.ZipInfo, raw: bytes = b"", template: Template = None):
+        self.name = info.filename.encode("utf-8")
+        # Sizes are always written in the local header, so no data descriptor.
+        self.flags = (info.flag_bits & ~_FLAG_DATA_DESCRIPTOR) | (
+            0 if info.filename.isascii() else _FLAG_UTF8
+        )
+        self.method = info.compress_type
+        self.dos_time, self.dos_date = _dos_datetime(info.date_time)
+        self.crc = info.CRC
+        self.raw = raw
+        self.size = info.file_size
+        self.external_attr = info.external_attr
+        self.template = template
+
+
+class _CountingWriter:
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.offset = 0
+
+    def write(self, data: bytes) -> None:
+        self.out.write(data)
+        self.offset += len(data)
+
+
+class CompiledDocx:
+    """A .docx template pre-processed for repeated, allocation-light rendering."""
+
+    def __init__(self, template_path: Union[str, Path], compresslevel: int = 6):
+        from docxtpl import DocxTemplate
+
+        self.path = Path(template_path)
+        self.compresslevel = compresslevel
+        # patch_xml/resolve_listing only work on strings, so an unloaded
+        # DocxTemplate gives us docxtpl's exact pre/post-processing rules.
+        self._docxtpl = DocxTemplate(str(self.path))
+        self._env = Environment(autoescape=True)
+        self.members: List[_Member] = []
+
+        data = self.path.read_bytes()
+        with zipfile.ZipFile(BytesIO(data)) as archive:
+            for info in archive.infolist():
+                template = None
+                if _TEMPLATE_PARTS.match(info.filename):
+                    template = self._compile_part(archive.read(info).decode("utf-8"))
+                if template is not None:
+                    self.members.append(_Member(info, template=template))
+                else:
+                    self.members.append(_Member(info, raw=self._raw_member(data, info)))
+
+    @property
+    def template_parts(self) -> List[str]:
+        return [member.name.decode("utf-8") for member in self.members if member.template is not None]
+
+    def _compile_part(self, xml: str):
+        xml = self._docxtpl.patch_xml(xml)
+        if not any(marker in xml for marker in _JINJA_MARKERS):
+            return None
+        # Same line layout as DocxTemplate.render_xml_part so error line numbers match.
+        xml = re.sub(r"<w:p([ >])", r"\n<w:p\1", xml)
+        return self._env.from_string(xml)
+
+    @staticmethod
+    def _raw_member(data: bytes, info: zipfile.ZipInfo) -> bytes:
+        header = data[info.header_offset:info.header_offset + _LOCAL_HEADER_SIZE]
+        name_length, extra_length = struct.unpack("<2H", header[26:30])
+        start = info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length
+        return data[start:start + info.compress_size]
+
+    def _render_part(self, template: Template, context: Mapping[str, Any]) -> bytes:
+        xml = template.render(context)
+        xml = re.sub(r"\n<w:p([ >])", r"<w:p\1", xml)
+        xml = xml.replace("{_{", "{{").replace("}_}", "}}").replace("{_%", "{%").replace("%_}", "%}")
+        return self._docxtpl.resolve_listing(xml).encode("utf-8")
+
+    def render(self, context: Mapping[str, Any], out: BinaryIO) -> None:
+        """Write the rendered document to ``out`` (need not be seekable)."""
+        writer = _CountingWriter(out)
+        central: List[bytes] = []
+        for member in self.members:
+            if member.template is None:
+                method, crc, raw, size = member.method, member.crc, member.raw, member.size
+            else:
+                payload = self._render_part(member.template, context)
+                compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15)
+                method, crc, size = zipfile.ZIP_DEFLATED, zlib.crc32(payload), len(payload)
+                raw = compressor.compress(payload) + compressor.flush()
+
+            offset = writer.offset
+            writer.write(
+                _LOCAL_HEADER.pack(
+                    b"PK\x03\x04", 20, member.flags, method, member.dos_time, member.dos_date,
+                    crc, len(raw), size, len(member.name), 0,
+                )
+            )
+            writer.write(member.name)
+            writer.write(raw)
+            central.append(
+                _CENTRAL_HEADER.pack(
+                    b"PK\x01\x02", 20, 20, member.flags, method, member.dos_time, member.dos_date,
+                    crc, len(raw), size, len(member.name), 0, 0, 0, 0, member.external_attr, offset,
+                )
+                + member.name
+            )
+
+        central_offset = writer.offset
+        for entry in central:
+            writer.write(entry)
+        writer.write(
+            _END_RECORD.pack(
+                b"PK\x05\x06", 0, 0, len(central), len(central),
+                writer.offset - central_offset, central_offset, 0,
+            )
+        )
+
+    def render_to_buffer(self, context: Mapping[str, Any]) -> BytesIO:
+        buffer = BytesIO()
+        self.render(context, buffer)
+        buffer.seek(0)
+        return buffer
+
+
+_compiled: Dict[Path, Tuple[int, CompiledDocx]] = {}
+_compiled_lock = Lock()
+
+
+def load_compiled(template_path: Union[str, Path]) -> CompiledDocx:
+    """Return a process-wide CompiledDocx, recompiled when the file changes."""
+    path = Path(template_path).resolve()
+    mtime_ns = path.stat().st_mtime_ns
+    with _compiled_lock:
+        cached = _compiled.get(path)
+        if cached is None or cached[0] != mtime_ns:
+            cached = (mtime_ns, CompiledDocx(path))
+            _compiled[path] = cached
+        return cached[1]
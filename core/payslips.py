@@ -0,0 +1,106 @@
+"""Several months of payslips: concurrent extraction and one combined answer.
+
+Each payslip is read with :func:`core.extractors.extract_from_payslip`, one
+document per task in the pdftext process pool. A batch therefore takes about
+as long as its slowest payslip rather than the sum of all of them.
+
+:func:`combine` orders the payslips by period (PeriodFrom/PeriodTo) and
+merges their fields into one field dict, the same keys a single payslip
+gives:
+
+* MonthlySalary, P_Name: from the latest payslip that has them;
+* BonusAmount, BonusYear: from the latest payslip that shows a bonus, so a
+  bonus paid in any month is found;
+* PeriodFrom/PeriodTo: the first and last period covered.
+
+:func:`salary_changes` lists the months in which the salary changed.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from . import pdftext
+from .extractors import ExtractionTimeout, extract_from_payslip
+
+# Fields where the latest payslip that has a value wins
+LATEST_FIELDS = ("MonthlySalary", "P_Name")
+
+
+@dataclass(frozen=True)
+class Payslip:
+    name: str
+    fields: Dict[str, str]
+    text: str = ""
+    complete: bool = True  # False when the time budget ran out (``fields`` is partial)
+
+    @property
+    def period(self) -> str:
+        """ISO date to order by; "" for a payslip without a readable period."""
+        return self.fields.get("PeriodTo") or self.fields.get("PeriodFrom") or ""
+
+
+@dataclass
+class SalaryChange:
+    period: str
+    salary: str
+    previous: Optional[str] = None
+    payslips: List[str] = field(default_factory=list)
+
+
+def _extract_one(job: Tuple[str, str, Optional[str]]) -> Payslip:
+    # Runs in a pool worker: an ExtractionTimeout would not survive pickling
+    name, pdf_path, backend = job
+    texts: List[str] = []
+    try:
+        fields = extract_from_payslip(pdf_path, backend=backend, text_callback=texts.append)
+        return Payslip(name, fields, "".join(texts))
+    except ExtractionTimeout as exc:
+        return Payslip(name, exc.partial, "".join(texts), complete=False)
+
+
+def extract_payslips(files: Sequence[Tuple[str, str]], backend: Optional[str] = None) -> List[Payslip]:
+    """Extract ``(name, pdf_path)`` pairs concurrently; results in input order."""
+    return pdftext.map_documents(_extract_one, [(name, path, backend) for name, path in files])
+
+
+def ordered(payslips: Sequence[Payslip]) -> List[Payslip]:
+    """Oldest first; payslips without a period come first, so dated ones win in :func:`combine`."""
+    return sorted(payslips, key=lambda payslip: payslip.period)
+
+
+def combine(payslips: Sequence[Payslip]) -> Dict[str, str]:
+    """One field dict for all payslips (see the module docstring)."""
+    out: Dict[str, str] = {}
+    periods = []
+    for payslip in ordered(payslips):
+        fields = payslip.fields
+        for name in LATEST_FIELDS:
+            if fields.get(name):
+                out[name] = fields[name]
+        if fields.get("BonusAmount"):
+            out["BonusAmount"] = fields["BonusAmount"]
+            if fields.get("BonusYear"):
+                out["BonusYear"] = fields["BonusYear"]
+        periods.extend(fields[key] for key in ("PeriodFrom", "PeriodTo") if fields.get(key))
+    if "BonusYear" not in out:
+        # No bonus paid: the year of the latest period, as for a single payslip
+        years = [payslip.fields["BonusYear"] for payslip in ordered(payslips) if payslip.fields.get("BonusYear")]
+        if years:
+            out["BonusYear"] = years[-1]
+    if periods:
+        out["PeriodFrom"], out["PeriodTo"] = min(periods), max(periods)
+    return out
+
+
+def salary_changes(payslips: Sequence[Payslip]) -> List[SalaryChange]:
+    """The first salary seen and every later change, oldest first."""
+    changes: List[SalaryChange] = []
+    for payslip in ordered(payslips):
+        salary = payslip.fields.get("MonthlySalary")
+        if not salary:
+            continue
+        if changes and changes[-1].salary == salary:
+            changes[-1].payslips.append(payslip.name)
+            continue
+        previous = changes[-1].salary if changes else None
+        changes.append(SalaryChange(payslip.period, salary, previous, [payslip.name]))
+    return changes
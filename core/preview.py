@@ -0,0 +1,123 @@
+"""Incremental HTML preview of Markdown templates.
+
+The template is split into sections at every top-level ``##`` heading, meaning
+a heading outside any ``{% if %}``/``{% for %}`` block; headings inside a
+block stay with the section that opens the block. Each section is compiled
+once and knows the variables it references. The HTML of a section is cached
+under the values of exactly those variables, so ticking one checkbox only
+re-renders the one or two sections that use it.
+"""
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, FrozenSet, List, Mapping, Tuple, Union
+
+import markdown
+from cachetools import LRUCache
+from jinja2 import Environment, Template, meta
+
+_BLOCK_OPEN = re.compile(r"{%-?\s*(if|for)\b")
+_BLOCK_CLOSE = re.compile(r"{%-?\s*end(if|for)\b")
+# Pandoc raw-OpenXML blocks (page breaks) mean nothing in HTML
+_RAW_OPENXML = re.compile(r"^```\{=openxml\}\n.*?^```\n?", re.M | re.S)
+
+PREVIEW_CSS = """
+<style>
+.contract-preview { font-family: Verdana, sans-serif; font-size: 9pt; line-height: 1.4; counter-reset: section; }
+.contract-preview h1, .contract-preview h2 { font-size: 9pt; font-weight: bold; margin: 12pt 0; }
+.contract-preview h2 { counter-increment: section; }
+.contract-preview h2::before { content: counter(section) " "; }
+.contract-preview p, .contract-preview li { margin: 0 0 12pt 0; }
+</style>
+"""
+
+_env = Environment(autoescape=True)
+
+
+def split_sections(source: str) -> List[str]:
+    """Split Markdown/Jinja source before every ``##`` heading at block depth 0."""
+    sections: List[List[str]] = [[]]
+    depth = 0
+    for line in source.splitlines(keepends=True):
+        if depth == 0 and line.startswith("##") and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+        depth += len(_BLOCK_OPEN.findall(line)) - len(_BLOCK_CLOSE.findall(line))
+    return ["".join(lines) for lines in sections]
+
+
+def _frozen(value: Any) -> Any:
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+@dataclass(frozen=True)
+class PreviewSection:
+    template: Template
+    variables: FrozenSet[str]
+    order: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class PreviewResult:
+    html: str
+    rendered: int  # sections that had to be re-rendered
+    sections: int
+    milliseconds: float
+
+
+class TemplatePreview:
+    def __init__(self, template_path: Union[str, Path], cache_size: int = 1024):
+        self.path = Path(template_path)
+        source = _RAW_OPENXML.sub("", self.path.read_text(encoding="utf-8"))
+        self.sections: List[PreviewSection] = []
+        for text in split_sections(source):
+            variables = frozenset(meta.find_undeclared_variables(_env.parse(text)))
+            self.sections.append(PreviewSection(_env.from_string(text), variables, tuple(sorted(variables))))
+        self._cache: LRUCache = LRUCache(maxsize=cache_size)
+        self._lock = Lock()
+
+    def _section_html(self, index: int, section: PreviewSection, context: Mapping[str, Any]) -> Tuple[str, bool]:
+        key = (index,) + tuple(_frozen(context.get(name)) for name in section.order)
+        with self._lock:
+            html = self._cache.get(key)
+        if html is not None:
+            return html, False
+        values = {name: context.get(name) for name in section.order}
+        html = markdown.markdown(section.template.render(values), extensions=["extra", "nl2br"])
+        with self._lock:
+            self._cache[key] = html
+        return html, True
+
+    def render(self, context: Mapping[str, Any]) -> PreviewResult:
+        """Full preview as an HTML fragment; only sections whose inputs changed are rendered."""
+        started = time.perf_counter()
+        parts = [self._section_html(index, section, context) for index, section in enumerate(self.sections)]
+        body = "".join(html for html, _ in parts)
+        return PreviewResult(
+            html=f'{PREVIEW_CSS}<div class="contract-preview">{body}</div>',
+            rendered=sum(1 for _, fresh in parts if fresh),
+            sections=len(parts),
+            milliseconds=(time.perf_counter() - started) * 1000,
+        )
+
+
+_previews: Dict[Path, Tuple[int, TemplatePreview]] = {}
+_previews_lock = Lock()
+
+
+def load_preview(template_path: Union[str, Path]) -> TemplatePreview:
+    """Return a process-wide TemplatePreview, rebuilt when the file changes."""
+    path = Path(template_path).resolve()
+    mtime_ns = path.stat().st_mtime_ns
+    with _previews_lock:
+        cached = _previews.get(path)
+        if cached is None or cached[0] != mtime_ns:
+            cached = (mtime_ns, TemplatePreview(path))
+            _previews[path] = cached
+        return cached[1]
@@ -0,0 +1,197 @@
+"""Compact in-memory records for Legis365 contacts and journals.
+
+contacts.json / journals.json are lists of dicts in which every record repeats
+the same keys and a handful of low-cardinality values ("Archived", lawyer
+initials, journal type ids). The record classes below store one slot per known
+key, intern the low-cardinality strings, keep rarely-read nested fields as
+compact JSON text that is only decoded on access, and are built one by one
+from a streaming JSON reader, so the full list of dicts never exists.
+
+Records behave as read-only mappings with the original JSON keys, so code
+and templates written against the dicts (``j.get("clientId")``,
+``{{ client.name }}``) keep working.
+"""
+import json
+import sys
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterator, List, TextIO, Tuple, Type, TypeVar, Union
+
+_COMPACT = (",", ":")
+
+
+class _LazyJSON:
+    """Descriptor exposing a slot holding compact JSON text as decoded data."""
+
+    def __init__(self, key: str):
+        self.slot = f"_{key}_raw"
+
+    def __get__(self, record, owner=None):
+        if record is None:
+            return self
+        raw = getattr(record, self.slot)
+        return None if raw is None else json.loads(raw)
+
+
+def _compact(value: Any, intern: bool) -> Any:
+    if intern and isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        # Lists become tuples: smaller, and the empty one is a shared singleton.
+        return tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+    return value
+
+
+class Record(Mapping):
+    __slots__ = ("_extra",)
+
+    KEYS: Tuple[str, ...] = ()
+    INTERNED: FrozenSet[str] = frozenset()
+    LAZY: FrozenSet[str] = frozenset()
+
+    def __init__(self, data: Mapping[str, Any]):
+        for key in self.KEYS:
+            value = data.get(key)
+            if key in self.LAZY:
+                raw = None if value is None else sys.intern(
+                    json.dumps(value, ensure_ascii=False, separators=_COMPACT)
+                )
+                setattr(self, f"_{key}_raw", raw)
+            else:
+                setattr(self, key, _compact(value, key in self.INTERNED))
+        extra = {key: value for key, value in data.items() if key not in self._key_set}
+        self._extra = extra or None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._key_set = frozenset(cls.KEYS)
+        for key in cls.LAZY:
+            setattr(cls, key, _LazyJSON(key))
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._key_set:
+            return getattr(self, key)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._key_set:
+            return getattr(self, key)
+        if self._extra:
+            return self._extra.get(key, default)
+        return default
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.KEYS
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return len(self.KEYS) + len(self._extra or ())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain JSON-compatible dict (tuples back to lists)."""
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in self.items()}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={self.get('id')!r}, name={self.get('name')!r})"
+
+
+class Contact(Record):
+    KEYS = (
+        "id", "number", "createdAt", "name", "address", "emails", "phone", "ssn", "vatNo",
+        "enabled", "engagementLetterConfirmed", "legitimationConfirmed", "legitimationDate",
+        "legitimationComment", "riskAssessment",
+        # derived at sync time, see core.derived
+        "street", "postalCode", "city", "addressLine", "searchKey", "slug", "sourceHash",
+    )
+    INTERNED = frozenset({"createdAt", "riskAssessment", "legitimationDate", "phone", "postalCode", "city"})
+    __slots__ = KEYS
+
+
+class Journal(Record):
+    KEYS = (
+        "id", "createdAt", "number", "name", "address", "phone", "email", "clientId",
+        "journalTypeId", "teamId", "departmentId", "active", "archived", "archivedAt",
+        "archiveNumber", "courtReference", "clientReference", "counterPartyReference",
+        "fixedFee", "expectedFee", "hourlyRate", "lawyer", "secretary", "responsibleLawyer",
+        "lawyers", "secretaries", "responsibleLawyers", "state",
+        # derived at sync time, see core.derived
+        "street", "postalCode", "city", "addressLine", "searchKey", "slug", "isActive", "sourceHash",
+        "fields",
+    )
+    INTERNED = frozenset({
+        "createdAt", "clientId", "journalTypeId", "teamId", "departmentId", "archivedAt",
+        "lawyer", "secretary", "responsibleLawyer", "state", "postalCode", "city",
+    })
+    LAZY = frozenset({"fields"})
+    # "fields" is the last key and is stored as raw JSON
+    __slots__ = KEYS[:-1] + ("_fields_raw",)
+
+
+def iter_json_array(fh: TextIO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer = fh.read(chunk_size)
+    eof = not buffer
+    index = 0
+    started = False
+
+    while True:
+        while True:
+            while index < len(buffer) and buffer[index] in " \t\r\n,":
+                if buffer[index] == "," and not started:
+                    raise ValueError("Malformed JSON array")
+                index += 1
+            if index < len(buffer) or eof:
+                break
+            buffer, index = fh.read(chunk_size), 0
+            eof = not buffer
+
+        if index >= len(buffer):
+            raise ValueError("Unexpected end of JSON array")
+        char = buffer[index]
+        if not started:
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            index += 1
+            continue
+        if char == "]":
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, index)
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            more = fh.read(chunk_size)
+            eof = not more
+            buffer, index = buffer[index:] + more, 0
+            continue
+
+        yield value
+        index = end
+        if index > chunk_size:
+            buffer, index = buffer[index:], 0
+
+
+R = TypeVar("R", bound=Record)
+
+
+def iter_records(path: Union[str, Path], record_type: Type[R]) -> Iterator[R]:
+    with open(path, encoding="utf-8") as fh:
+        for item in iter_json_array(fh):
+            yield record_type(item)
+
+
+def load_journals(path: Union[str, Path] = "journals.json") -> List[Journal]:
+    return list(iter_records(path, Journal))
+
+
+def load_contacts(path: Union[str, Path] = "contacts.json") -> Dict[str, Contact]:
+    return {contact.id: contact for contact in iter_records(path, Contact)}
@@ -0,0 +1,177 @@
+"""Content-addressed cache of rendered documents.
+
+Keys are ``sha256(template bytes, canonical context JSON, output format)``.
+Any change to the template file or to a single context value gives a new
+key, so entries never need invalidating. Rendering the same inputs again
+(repeat clicks, Streamlit reruns, another user, a batch rerun) returns the
+stored bytes.
+
+* Memory tier: LRU bounded by total bytes.
+* Disk tier (optional): one file per key under ``disk_dir``, shared between
+  processes and restarts, pruned least-recently-used first above
+  ``disk_maxbytes``.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+from collections.abc import Mapping
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from cachetools import LRUCache
+
+# Bump when a renderer changes its output for the same inputs.
+CACHE_VERSION = "1"
+
+_digest_cache: Dict[str, Tuple[int, int, str]] = {}
+_digest_lock = Lock()
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """sha256 of a file's content; re-hashed only when its size or mtime changes."""
+    path = str(path)
+    stat = os.stat(path)
+    with _digest_lock:
+        cached = _digest_cache.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _digest_lock:
+        _digest_cache[path] = (stat.st_mtime_ns, stat.st_size, value)
+    return value
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+
+def context_digest(context: Mapping[str, Any]) -> str:
+    """Order-independent hash of a render context (records, dates etc. included)."""
+    payload = json.dumps(
+        context, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=_canonical
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_key(
+    template_path: Union[str, Path],
+    context: Mapping[str, Any],
+    output_format: str,
+    extra_files: Tuple[Union[str, Path], ...] = (),
+) -> str:
+    """Key for one rendered output; ``extra_files`` are other inputs (e.g. a reference.docx)."""
+    parts = [CACHE_VERSION, output_format, file_digest(template_path), context_digest(context)]
+    parts.extend(file_digest(path) for path in extra_files if Path(path).exists())
+    return hashlib.sha256("\0".join(parts).encode("ascii")).hexdigest()
+
+
+class RenderCache:
+    def __init__(
+        self,
+        maxbytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[Union[str, Path]] = None,
+        disk_maxbytes: int = 1024 * 1024 * 1024,
+    ):
+        self._memory: LRUCache = LRUCache(maxsize=maxbytes, getsizeof=len)
+        self._lock = Lock()
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_maxbytes = disk_maxbytes
+        self._disk_bytes: Optional[int] = None  # running estimate; scanned on first write
+        self.stats: Counter = Counter()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+        if data is not None:
+            self.stats["memory_hit"] += 1
+            return data
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                self.stats["disk_hit"] += 1
+                os.utime(path)  # keeps recently used files out of the prune
+                self._remember(key, data)
+                return data
+        self.stats["miss"] += 1
+        return None
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self._memory.maxsize:
+            return
+        with self._lock:
+            self._memory[key] = data
+
+    def put(self, key: str, data: bytes) -> None:
+        self._remember(key, data)
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+        self.stats["disk_write"] += 1
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(f.stat().st_size for f in self.disk_dir.glob("??/*"))
+            else:
+                self._disk_bytes += len(data)
+            over = self._disk_bytes > self.disk_maxbytes
+        if over:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Delete least recently used files until the tier is at 90% of its budget."""
+        files = []
+        total = 0
+        for path in self.disk_dir.glob("??/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        target = self.disk_maxbytes * 0.9
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+
+render_cache = RenderCache(
+    maxbytes=int(os.getenv("CONTRACTGEN_RENDER_CACHE_MB", "64")) * 1024 * 1024,
+    disk_dir=os.getenv("CONTRACTGEN_RENDER_CACHE_DIR") or None,
+)
@@ -1,6 +1,6 @@
 from io import BytesIO
 from pathlib import Path
-from typing import Dict, Mapping
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
 import tempfile
 import os
 
@@ -8,6 +8,8 @@ from docxtpl import DocxTemplate
 from jinja2 import Template
 import markdown
 
+from .ooxml import load_compiled
+from .render_cache import RenderCache, cache_key, render_cache
 from .utils import format_currency, parse_dk_amount, format_date_long
 
 # Import WeasyPrint only when needed (for PDF rendering)
@@ -19,117 +21,146 @@ except (ImportError, OSError):
     HTML = None
 
 
-def build_fratradelse_context(
-    contract_data: Mapping[str, str],
-    payslip_data: Mapping[str, str],
-    ui_data: Mapping[str, str],
-) -> Dict[str, str]:
-    """Build context dictionary for fratradelse template rendering."""
+def _formatted_amount(raw):
+    """Format a Danish amount for display, falling back to the raw input."""
+    normalized = parse_dk_amount(raw) if raw else ""
+    formatted = format_currency(normalized) if normalized else ""
+    return formatted or raw
+
+
+def _monthly_salary(contract_data, payslip_data, ui_data) -> str:
     salary = (
         payslip_data.get("MonthlySalary")
         or contract_data.get("MonthlySalary")
         or ui_data.get("MonthlySalary")
     )
     normalized_salary = parse_dk_amount(salary) or salary
+    return format_currency(normalized_salary) if normalized_salary else ""
+
+
+def _bonus1_field(key: str) -> Callable[[Mapping, Mapping, Mapping], Any]:
+    # Year/amount fields are only filled in when the Bonus1 section is enabled
+    def field(contract_data, payslip_data, ui_data):
+        return ui_data.get(key) if ui_data.get("Bonus1") else ""
+
+    return field
+
+
+def _ui(key: str, default: Any = None) -> Callable[[Mapping, Mapping, Mapping], Any]:
+    return lambda contract_data, payslip_data, ui_data: ui_data.get(key, default)
+
+
+def _ui_amount(key: str, default: Any = None) -> Callable[[Mapping, Mapping, Mapping], Any]:
+    return lambda contract_data, payslip_data, ui_data: _formatted_amount(ui_data.get(key, default))
+
+
+def _ui_date(key: str) -> Callable[[Mapping, Mapping, Mapping], Any]:
+    return lambda contract_data, payslip_data, ui_data: format_date_long(ui_data.get(key))
+
+
+def _extracted(key: str) -> Callable[[Mapping, Mapping, Mapping], Any]:
+    return lambda contract_data, payslip_data, ui_data: contract_data.get(key) or ui_data.get(key)
+
+
+# Every context field of the Fratrædelsesaftale and how to compute it from
+# (contract_data, payslip_data, ui_data). Fields are evaluated on demand so a
+# template only pays for the variables it actually references.
+FRATRAEDELSE_FIELDS: Dict[str, Callable[[Mapping, Mapping, Mapping], Any]] = {
+    # Company info
+    "C_Name": _extracted("C_Name"),
+    "C_Address": _ui("C_Address", ""),
+    "C_CoRegCVR": _extracted("C_CoRegCVR"),
+    "C_Representative": _ui("C_Representative", ""),
+    # Person info
+    "P_Name": _extracted("P_Name"),
+    "P_Address": _ui("P_Address", ""),
+    # Salary
+    "MonthlySalary": _monthly_salary,
+    # Compensation
+    "CompensationAmount": _ui_amount("CompensationAmount"),
+    "CompensationNoMonths": _ui("CompensationNoMonths"),
+    "CompensationFixedAmount": _ui("CompensationFixedAmount"),
+    "NoCompensationMonths": _ui("NoCompensationMonths"),
+    "PensionCompensationAmount": _ui_amount("PensionCompensationAmount", ""),
+    "fixedCompensationAmount": _ui("fixedCompensationAmount"),
+    "fixedCompensationNumber": _ui_amount("fixedCompensationNumber", ""),
+    # Bonus fields
+    "Bonus1": _ui("Bonus1"),
+    "Bonus2": _ui("Bonus2"),
+    "CashBonusProgram": _ui("CashBonusProgram", ""),
+    "BonusYear1": _bonus1_field("BonusYear1"),
+    "BonusAmount1": lambda c, p, u: _formatted_amount(_bonus1_field("BonusAmount1")(c, p, u)),
+    "BonusYear2": _bonus1_field("BonusYear2"),
+    "BonusAmount2": lambda c, p, u: _formatted_amount(_bonus1_field("BonusAmount2")(c, p, u)),
+    # LTI fields
+    "LTIEligible": _ui("LTIEligible"),
+    "LTIRights": _ui("LTIRights"),
+    # Date fields - format all dates to Danish long form (e.g., "15. August 2022")
+    "EmploymentStart": lambda c, p, u: format_date_long(c.get("EmploymentStart") or u.get("EmploymentStart")),
+    "ContractSignedDate": _ui_date("ContractSignedDate"),
+    "TerminationDate": _ui_date("TerminationDate"),
+    "SeparationDate": _ui_date("SeparationDate"),
+    "ReleaseDate": _ui_date("ReleaseDate"),
+    "AcceptanceDeadline": _ui("AcceptanceDeadline", ""),
+    # Holiday
+    "HolidayLeave": _ui("HolidayLeave"),
+    "NoHolidayDays": _ui("NoHolidayDays", ""),
+    # Benefits
+    "HealthInsuranceIncluded": _ui("HealthInsuranceIncluded"),
+    "PensionIncluded": _ui("PensionIncluded"),
+    "PensionPercentage": _ui("PensionPercentage"),
+    "PensionAmount": _ui_amount("PensionAmount"),
+    "LunchSchemeIncluded": _ui("LunchSchemeIncluded"),
+    # Contact info
+    "PhoneNumber": _ui("PhoneNumber"),
+    "ManagerName": _ui("ManagerName"),
+    # Mobile compensation
+    "MobileCompIncluded": _ui("MobileCompIncluded"),
+    "PhoneComp": _ui("PhoneComp"),
+    "MobileCompStartDate": _ui_date("MobileCompStartDate"),
+    # Court and tax
+    "Court": _ui("Court"),
+    "CityCourt": _ui("CityCourt"),
+    "Tax": _ui("Tax"),
+    "noAssistance": _ui("noAssistance"),
+    "EmployeeLawyer": _ui("EmployeeLawyer", ""),
+    "noOffset": _ui("noOffset"),
+    # Service years
+    "years_12": _ui("years_12"),
+    "years_17": _ui("years_17"),
+}
 
-    # Handle Bonus1
-    bonus1_enabled = ui_data.get("Bonus1")
-    bonus1_year = ui_data.get("BonusYear1") if bonus1_enabled else ""
-    bonus1_amount_raw = ui_data.get("BonusAmount1") if bonus1_enabled else ""
-    bonus1_amount_normalized = parse_dk_amount(bonus1_amount_raw) if bonus1_amount_raw else ""
-    bonus1_amount_formatted = format_currency(bonus1_amount_normalized) if bonus1_amount_normalized else ""
-
-    # Handle Bonus2 (optional second bonus within Bonus1 section)
-    bonus2_year = ui_data.get("BonusYear2") if bonus1_enabled else ""
-    bonus2_amount_raw = ui_data.get("BonusAmount2") if bonus1_enabled else ""
-    bonus2_amount_normalized = parse_dk_amount(bonus2_amount_raw) if bonus2_amount_raw else ""
-    bonus2_amount_formatted = format_currency(bonus2_amount_normalized) if bonus2_amount_normalized else ""
-
-    # Handle pension amounts
-    pension_amount_raw = ui_data.get("PensionAmount")
-    pension_amount_normalized = parse_dk_amount(pension_amount_raw) if pension_amount_raw else ""
-    pension_amount_formatted = format_currency(pension_amount_normalized) if pension_amount_normalized else ""
-
-    # Handle compensation amounts
-    comp_amount_raw = ui_data.get("CompensationAmount")
-    comp_amount_normalized = parse_dk_amount(comp_amount_raw) if comp_amount_raw else ""
-    comp_amount_formatted = format_currency(comp_amount_normalized) if comp_amount_normalized else ""
-
-    pension_comp_amount_raw = ui_data.get("PensionCompensationAmount", "")
-    pension_comp_normalized = parse_dk_amount(pension_comp_amount_raw) if pension_comp_amount_raw else ""
-    pension_comp_formatted = format_currency(pension_comp_normalized) if pension_comp_normalized else ""
-
-    fixed_comp_raw = ui_data.get("fixedCompensationNumber", "")
-    fixed_comp_normalized = parse_dk_amount(fixed_comp_raw) if fixed_comp_raw else ""
-    fixed_comp_formatted = format_currency(fixed_comp_normalized) if fixed_comp_normalized else ""
-
-    return {
-        # Company info
-        "C_Name": contract_data.get("C_Name") or ui_data.get("C_Name"),
-        "C_Address": ui_data.get("C_Address", ""),
-        "C_CoRegCVR": contract_data.get("C_CoRegCVR") or ui_data.get("C_CoRegCVR"),
-        "C_Representative": ui_data.get("C_Representative", ""),
-        # Person info
-        "P_Name": contract_data.get("P_Name") or ui_data.get("P_Name"),
-        "P_Address": ui_data.get("P_Address", ""),
-        # Salary
-        "MonthlySalary": format_currency(normalized_salary) if normalized_salary else "",
-        # Compensation
-        "CompensationAmount": comp_amount_formatted or comp_amount_raw,
-        "CompensationNoMonths": ui_data.get("CompensationNoMonths"),
-        "CompensationFixedAmount": ui_data.get("CompensationFixedAmount"),
-        "NoCompensationMonths": ui_data.get("NoCompensationMonths"),
-        "PensionCompensationAmount": pension_comp_formatted or pension_comp_raw,
-        "fixedCompensationAmount": ui_data.get("fixedCompensationAmount"),
-        "fixedCompensationNumber": fixed_comp_formatted or fixed_comp_raw,
-        # Bonus fields
-        "Bonus1": ui_data.get("Bonus1"),
-        "Bonus2": ui_data.get("Bonus2"),
-        "CashBonusProgram": ui_data.get("CashBonusProgram", ""),
-        "BonusYear1": bonus1_year,
-        "BonusAmount1": bonus1_amount_formatted or bonus1_amount_raw,
-        "BonusYear2": bonus2_year,
-        "BonusAmount2": bonus2_amount_formatted or bonus2_amount_raw,
-        # LTI fields
-        "LTIEligible": ui_data.get("LTIEligible"),
-        "LTIRights": ui_data.get("LTIRights"),
-        # Date fields - format all dates to Danish long form (e.g., "15. August 2022")
-        "EmploymentStart": format_date_long(contract_data.get("EmploymentStart") or ui_data.get("EmploymentStart")),
-        "ContractSignedDate": format_date_long(ui_data.get("ContractSignedDate")),
-        "TerminationDate": format_date_long(ui_data.get("TerminationDate")),
-        "SeparationDate": format_date_long(ui_data.get("SeparationDate")),
-        "ReleaseDate": format_date_long(ui_data.get("ReleaseDate")),
-        "AcceptanceDeadline": ui_data.get("AcceptanceDeadline", ""),
-        # Holiday
-        "HolidayLeave": ui_data.get("HolidayLeave"),
-        "NoHolidayDays": ui_data.get("NoHolidayDays", ""),
-        # Benefits
-        "HealthInsuranceIncluded": ui_data.get("HealthInsuranceIncluded"),
-        "PensionIncluded": ui_data.get("PensionIncluded"),
-        "PensionPercentage": ui_data.get("PensionPercentage"),
-        "PensionAmount": pension_amount_formatted or pension_amount_raw,
-        "LunchSchemeIncluded": ui_data.get("LunchSchemeIncluded"),
-        # Contact info
-        "PhoneNumber": ui_data.get("PhoneNumber"),
-        "ManagerName": ui_data.get("ManagerName"),
-        # Mobile compensation
-        "MobileCompIncluded": ui_data.get("MobileCompIncluded"),
-        "PhoneComp": ui_data.get("PhoneComp"),
-        "MobileCompStartDate": format_date_long(ui_data.get("MobileCompStartDate")),
-        # Court and tax
-        "Court": ui_data.get("Court"),
-        "CityCourt": ui_data.get("CityCourt"),
-        "Tax": ui_data.get("Tax"),
-        "noAssistance": ui_data.get("noAssistance"),
-        "EmployeeLawyer": ui_data.get("EmployeeLawyer", ""),
-        "noOffset": ui_data.get("noOffset"),
-        # Service years
-        "years_12": ui_data.get("years_12"),
-        "years_17": ui_data.get("years_17"),
-    }
-
-
-def render_docx(template_path: Path, context: Mapping[str, str]) -> BytesIO:
+
+def build_fratradelse_context(
+    contract_data: Mapping[str, str],
+    payslip_data: Mapping[str, str],
+    ui_data: Mapping[str, str],
+    fields: Optional[Iterable[str]] = None,
+) -> Dict[str, str]:
+    """Build context dictionary for fratradelse template rendering.
+
+    Pass ``fields`` (e.g. ``TemplateInfo.variables``) to evaluate only the
+    entries a template references; names without a known field are skipped.
+    """
+    names = FRATRAEDELSE_FIELDS if fields is None else [name for name in fields if name in FRATRAEDELSE_FIELDS]
+    return {name: FRATRAEDELSE_FIELDS[name](contract_data, payslip_data, ui_data) for name in names}
+
+
+DOCX_ENGINES = ("docxtpl", "ooxml")
+REFERENCE_DOCX = Path("templates/reference.docx")
+
+
+def render_docx(template_path: Path, context: Mapping[str, str], engine: str = "docxtpl") -> BytesIO:
+    """Render a .docx template.
+
+    ``engine="ooxml"`` uses the cached, zip-streaming engine in ``core.ooxml``
+    which skips python-docx entirely; it autoescapes values and does not run
+    docxtpl's table/picture post-processing.
+    """
+    if engine == "ooxml":
+        return load_compiled(template_path).render_to_buffer(context)
+    if engine != "docxtpl":
+        raise ValueError(f"Unknown docx engine: {engine!r} (expected one of {DOCX_ENGINES})")
     template = DocxTemplate(str(template_path))
     template.render(context)
     buffer = BytesIO()
@@ -246,8 +277,8 @@ def render_markdown_to_docx(template_path: Path, context: Mapping[str, str]) ->
         try:
             # Convert markdown to docx using pypandoc
             extra_args = []
-            if Path('templates/reference.docx').exists():
-                extra_args.append('--reference-doc=templates/reference.docx')
+            if REFERENCE_DOCX.exists():
+                extra_args.append(f'--reference-doc={REFERENCE_DOCX}')
 
             pypandoc.convert_file(
                 temp_md_path,
@@ -293,8 +324,8 @@ def render_markdown_to_docx(template_path: Path, context: Mapping[str, str]) ->
         try:
             # Convert markdown to docx using pandoc command
             cmd = ['pandoc', temp_md_path, '-o', temp_docx_path]
-            if Path('templates/reference.docx').exists():
-                cmd.extend(['--reference-doc=templates/reference.docx'])
+            if REFERENCE_DOCX.exists():
+                cmd.extend([f'--reference-doc={REFERENCE_DOCX}'])
 
             subprocess.run(cmd, check=True)
 
@@ -310,3 +341,23 @@ def render_markdown_to_docx(template_path: Path, context: Mapping[str, str]) ->
                 os.unlink(temp_md_path)
             if os.path.exists(temp_docx_path):
                 os.unlink(temp_docx_path)
+
+
+def render_document(
+    template_path: Path,
+    context: Mapping[str, Any],
+    engine: str = "docxtpl",
+    cache: Optional[RenderCache] = None,
+) -> bytes:
+    """Render a .docx or .md template to .docx bytes, reusing identical earlier renders.
+
+    The cache key covers the template content, the full context and the
+    engine (plus reference.docx for Markdown templates), see core.render_cache.
+    """
+    template_path = Path(template_path)
+    cache = render_cache if cache is None else cache
+    if template_path.suffix == ".md":
+        key = cache_key(template_path, context, "md:docx", extra_files=(REFERENCE_DOCX,))
+        return cache.get_or_render(key, lambda: render_markdown_to_docx(template_path, context).getvalue())
+    key = cache_key(template_path, context, f"docx:{engine}")
+    return cache.get_or_render(key, lambda: render_docx(template_path, context, engine).getvalue())
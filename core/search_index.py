@@ -0,0 +1,280 @@
+"""Full-text index over generated documents and processed PDFs (SQLite FTS5).
+
+    documents  one row per file (or uploaded PDF): path, kind, journal number,
+               size/mtime and the sha256 of its content
+    contents   one row per distinct sha256; its rowid is the FTS row
+    texts      FTS5 table with the extracted text of each content
+
+Updates are incremental. A file whose size and mtime match its row is
+skipped without being read. A changed file is hashed, and its text is only
+extracted when that hash has not been indexed before, so copies of the
+same content share one text row. Files that disappeared from an indexed
+directory are dropped.
+
+The tokenizer folds case and diacritics (``remove_diacritics 2``), so
+"Retten i Glostrup" and "retten i glostrup" give the same hits.
+"""
+import os
+import re
+import sqlite3
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+from lxml import etree
+
+from .pdftext import extract_text
+from .render_cache import file_digest
+
+DEFAULT_PATH = Path(os.getenv("CONTRACTGEN_SEARCH_INDEX", ".cache/search.sqlite"))
+KINDS = {".docx": "docx", ".pdf": "pdf"}
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    journal TEXT,
+    content_id INTEGER NOT NULL REFERENCES contents(id),
+    size INTEGER,
+    mtime_ns INTEGER,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_journal ON documents(journal);
+CREATE INDEX IF NOT EXISTS documents_content ON documents(content_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS texts USING fts5(body, tokenize = "unicode61 remove_diacritics 2");
+"""
+# Plain queries are matched word by word; these mark a query as FTS5 syntax
+_FTS_SYNTAX = re.compile(r'["*()]|\b(?:AND|OR|NOT|NEAR)\b')
+
+
+def docx_text(path: Union[str, Path]) -> str:
+    """Paragraph text of word/document.xml, one paragraph per line."""
+    lines: List[str] = []
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as fh:
+        for _, paragraph in etree.iterparse(fh, tag=f"{_W}p"):
+            parts = []
+            for node in paragraph.iter(f"{_W}t", f"{_W}tab", f"{_W}br"):
+                parts.append((node.text or "") if node.tag == f"{_W}t" else " ")
+            if parts:
+                lines.append("".join(parts))
+            paragraph.clear()
+    return "\n".join(lines)
+
+
+def file_text(path: Union[str, Path]) -> str:
+    kind = KINDS.get(Path(path).suffix.lower())
+    if kind == "docx":
+        return docx_text(path)
+    if kind == "pdf":
+        return extract_text(str(path))
+    raise ValueError(f"Cannot index {path}")
+
+
+def _file_text_or_none(path: Path) -> Optional[str]:
+    try:
+        return file_text(path)
+    except Exception as e:  # damaged .docx/.pdf: skip it, keep indexing the rest
+        print(f"Could not index {path}: {e}")
+        return None
+
+
+def match_expression(query: str) -> str:
+    """FTS5 MATCH text for ``query``: FTS5 syntax passes through, plain words must all occur."""
+    if _FTS_SYNTAX.search(query):
+        return query
+    return plain_expression(query)
+
+
+def plain_expression(query: str) -> str:
+    """Every word of ``query`` quoted, so no character is read as FTS5 syntax."""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"' for word in words)
+
+
+@dataclass(frozen=True)
+class Hit:
+    path: str
+    kind: str
+    journal: Optional[str]
+    snippet: str
+    rank: float
+
+
+class SearchIndex:
+    def __init__(self, path: Union[str, Path] = DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = Lock()
+
+    def close(self) -> None:
+        self._db.close()
+
+    # -- writing ---------------------------------------------------------------
+
+    def _content_id(self, sha256: str, text: Callable[[], str]) -> int:
+        row = self._db.execute("SELECT id FROM contents WHERE sha256 = ?", (sha256,)).fetchone()
+        if row:
+            return row[0]
+        content_id = self._db.execute("INSERT INTO contents (sha256) VALUES (?)", (sha256,)).lastrowid
+        self._db.execute("INSERT INTO texts (rowid, body) VALUES (?, ?)", (content_id, text()))
+        return content_id
+
+    def _put(self, path: str, kind: str, journal: Optional[str], content_id: int,
+             size: Optional[int] = None, mtime_ns: Optional[int] = None) -> None:
+        self._db.execute(
+            "INSERT INTO documents (path, kind, journal, content_id, size, mtime_ns, indexed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET kind = excluded.kind,"
+            " journal = excluded.journal, content_id = excluded.content_id, size = excluded.size,"
+            " mtime_ns = excluded.mtime_ns, indexed_at = excluded.indexed_at",
+            (path, kind, journal, content_id, size, mtime_ns, time.time()),
+        )
+
+    def _drop_orphans(self) -> None:
+        orphans = [row[0] for row in self._db.execute(
+            "SELECT id FROM contents WHERE id NOT IN (SELECT content_id FROM documents)"
+        )]
+        self._db.executemany("DELETE FROM texts WHERE rowid = ?", [(i,) for i in orphans])
+        self._db.executemany("DELETE FROM contents WHERE id = ?", [(i,) for i in orphans])
+
+    def add_text(self, key: str, text: str, sha256: str, kind: str = "pdf", journal: Optional[str] = None) -> None:
+        """Index text that has no file of its own, e.g. an uploaded PDF; ``key`` is its path."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT c.sha256 FROM documents d JOIN contents c ON c.id = d.content_id WHERE d.path = ?", (key,)
+            ).fetchone()
+            if row and row[0] == sha256:
+                return
+        with self._lock, self._db:
+            self._put(key, kind, journal, self._content_id(sha256, lambda: text))
+            self._drop_orphans()
+
+    def update(
+        self,
+        paths: Iterable[Union[str, Path]],
+        journal_of: Callable[[Path], Optional[str]] = lambda path: None,
+        prune: Sequence[Union[str, Path]] = (),
+        workers: int = 1,
+    ) -> Dict[str, int]:
+        """Bring the index up to date for ``paths``; returns counts per outcome.
+
+        Documents under the ``prune`` directories that are not in ``paths``
+        are removed. With ``workers`` > 1 texts are extracted in a process pool.
+        """
+        stats = {"unchanged": 0, "touched": 0, "indexed": 0, "failed": 0, "removed": 0}
+        seen = set()
+        pending = []  # (path, key, stat, sha256) of new or changed files
+        extract: Dict[str, Path] = {}  # sha256 not indexed yet -> one file with that content
+        with self._lock:
+            known = {row[0]: row[1:] for row in self._db.execute("SELECT path, size, mtime_ns FROM documents")}
+            indexed = {row[0] for row in self._db.execute("SELECT sha256 FROM contents")}
+            for path in map(Path, paths):
+                key = str(path.resolve())
+                seen.add(key)
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if known.get(key) == (stat.st_size, stat.st_mtime_ns):
+                    stats["unchanged"] += 1
+                    continue
+                sha256 = file_digest(path)
+                pending.append((path, key, stat, sha256))
+                if sha256 not in indexed:
+                    extract.setdefault(sha256, path)
+
+            # Extraction is the slow part; keep it out of the transaction.
+            files = list(extract.values())
+            if workers > 1 and len(files) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    texts = dict(zip(extract, pool.map(_file_text_or_none, files, chunksize=16)))
+            else:
+                texts = {sha256: _file_text_or_none(path) for sha256, path in extract.items()}
+
+            with self._db:
+                for path, key, stat, sha256 in pending:
+                    if texts.get(sha256, "") is None:
+                        stats["failed"] += 1
+                        continue
+                    content_id = self._content_id(sha256, lambda: texts[sha256])
+                    self._put(key, KINDS[path.suffix.lower()], journal_of(path), content_id,
+                              stat.st_size, stat.st_mtime_ns)
+                    stats["indexed" if sha256 in texts else "touched"] += 1
+                for root in prune:
+                    prefix = str(Path(root).resolve()) + os.sep
+                    gone = [(p,) for p in known if p.startswith(prefix) and p not in seen]
+                    self._db.executemany("DELETE FROM documents WHERE path = ?", gone)
+                    stats["removed"] += len(gone)
+                self._drop_orphans()
+        return stats
+
+    # -- reading ---------------------------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        limit: int = 50,
+        kind: Optional[str] = None,
+        journal: Optional[str] = None,
+    ) -> List[Hit]:
+        """Best matches first (bm25); ``query`` is plain words or an FTS5 expression.
+
+        A malformed FTS5 expression (e.g. an unbalanced quote or a trailing
+        ``AND``) is searched as its plain words instead.
+        """
+        expression = match_expression(query)
+        if not expression:
+            return []
+        try:
+            return self._search(expression, limit, kind, journal)
+        except sqlite3.OperationalError:
+            plain = plain_expression(query)
+            if plain == expression:
+                raise
+            return self._search(plain, limit, kind, journal) if plain else []
+
+    def _search(self, expression: str, limit: int, kind: Optional[str], journal: Optional[str]) -> List[Hit]:
+        sql = (
+            "SELECT d.path, d.kind, d.journal, snippet(texts, 0, '[', ']', ' … ', 12), bm25(texts)"
+            " FROM texts JOIN documents d ON d.content_id = texts.rowid WHERE texts MATCH ?"
+        )
+        params: list = [expression]
+        if kind:
+            sql += " AND d.kind = ?"
+            params.append(kind)
+        if journal:
+            sql += " AND d.journal = ?"
+            params.append(journal)
+        sql += " ORDER BY bm25(texts) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [Hit(*row) for row in self._db.execute(sql, params)]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT kind, COUNT(*) FROM documents GROUP BY kind").fetchall())
+
+
+_shared: Optional[SearchIndex] = None
+_shared_lock = Lock()
+
+
+def shared_index() -> SearchIndex:
+    """The process-wide index at DEFAULT_PATH (for the Streamlit views)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SearchIndex()
+        return _shared
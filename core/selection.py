@@ -0,0 +1,103 @@
+import argparse
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, FrozenSet, Mapping, Optional
+
+from .derived import is_active
+
+# Query parameters sent to the Legis365 /Journals endpoint for each predicate.
+# The predicates are always re-checked locally, so a server that ignores a
+# parameter only costs transfer, never correctness.
+SERVER_PARAMS = {
+    "active": "active",
+    "journalTypeId": "journalTypeId",
+    "lawyer": "lawyer",
+    "createdFrom": "createdFrom",
+    "createdTo": "createdTo",
+}
+
+
+@dataclass(frozen=True)
+class JournalSelection:
+    """Which journals a fetch or generation run should work on."""
+
+    active_only: bool = False
+    journal_type_ids: FrozenSet[str] = frozenset()
+    lawyers: FrozenSet[str] = frozenset()
+    created_from: Optional[str] = None
+    created_to: Optional[str] = None
+
+    @property
+    def is_everything(self) -> bool:
+        return self == JournalSelection()
+
+    def matches(self, journal: Mapping) -> bool:
+        if self.active_only:
+            active = journal.get("isActive")
+            if not (is_active(journal) if active is None else active):
+                return False
+        if self.journal_type_ids and journal.get("journalTypeId") not in self.journal_type_ids:
+            return False
+        if self.lawyers:
+            assigned = {journal.get("lawyer"), journal.get("responsibleLawyer")}
+            assigned.update(journal.get("lawyers") or [])
+            assigned.update(journal.get("responsibleLawyers") or [])
+            if not self.lawyers & assigned:
+                return False
+        created = (journal.get("createdAt") or "")[:10]
+        if self.created_from and (not created or created < self.created_from):
+            return False
+        if self.created_to and (not created or created > self.created_to):
+            return False
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON form; fetch_data records it in sync_changes.json for daemon.py."""
+        return {
+            "active_only": self.active_only,
+            "journal_type_ids": sorted(self.journal_type_ids),
+            "lawyers": sorted(self.lawyers),
+            "created_from": self.created_from,
+            "created_to": self.created_to,
+        }
+
+    def query_params(self) -> Dict[str, str]:
+        """Predicates expressible as API query parameters (single values only)."""
+        params: Dict[str, str] = {}
+        if self.active_only:
+            params[SERVER_PARAMS["active"]] = "true"
+        if len(self.journal_type_ids) == 1:
+            params[SERVER_PARAMS["journalTypeId"]] = next(iter(self.journal_type_ids))
+        if len(self.lawyers) == 1:
+            params[SERVER_PARAMS["lawyer"]] = next(iter(self.lawyers))
+        if self.created_from:
+            params[SERVER_PARAMS["createdFrom"]] = self.created_from
+        if self.created_to:
+            params[SERVER_PARAMS["createdTo"]] = self.created_to
+        return params
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "JournalSelection":
+        return cls(
+            active_only=args.active_only,
+            journal_type_ids=frozenset(args.journal_type or ()),
+            lawyers=frozenset(args.lawyer or ()),
+            created_from=args.created_from,
+            created_to=args.created_to,
+        )
+
+
+def _iso_date(value: str) -> str:
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def add_selection_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("journal selection")
+    group.add_argument("--active-only", action="store_true", help="skip archived/inactive journals")
+    group.add_argument("--journal-type", action="append", metavar="ID", help="journalTypeId (repeatable)")
+    group.add_argument("--lawyer", action="append", metavar="INITIALS", help="lawyer initials (repeatable)")
+    group.add_argument("--created-from", type=_iso_date, metavar="YYYY-MM-DD")
+    group.add_argument("--created-to", type=_iso_date, metavar="YYYY-MM-DD")
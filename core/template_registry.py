@@ -0,0 +1,149 @@
+import os
+import re
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from jinja2 import Environment, meta, nodes
+from jinja2.exceptions import TemplateError
+
+TEMPLATE_DIR = Path("templates")
+TEMPLATE_SUFFIXES = (".docx", ".md")
+
+# Parts of a .docx package that docxtpl renders through Jinja.
+_DOCX_TEMPLATE_PARTS = re.compile(r"^word/(?:document|header\d*|footer\d*|footnotes)\.xml$")
+
+
+@dataclass(frozen=True)
+class TemplateInfo:
+    """Result of scanning a template once: what it references and when."""
+
+    path: Path
+    mtime_ns: int
+    variables: FrozenSet[str]
+    conditionals: FrozenSet[str]
+    error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def suffix(self) -> str:
+        return self.path.suffix
+
+
+def template_sources(path: Path) -> List[str]:
+    """Return the Jinja sources contained in a .md or .docx template."""
+    path = Path(path)
+    if path.suffix == ".md":
+        return [path.read_text(encoding="utf-8")]
+
+    from docxtpl import DocxTemplate
+
+    # patch_xml only rewrites the XML string (joins tags split across runs),
+    # so an unloaded DocxTemplate is enough and python-docx is never invoked.
+    patcher = DocxTemplate(str(path))
+    sources = []
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.namelist():
+            if _DOCX_TEMPLATE_PARTS.match(member):
+                sources.append(patcher.patch_xml(archive.read(member).decode("utf-8")))
+    return sources
+
+
+def _test_names(test: nodes.Node) -> Iterable[str]:
+    if isinstance(test, nodes.Name):
+        yield test.name
+    for node in test.find_all(nodes.Name):
+        yield node.name
+
+
+def analyze_template(path: Path) -> TemplateInfo:
+    """Scan ``path`` and record its undeclared variables and ``if`` conditions."""
+    path = Path(path)
+    mtime_ns = path.stat().st_mtime_ns
+    env = Environment()
+    variables = set()
+    conditionals = set()
+    try:
+        for source in template_sources(path):
+            ast = env.parse(source)
+            variables |= meta.find_undeclared_variables(ast)
+            for branch in ast.find_all(nodes.If):
+                conditionals.update(_test_names(branch.test))
+    except (TemplateError, zipfile.BadZipFile, UnicodeDecodeError) as exc:
+        return TemplateInfo(path, mtime_ns, frozenset(), frozenset(), error=str(exc))
+
+    return TemplateInfo(
+        path=path,
+        mtime_ns=mtime_ns,
+        variables=frozenset(variables),
+        conditionals=frozenset(conditionals & variables),
+    )
+
+
+class TemplateRegistry:
+    """Process-wide index of the templates folder.
+
+    The folder is only re-globbed when its own mtime changes (a file was added,
+    removed or renamed) and a template is only re-analysed when its mtime changes,
+    so Streamlit reruns cost a handful of ``stat`` calls.
+    """
+
+    def __init__(self, directory: Path = TEMPLATE_DIR, suffixes: Sequence[str] = TEMPLATE_SUFFIXES):
+        self.directory = Path(directory)
+        self.suffixes = tuple(suffixes)
+        self._lock = Lock()
+        self._dir_mtime_ns: Optional[int] = None
+        self._paths: List[Path] = []
+        self._infos: Dict[Path, TemplateInfo] = {}
+
+    def _refresh_listing(self) -> None:
+        try:
+            dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            self._dir_mtime_ns = None
+            self._paths = []
+            self._infos.clear()
+            return
+        if dir_mtime_ns == self._dir_mtime_ns:
+            return
+        # Keep the historical order: all .docx templates first, then .md.
+        self._paths = [
+            path
+            for suffix in self.suffixes
+            for path in sorted(self.directory.glob(f"*{suffix}"))
+        ]
+        self._infos = {path: info for path, info in self._infos.items() if path in self._paths}
+        self._dir_mtime_ns = dir_mtime_ns
+
+    def _info(self, path: Path) -> Optional[TemplateInfo]:
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._infos.pop(path, None)
+            return None
+        info = self._infos.get(path)
+        if info is None or info.mtime_ns != mtime_ns:
+            info = analyze_template(path)
+            self._infos[path] = info
+        return info
+
+    def templates(self, suffixes: Optional[Iterable[str]] = None) -> List[TemplateInfo]:
+        """Return info for every template, optionally limited to ``suffixes``."""
+        wanted = tuple(suffixes) if suffixes else self.suffixes
+        with self._lock:
+            self._refresh_listing()
+            infos = (self._info(path) for path in self._paths if path.suffix in wanted)
+            return [info for info in infos if info is not None]
+
+    def get(self, path: Path) -> Optional[TemplateInfo]:
+        """Return info for a single template path (inside or outside the folder)."""
+        with self._lock:
+            return self._info(Path(path))
+
+
+registry = TemplateRegistry()
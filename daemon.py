@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""Keep contracts/ up to date: regenerate only what a change affects.
+
+    python daemon.py                          # sync every 60 s, watch the template
+    python daemon.py --sync-interval 0        # only react to syncs run elsewhere
+    python daemon.py --active-only --workers 4 --cache-dir .cache/renders
+
+The daemon polls two things:
+
+* sync_changes.json, which fetch_data.py rewrites after every sync (the
+  daemon runs that sync itself every --sync-interval seconds). A changed or
+  new journal is regenerated, as are all journals of a changed contact.
+  Removed journals lose their contract, unless the sync used another
+  selection than the daemon or would remove more than --max-remove-share of
+  the contracts; such removals are logged and skipped.
+* The template file. When it changes, it is recompiled and every journal is
+  regenerated.
+
+Changes are debounced. Affected journals are collected until nothing new has
+arrived for --debounce seconds (at most --max-wait), then rendered in a
+background thread pool while polling continues. At startup, journals without
+a contract are rendered; --initial all renders everything.
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Optional, Set
+
+import fetch_data
+from core.contacts import ContactResolver
+from core.derived import output_basename
+from core.jobqueue import PermanentJobError
+from core.records import Journal, iter_records
+from core.selection import JournalSelection, add_selection_arguments
+from generate_contracts import OUT_DIR, TEMPLATE, generate_one, load_contacts, make_renderer
+
+CHANGES_FILE = Path(fetch_data.CHANGES_FILE)
+
+
+def _mtime(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _log(message: str) -> None:
+    print(time.strftime("%H:%M:%S"), message, flush=True)
+
+
+class Regenerator:
+    """The current journals and contacts, and which outputs depend on what."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.selection = JournalSelection.from_args(args)
+        self.out_dir: Path = args.out_dir
+        self.out_dir.mkdir(exist_ok=True)
+        self.pool = ThreadPoolExecutor(max_workers=args.workers)
+        self.render = make_renderer(args.template, args.engine, args.cache_dir)
+        self.journals: Dict[str, Journal] = {}
+        self.by_client: Dict[str, Set[str]] = defaultdict(set)
+        self.contacts: Optional[ContactResolver] = None
+        self.outputs: Dict[str, Path] = {}
+        # Submitted but not started, started, and started ones to render once more
+        self._queued: Set[str] = set()
+        self._running: Set[str] = set()
+        self._again: Set[str] = set()
+        self._lock = Lock()
+        self.reload()
+
+    def reload(self) -> None:
+        """Re-read journals.json/contacts.json after a sync."""
+        journals = {j.id: j for j in iter_records("journals.json", Journal) if self.selection.matches(j)}
+        by_client: Dict[str, Set[str]] = defaultdict(set)
+        for journal in journals.values():
+            by_client[journal.clientId].add(journal.id)
+        contacts = load_contacts(self.args.offline)
+        with self._lock:
+            self.journals, self.by_client, self.contacts = journals, by_client, contacts
+            # Where each contract currently is, so a renamed client's old file can be removed
+            for journal_id, journal in journals.items():
+                if journal_id not in self.outputs:
+                    client = contacts.get(journal.clientId)
+                    if client:
+                        self.outputs[journal_id] = self.out_dir / f"{output_basename(journal, client)}.docx"
+
+    def recompile(self) -> None:
+        self.render = make_renderer(self.args.template, self.args.engine, self.args.cache_dir)
+
+    def affected(self, changes: dict) -> Set[str]:
+        """Journal ids whose contract depends on a record the sync added, changed or removed."""
+        journals, contacts = changes.get("journals") or {}, changes.get("contacts") or {}
+        ids = set(journals.get("added", [])) | set(journals.get("changed", []))
+        for contact_id in (*contacts.get("added", []), *contacts.get("changed", []), *contacts.get("removed", [])):
+            ids |= self.by_client.get(contact_id, set())
+        self._remove_outputs(changes, set(journals.get("removed", [])) | ids)
+        return ids & set(self.journals)
+
+    def _remove_outputs(self, changes: dict, candidates: Set[str]) -> None:
+        """Delete the contracts of journals the sync removed, or that left the daemon's selection.
+
+        A journal still in the reloaded journals.json (and selected) keeps its
+        contract whatever the change file says. A sync fetched with another
+        selection (e.g. a one-off ``fetch_data.py --active-only``) reports
+        journals outside it as removed, so its removals are not applied; nor
+        are removals of more than --max-remove-share of the contracts at once.
+        """
+        with self._lock:
+            removed = {journal_id for journal_id in candidates - set(self.journals) if journal_id in self.outputs}
+            total = len(self.outputs)
+        if not removed:
+            return
+        synced = changes.get("selection")
+        if synced is not None and synced != self.selection.to_dict():
+            _log(f"Not removing {len(removed)} contract(s): the sync used selection {synced},"
+                 f" this daemon {self.selection.to_dict()}")
+            return
+        if len(removed) > max(1, self.args.max_remove_share * total):
+            _log(f"Refusing to remove {len(removed)} of {total} contracts in one sync"
+                 f" (--max-remove-share {self.args.max_remove_share}); remove them by hand if intended")
+            return
+        for journal_id in removed:
+            self._remove_output(journal_id)
+
+    def missing(self) -> Set[str]:
+        with self._lock:
+            return {journal_id for journal_id, path in self.outputs.items() if not path.exists()}
+
+    def _remove_output(self, journal_id: str) -> None:
+        with self._lock:
+            path = self.outputs.pop(journal_id, None)
+        if path is not None and path.exists():
+            path.unlink()
+            _log(f"Removed {path}")
+
+    def _regenerate(self, journal_id: str) -> None:
+        with self._lock:
+            self._queued.discard(journal_id)
+            self._running.add(journal_id)
+            # The latest data and template, however long the job waited
+            render, contacts = self.render, self.contacts
+        try:
+            self._generate(journal_id, render, contacts)
+        finally:
+            with self._lock:
+                self._running.discard(journal_id)
+                again = journal_id in self._again
+                self._again.discard(journal_id)
+            if again:
+                self.submit([journal_id])
+
+    def _generate(self, journal_id: str, render, contacts: ContactResolver) -> None:
+        journal = self.journals.get(journal_id)
+        if journal is None:
+            return
+        try:
+            filename = generate_one(journal, contacts, render, self.out_dir)
+        except PermanentJobError as e:
+            _log(str(e))
+            return
+        except Exception as e:
+            _log(f"Failed to generate for journal {journal.number}: {e}")
+            return
+        with self._lock:
+            previous, self.outputs[journal_id] = self.outputs.get(journal_id), filename
+        if previous is not None and previous != filename and previous.exists():
+            previous.unlink()  # the client or journal number was renamed
+        _log(f"Generated {filename}")
+
+    def submit(self, ids: Iterable[str]) -> None:
+        """Queue renders; an id already queued is skipped, one being rendered is rendered once more after."""
+        with self._lock:
+            new = []
+            for journal_id in sorted(ids):
+                if journal_id in self._queued:
+                    continue
+                if journal_id in self._running:
+                    self._again.add(journal_id)
+                    continue
+                self._queued.add(journal_id)
+                new.append(journal_id)
+        for journal_id in new:
+            self.pool.submit(self._regenerate, journal_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate contracts when their data or template changes.")
+    parser.add_argument("--template", type=Path, default=TEMPLATE)
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument("--engine", choices=["ooxml", "docxtpl"], default="ooxml")
+    parser.add_argument("--cache-dir", type=Path, help="content-addressed render cache (see generate_contracts.py)")
+    parser.add_argument("--workers", type=int, default=2, help="render threads")
+    parser.add_argument("--offline", action="store_true", help="only use contacts.json for clients")
+    parser.add_argument("--sync-interval", type=float, default=60.0,
+                        help="seconds between syncs from the API; 0 only watches sync_changes.json")
+    parser.add_argument("--poll", type=float, default=2.0, help="seconds between file checks")
+    parser.add_argument("--debounce", type=float, default=5.0,
+                        help="render once no change has arrived for this many seconds")
+    parser.add_argument("--max-wait", type=float, default=30.0, help="render at the latest this long after a change")
+    parser.add_argument("--initial", choices=["missing", "all", "none"], default="missing",
+                        help="what to render at startup")
+    parser.add_argument("--max-remove-share", type=float, default=0.1,
+                        help="refuse a sync that would remove more than this share of the contracts")
+    add_selection_arguments(parser)
+    args = parser.parse_args()
+
+    regenerator = Regenerator(args)
+    selection = regenerator.selection
+    sync_pool = ThreadPoolExecutor(max_workers=1)
+    syncing = None
+    last_sync = float("-inf")
+    template_mtime = _mtime(args.template)
+    changes_mtime = _mtime(CHANGES_FILE)
+
+    pending: Set[str] = set()
+    first_change = last_change = 0.0
+    if args.initial != "none":
+        pending = set(regenerator.journals) if args.initial == "all" else regenerator.missing()
+        first_change = last_change = time.monotonic() - args.max_wait
+    _log(f"Watching {args.template} and {CHANGES_FILE} for {len(regenerator.journals)} journals")
+
+    def queue(ids: Set[str], reason: str) -> None:
+        nonlocal first_change, last_change
+        if not ids:
+            return
+        now = time.monotonic()
+        if not pending:
+            first_change = now
+        last_change = now
+        pending.update(ids)
+        _log(f"{len(ids)} journal(s) affected by {reason}")
+
+    try:
+        while True:
+            now = time.monotonic()
+            if args.sync_interval and fetch_data.KEY and syncing is None and now - last_sync >= args.sync_interval:
+                syncing, last_sync = sync_pool.submit(fetch_data.fetch, selection), now
+            if syncing is not None and syncing.done():
+                if syncing.exception() is not None:
+                    _log(f"Sync failed: {syncing.exception()}")
+                syncing = None
+
+            mtime = _mtime(args.template)
+            if mtime != template_mtime and mtime is not None:
+                template_mtime = mtime
+                try:
+                    regenerator.recompile()
+                    queue(set(regenerator.journals), f"a change to {args.template}")
+                except Exception as e:  # e.g. saved halfway; the next save triggers again
+                    _log(f"Template not usable: {e}")
+
+            mtime = _mtime(CHANGES_FILE)
+            if mtime != changes_mtime and mtime is not None:
+                try:
+                    changes = json.loads(CHANGES_FILE.read_text(encoding="utf-8"))
+                    regenerator.reload()  # may look up contacts through the API
+                except Exception as e:  # retried at the next poll
+                    _log(f"Could not apply {CHANGES_FILE}: {e}")
+                else:
+                    changes_mtime = mtime
+                    queue(regenerator.affected(changes), f"the sync at {changes.get('syncedAt')}")
+
+            if pending and (now - last_change >= args.debounce or now - first_change >= args.max_wait):
+                _log(f"Regenerating {len(pending)} journal(s)")
+                regenerator.submit(pending)
+                pending = set()
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        _log("Stopping; waiting for running renders")
+    finally:
+        sync_pool.shutdown(wait=False, cancel_futures=True)
+        regenerator.pool.shutdown(wait=True, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
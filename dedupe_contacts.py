@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Find near-duplicate contacts in contacts.json.
+
+    python dedupe_contacts.py                    # full run
+    python dedupe_contacts.py --incremental      # only contacts the last sync added or changed
+    python dedupe_contacts.py --threshold 0.7 --show 50
+
+Matches are written to contact_duplicates.json as scored pairs plus the
+clusters they form. An incremental run reads the ids from sync_changes.json
+(written by fetch_data.py). It keeps the previous pairs between unchanged
+contacts and re-scores only pairs that involve a new or changed one.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from core.dedupe import Match, clusters, find_matches
+from core.records import Contact, iter_records
+
+CONTACTS = Path("contacts.json")
+OUT_FILE = Path("contact_duplicates.json")
+CHANGES_FILE = Path("sync_changes.json")
+
+
+def previous_matches(path: Path, drop: set):
+    if not path.exists():
+        return []
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return [Match(*pair) for pair in data.get("pairs", []) if pair[0] not in drop and pair[1] not in drop]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate contacts.")
+    parser.add_argument("--contacts", type=Path, default=CONTACTS)
+    parser.add_argument("--out", type=Path, default=OUT_FILE)
+    parser.add_argument("--threshold", type=float, default=0.8, help="minimum pair score (0..1)")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"only score contacts listed as added/changed in {CHANGES_FILE}")
+    parser.add_argument("--max-block", type=int, default=100, help="skip blocking keys shared by more contacts")
+    parser.add_argument("--show", type=int, default=20, help="clusters to print")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    contacts = {c.id: c for c in iter_records(args.contacts, Contact)}
+
+    changed = None
+    kept = []
+    if args.incremental:
+        if not CHANGES_FILE.exists():
+            raise SystemExit(f"{CHANGES_FILE} not found; run fetch_data.py first or drop --incremental")
+        sync = json.loads(CHANGES_FILE.read_text(encoding="utf-8")).get("contacts") or {}
+        changed = set(sync.get("added", [])) | set(sync.get("changed", []))
+        kept = previous_matches(args.out, changed | set(sync.get("removed", [])))
+
+    found = find_matches(contacts.values(), args.threshold, changed=changed, max_block=args.max_block)
+    matches = kept + found
+    groups = clusters(matches)
+
+    args.out.write_text(json.dumps({
+        "threshold": args.threshold,
+        "pairs": [[m.a, m.b, m.score] for m in matches],
+        "clusters": [[{"id": i, "name": contacts[i].name, "address": contacts[i].addressLine} for i in group]
+                     for group in groups if all(i in contacts for i in group)],
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    scope = f"{len(changed)} changed of " if changed is not None else ""
+    print(f"{scope}{len(contacts)} contacts: {len(found)} new pair(s), {len(groups)} cluster(s) "
+          f"in {time.perf_counter() - started:.2f}s -> {args.out}")
+    group_of = {contact_id: index for index, group in enumerate(groups) for contact_id in group}
+    best = [0.0] * len(groups)
+    for m in matches:
+        best[group_of[m.a]] = max(best[group_of[m.a]], m.score)
+    for index, group in enumerate(groups[:args.show]):
+        print(f"\nscore {best[index]:.2f}")
+        for contact_id in group:
+            contact = contacts.get(contact_id)
+            if contact is not None:
+                print(f"  {contact.name!s:<45} {contact.addressLine or ''}")
+
+
+if __name__ == "__main__":
+    main()
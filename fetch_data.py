@@ -1,29 +1,150 @@
-import os, json, requests
+import os, json, time, argparse, requests
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from dotenv import load_dotenv
 
+from core import http
+from core.derived import Ingest
+from core.selection import JournalSelection, add_selection_arguments
+
 load_dotenv()
-BASE = "https://api.app.legis365.com/public/v1.0"
 KEY  = os.getenv("LEGIS_API_KEY")
 HDRS = {"Accept": "application/json", "X-API-Key": KEY}
+CHANGES_FILE = "sync_changes.json"
+DUMPS = ("contacts.json", "journals.json")
 
-def paged(path, page_size=500):
+def paged(path, page_size=500, params=None):
     page = 1
     while True:
-        r = requests.get(f"{BASE}{path}", headers=HDRS, params={"page":page,"pageSize":page_size}, timeout=60)
+        r = http.get(path, headers=HDRS, params={**(params or {}), "page":page,"pageSize":page_size})
         r.raise_for_status()
         data = r.json()
         items = data.get("results") or data.get("items") or []
         if not items: break
         for it in items: yield it
-        if len(items) < page_size: break
+        # pageSize may be capped by the server: trust the echoed size, else stop at an empty page
+        if data.get("pageSize") and len(items) < data["pageSize"]: break
         page += 1
 
+def get_one(path):
+    """Fetch a single resource; None when the API does not know it."""
+    r = http.get(path, headers=HDRS)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return r.json()
+
+def select_journals(selection, pushdown=True):
+    """Stream journals matching ``selection``, filtering server-side where possible."""
+    params = selection.query_params() if pushdown else {}
+    try:
+        source = paged("/Journals", params=params)
+        first = next(source, None)
+    except requests.HTTPError as e:
+        if not params or e.response is None or e.response.status_code != 400:
+            raise
+        print("API rejected the journal filters; filtering locally instead")
+        source = paged("/Journals")
+        first = next(source, None)
+    if first is None:
+        return
+    for j in chain([first], source):
+        if selection.matches(j):
+            yield j
+
+def write_json_array(items, out_file, replace=True):
+    """Stream ``items`` to ``out_file`` in the same layout as json.dump(indent=2).
+
+    With ``replace=False`` the result stays in ``<out_file>.part`` for the caller to move.
+    """
+    count = 0
+    tmp_file = f"{out_file}.part"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for it in items:
+            f.write("[\n  " if count == 0 else ",\n  ")
+            f.write(json.dumps(it, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            count += 1
+        f.write("\n]" if count else "[]")
+    if replace:
+        # Only replace the previous dump once the download completed
+        os.replace(tmp_file, out_file)
+    return count
+
+def write_records(items, out_file):
+    """Stage ``items`` with their derived fields (core.derived) in ``<out_file>.part``; returns the Ingest.
+
+    The previous dump stays in place until :func:`publish`, so the next sync
+    still diffs against it if this one fails half-way.
+    """
+    ingest = Ingest(os.path.splitext(os.path.basename(out_file))[0], out_file)
+    n = write_json_array(ingest(items), out_file, replace=False)
+    print(f"Wrote {n} -> {out_file} ({len(ingest.added)} new, {len(ingest.changed)} changed, "
+          f"{len(ingest.removed)} removed)")
+    return ingest
+
+def write_changes(*ingests, selection=None):
+    """Record which ids the last sync added, changed or removed, for incremental consumers."""
+    changes = {"syncedAt": time.strftime("%Y-%m-%dT%H:%M:%S"), **{i.kind: i.summary() for i in ingests}}
+    if selection is not None:
+        # "removed" is relative to this selection; daemon.py compares it with its own
+        changes["selection"] = selection.to_dict()
+    with open(f"{CHANGES_FILE}.part", "w", encoding="utf-8") as f:
+        json.dump(changes, f, ensure_ascii=False, indent=2)
+    # daemon.py polls this file; never let it see half of it
+    os.replace(f"{CHANGES_FILE}.part", CHANGES_FILE)
+
+def publish(*ingests, selection=None):
+    """Move the staged dumps into place, then record their changes."""
+    for out_file in DUMPS:
+        os.replace(f"{out_file}.part", out_file)
+    write_changes(*ingests, selection=selection)
+
+def discard():
+    for out_file in DUMPS:
+        if os.path.exists(f"{out_file}.part"):
+            os.remove(f"{out_file}.part")
+
 def dump(path, out_file):
-    items = list(paged(path))
-    with open(out_file, "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
-    print(f"Wrote {len(items)} -> {out_file}")
+    return write_records(paged(path), out_file)
+
+def dump_selected(selection, pushdown=True, workers=8):
+    """Write the selected journals and only the contacts they reference."""
+    client_ids = []
+    def journals():
+        seen = set()
+        for j in select_journals(selection, pushdown):
+            cid = j.get("clientId")
+            if cid and cid not in seen:
+                seen.add(cid)
+                client_ids.append(cid)
+            yield j
+    journal_ingest = write_records(journals(), "journals.json")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        contacts = pool.map(lambda cid: get_one(f"/Contacts/{cid}"), client_ids)
+        contact_ingest = write_records((c for c in contacts if c), "contacts.json")
+    print(f"({len(client_ids)} contacts referenced)")
+    return contact_ingest, journal_ingest
+
+def fetch(selection, pushdown=True):
+    """Refresh contacts.json and journals.json for ``selection``.
+
+    Both dumps and sync_changes.json are replaced together once everything
+    downloaded; a failed sync leaves all three as they were.
+    """
+    try:
+        if selection.is_everything:
+            ingests = dump("/Contacts", "contacts.json"), dump("/Journals", "journals.json")
+        else:
+            ingests = dump_selected(selection, pushdown=pushdown)
+    except BaseException:
+        discard()
+        raise
+    publish(*ingests, selection=selection)
 
 if __name__ == "__main__":
-    dump("/Contacts", "contacts.json")
-    dump("/Journals", "journals.json")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch contacts and journals from Legis365.")
+    add_selection_arguments(parser)
+    parser.add_argument("--no-pushdown", action="store_true", help="do not send filters as API query parameters")
+    args = parser.parse_args()
+    fetch(JournalSelection.from_args(args), pushdown=not args.no_pushdown)
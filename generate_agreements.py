@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Compute compensation for a redundancy round and render one Fratrædelsesaftale per employee.
+
+    python generate_agreements.py employees.csv --set NoCompensationMonths=6 --out-dir aftaler
+    python generate_agreements.py employees.csv --round C_Name="Firma A/S" --merge aftaler.docx
+    python generate_agreements.py employees.csv --sweep NoCompensationMonths=3,6,9 --sweep PensionPercentage=10,12
+    python generate_agreements.py employees.csv --template templates/fratraedelse.md --template templates/memo.docx
+
+The employee table (.csv or .xlsx) holds one row per employee; see
+core.compensation for the columns. Any other column whose name is a template
+field (P_Name, P_Address, ManagerName, ...) is passed through to the template.
+With --sweep nothing is rendered. The cost of every combination is printed
+instead, and --export writes all scenario rows.
+
+Repeating --template renders a document set (see core.docsets): every
+template per employee from one context, named ``..._<template>.docx``.
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from core import compensation
+from core.docsets import render_set, resolve_set
+from core.merge import DocumentMerger
+from core.utils import safe_slug
+
+TEMPLATE = Path("templates/fratraedelse.md")
+OUT_DIR = Path("aftaler")
+
+
+def _assignments(values: List[str], option: str) -> Dict[str, str]:
+    pairs = {}
+    for value in values or []:
+        name, sep, setting = value.partition("=")
+        if not sep:
+            raise SystemExit(f"{option} expects NAME=VALUE, got {value!r}")
+        pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+def print_summary(results, parameters: List[str]) -> None:
+    """One line per scenario: its parameter values, head count and totals."""
+    summary = results.groupby("Scenario")[parameters].first().join(compensation.summarize(results))
+    print(summary.round(2).to_string())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute compensation and render Fratrædelsesaftaler for a table of employees.")
+    parser.add_argument("employees", type=Path, help=".csv or .xlsx, one row per employee")
+    parser.add_argument("--template", type=Path, action="append",
+                        help=f"repeat to render several documents per employee (default: {TEMPLATE})")
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument("--set", action="append", metavar="COLUMN=VALUE",
+                        help="override an input column for every employee, e.g. NoCompensationMonths=6")
+    parser.add_argument("--round", action="append", metavar="FIELD=VALUE",
+                        help="template field shared by the whole round, e.g. C_Name=... or Court=1")
+    parser.add_argument("--sweep", action="append", metavar="COLUMN=V1,V2,...",
+                        help="what-if values for an input column (repeatable; all combinations)")
+    parser.add_argument("--export", type=Path, help="write the computed table (all scenarios) to this .csv")
+    parser.add_argument("--batch-json", type=Path,
+                        help="write a request body for POST /render/batch instead of rendering here")
+    parser.add_argument("--merge", type=Path, help="also combine the agreements into one .docx")
+    args = parser.parse_args()
+    templates = args.template or [TEMPLATE]
+
+    employees = compensation.load_employees(args.employees)
+    overrides = _assignments(args.set, "--set")
+    shared = _assignments(args.round, "--round")
+
+    if args.sweep:
+        grid = {name: values.split(",") for name, values in _assignments(args.sweep, "--sweep").items()}
+        results = compensation.sweep(employees.assign(**overrides), **grid)
+        print_summary(results, list(grid))
+        if args.export:
+            results.to_csv(args.export, index=False)
+            print(f"Wrote {len(results)} rows to {args.export}")
+        return
+
+    results = compensation.compute(employees, **overrides)
+    if args.export:
+        results.to_csv(args.export, index=False)
+    total = results["TotalCompensation"].sum()
+    print(f"{len(results)} employees, total compensation {total:,.2f} DKK")
+
+    items = compensation.batch_items(results, shared)
+    for index, item in enumerate(items, start=1):
+        item["filename"] = f"{index:04d}_Fratraedelsesaftale_{safe_slug(item['ui'].get('P_Name'))}.docx"
+
+    if args.batch_json:
+        body = {"templates": [template.name for template in templates], "items": items}
+        args.batch_json.write_text(json.dumps(body, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Wrote {len(items)} items to {args.batch_json}")
+        return
+
+    try:
+        members = resolve_set(templates)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    args.out_dir.mkdir(exist_ok=True)
+    merger = None
+    for item in items:
+        try:
+            documents = render_set(members, {}, {}, item["ui"])
+        except Exception as e:
+            print(f"Failed to render {item['filename']}: {e}")
+            continue
+        for member, document in documents:
+            filename = args.out_dir / member.filename(Path(item["filename"]).stem)
+            filename.write_bytes(document)
+            print("Generated", filename)
+            if args.merge:
+                if merger is None:
+                    merger = DocumentMerger(document)
+                else:
+                    merger.add(document)
+
+    if merger is not None:
+        merger.save(args.merge)
+        print(f"Merged {merger.documents} agreements into {args.merge}")
+    print(f"\nDone. Agreements saved in {args.out_dir.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
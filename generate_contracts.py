@@ -1,53 +1,333 @@
-import json
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from docxtpl import DocxTemplate
+from multiprocessing.connection import wait
 from pathlib import Path
-import re
-import unicodedata
-
-def safe_slug(value: str, maxlen: int = 120) -> str:
-    """Filesystem-safe slug for filenames (macOS/Windows/Linux)."""
-    if not value:
-        return "Untitled"
-    # Normalize unicode (e.g., æøå) to a safe form
-    value = unicodedata.normalize("NFKD", value)
-    # Replace forbidden characters across OSes + line breaks
-    value = re.sub(r'[\\/\\n\\r:*?"<>|]', "_", value)
-    # Collapse whitespace to underscores
-    value = re.sub(r"\\s+", "_", value)
-    # Remove anything not alnum, dot, dash, underscore
-    value = re.sub(r"[^A-Za-z0-9._-]", "_", value)
-    # Collapse multiple underscores and trim dots/underscores from ends
-    value = re.sub(r"_+", "_", value).strip("_.")
-    # Enforce max length
-    return value[:maxlen] or "Untitled"
-
-# Load data
-contacts = {c["id"]: c for c in json.load(open("contacts.json", encoding="utf-8"))}
-journals = json.load(open("journals.json", encoding="utf-8"))
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import fetch_data
+import index_documents
+from core.contacts import ContactResolver
+from core.derived import output_basename
+from core.docsets import output_suffixes
+from core.jobqueue import JobQueue, PermanentJobError, run_worker
+from core.memprofile import MemoryBudget, MemoryProfiler
+from core.merge import DocumentMerger
+from core.ooxml import CompiledDocx
+from core.render_cache import RenderCache, cache_key
+from core.records import Journal, iter_records
+from core.selection import JournalSelection, add_selection_arguments
 
 # Template
 TEMPLATE = Path("templates/contract_template.docx")
 OUT_DIR = Path("contracts")
-OUT_DIR.mkdir(exist_ok=True)
+# Exit code of a queue worker that stopped at its memory budget and wants a successor
+RECYCLE_EXIT = 75
+
+
+def write_atomic(filename, write: Callable[[str], None]) -> None:
+    """``write(path)`` to ``<filename>.part``, then move it into place.
+
+    A render that fails half-way leaves no truncated .docx behind, so a later
+    run (or the daemon) sees the document as missing and renders it again.
+    """
+    tmp_file = f"{filename}.part"
+    try:
+        write(tmp_file)
+        os.replace(tmp_file, filename)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def make_renderer(template: Path, engine: str, cache_dir: Optional[Path] = None):
+    """Return ``render(ctx, filename)`` for the chosen engine.
+
+    The ooxml engine compiles the template once for the whole run; docxtpl
+    re-opens it for every journal. With ``cache_dir`` outputs are stored by
+    (template, context) hash, so a rerun copies unchanged contracts instead of
+    rendering them again.
+    """
+    if engine == "ooxml":
+        compiled = CompiledDocx(template)
+
+        def write(ctx, path):
+            with open(path, "wb") as fh:
+                compiled.render(ctx, fh)
+    else:
+        def write(ctx, path):
+            doc = DocxTemplate(template)
+            doc.render(ctx)
+            doc.save(path)
+
+    def render(ctx, filename):
+        write_atomic(filename, lambda path: write(ctx, path))
+
+    if cache_dir is None:
+        return render
+
+    # Disk tier only: within one run every context is different
+    cache = RenderCache(maxbytes=0, disk_dir=cache_dir)
 
-for j in journals:
+    def render_cached(ctx, filename):
+        key = cache_key(template, ctx, f"docx:{engine}")
+        data = cache.get(key)
+        if data is None:
+            render(ctx, filename)
+            cache.put(key, Path(filename).read_bytes())
+        else:
+            write_atomic(filename, lambda path: Path(path).write_bytes(data))
+
+    render_cached.stats = cache.stats
+    return render_cached
+
+
+def make_renderers(
+    templates: Sequence[Path], engine: str, cache_dir: Optional[Path] = None
+) -> List[Tuple[str, Callable]]:
+    """``(filename suffix, render)`` per template of a document set; see core.docsets."""
+    return [
+        (suffix, make_renderer(template, engine, cache_dir))
+        for template, suffix in zip(templates, output_suffixes(templates))
+    ]
+
+
+def load_contacts(offline: bool = False) -> ContactResolver:
+    """Contacts from contacts.json, falling back to per-id API lookups."""
+    fetch = None
+    if not offline and fetch_data.KEY:
+        fetch = lambda cid: fetch_data.get_one(f"/Contacts/{cid}")
+    return ContactResolver(fetch=fetch)
+
+
+def generate_set(j, contacts, renders: Sequence[Tuple[str, Callable]], out_dir: Path) -> List[Path]:
+    """Render every template of the set for journal ``j`` from one context.
+
+    Raises PermanentJobError without a client.
+    """
     client = contacts.get(j.get("clientId"))   # <-- vigtigt: lille "c"
     if not client:
-        print("No client found for journal", j.get("number"))
-        continue
+        raise PermanentJobError(f"No client found for journal {j.get('number')}")
 
     # Context for Word template
     ctx = {"client": client, "journal": j}
 
-    doc = DocxTemplate(TEMPLATE)
+    basename = output_basename(j, client)
+    filenames = []
+    for suffix, render in renders:
+        filename = out_dir / f"{basename}{suffix}.docx"
+        render(ctx, filename)
+        filenames.append(filename)
+    return filenames
+
+
+def generate_one(j, contacts, render, out_dir: Path) -> Path:
+    """Render the contract for journal ``j``; raises PermanentJobError without a client."""
+    return generate_set(j, contacts, [("", render)], out_dir)[0]
+
+
+def queue_worker(
+    queue_path: str,
+    templates: Sequence[str],
+    engine: str,
+    out_dir: str,
+    offline: bool = False,
+    cache_dir: Optional[str] = None,
+    memprofile: bool = False,
+    budget: MemoryBudget = MemoryBudget(),
+) -> Optional[str]:
+    """Worker process: claim journals from the shared queue until it is drained.
+
+    Returns why it stopped early when ``budget`` ran out, else None. A worker
+    that processed nothing never reports a stop, so it is not replaced.
+    """
+    profiler = MemoryProfiler() if memprofile else None
+    contacts = load_contacts(offline)
+    renders = make_renderers([Path(t) for t in templates], engine, Path(cache_dir) if cache_dir else None)
+    out = Path(out_dir)
+    stopped: Optional[str] = None
+
+    def handle(j):
+        if profiler is None:
+            return generate_set(j, contacts, renders, out)
+        with profiler.document(j.get("number")):
+            return generate_set(j, contacts, renders, out)
+
+    def stop(processed):
+        nonlocal stopped
+        stopped = budget.exceeded(processed) if budget else None
+        return stopped is not None
+
+    def report(job, error):
+        if error is None:
+            print("Generated journal", job.payload.get("number"))
+        else:
+            print(f"Failed to generate for journal {job.payload.get('number')} (attempt {job.attempts}): {error}")
+
+    # Claim no more jobs than the budget allows, so --recycle-after is exact
+    batch_size = min(10, budget.max_documents) if budget.max_documents else 10
+    with JobQueue(queue_path) as queue:
+        processed = run_worker(queue, handle, batch_size=batch_size, on_result=report, stop=stop)
+    if not processed:
+        stopped = None
+    if profiler is not None:
+        profiler.report(f"Memory (worker {multiprocessing.current_process().pid})")
+    if stopped:
+        print(f"Worker {multiprocessing.current_process().pid} recycled after {stopped}")
+    return stopped
+
+
+def _queue_worker_process(*worker_args) -> None:
+    sys.exit(RECYCLE_EXIT if queue_worker(*worker_args) else 0)
+
+
+def finish_fetch(fetching) -> None:
+    """Wait for a background fetch; keep the previous data files if it failed."""
     try:
-        doc.render(ctx)
-        client_name = client.get("name") or "UnknownClient"
-        base = f"{safe_slug(j.get('number') or 'NoNumber')}_{safe_slug(client_name)}"
-        filename = OUT_DIR / f"{base}.docx"
-        doc.save(filename)
-        print("Generated", filename)
+        fetching.result()
     except Exception as e:
-        print(f"Failed to generate for journal {j.get('number')}: {e}")
+        if not Path("journals.json").exists():
+            raise
+        print(f"Fetch failed ({e}); using the existing journals.json/contacts.json")
+
+
+def run_queue(args, journals) -> None:
+    with JobQueue(args.queue) as queue:
+        if args.fresh:
+            queue.reset()
+        if args.retry_failed:
+            queue.retry_failed()
+        added = queue.enqueue((j.id, j.to_dict()) for j in journals)
+        print(f"Queued {added} new journals ({queue.counts()})")
+
+    budget = MemoryBudget(args.recycle_after, args.recycle_mb)
+    worker_args = (
+        str(args.queue), [str(t) for t in args.template], args.engine, str(args.out_dir), args.offline,
+        str(args.cache_dir) if args.cache_dir else None, args.memprofile, budget,
+    )
+    if args.workers <= 1 and not budget:
+        queue_worker(*worker_args)
+    else:
+        # A worker that reached its budget exits with RECYCLE_EXIT and is replaced,
+        # so memory it could not give back is returned to the OS with the process.
+        def start():
+            process = multiprocessing.Process(target=_queue_worker_process, args=worker_args)
+            process.start()
+            return process
+
+        running = {}
+        for _ in range(max(1, args.workers)):
+            process = start()
+            running[process.sentinel] = process
+        while running:
+            for sentinel in wait(list(running)):
+                process = running.pop(sentinel)
+                process.join()
+                if process.exitcode == RECYCLE_EXIT:
+                    replacement = start()
+                    running[replacement.sentinel] = replacement
+
+    with JobQueue(args.queue) as queue:
+        print(f"Queue status: {queue.counts()}")
+        for key, attempts, error in queue.failures():
+            print(f"  failed {key} after {attempts} attempt(s): {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a contract per journal.")
+    parser.add_argument("--template", type=Path, action="append",
+                        help="repeat to render a document set per journal, named <contract>_<template>.docx"
+                             f" (default: {TEMPLATE})")
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument("--engine", choices=["ooxml", "docxtpl"], default="ooxml",
+                        help="ooxml streams the zip and copies unchanged parts (default); docxtpl is the reference engine")
+    parser.add_argument("--queue", type=Path,
+                        help="SQLite job queue; makes the run resumable and shareable between processes/hosts")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes on this host (with --queue)")
+    parser.add_argument("--fresh", action="store_true", help="clear the queue before enqueuing")
+    parser.add_argument("--retry-failed", action="store_true", help="give failed jobs a new attempt budget")
+    parser.add_argument("--offline", action="store_true",
+                        help="only use contacts.json; do not look up missing clients in the API")
+    parser.add_argument("--cache-dir", type=Path,
+                        help="content-addressed render cache; reruns reuse contracts whose inputs did not change")
+    parser.add_argument("--merge", type=Path,
+                        help="also combine the generated contracts into one .docx (one section each)")
+    parser.add_argument("--fetch", action="store_true",
+                        help="refresh journals.json/contacts.json first (the template is compiled meanwhile)")
+    parser.add_argument("--index", action="store_true",
+                        help="update the full-text search index for --out-dir afterwards (see index_documents.py)")
+    parser.add_argument("--memprofile", action="store_true",
+                        help="trace memory per contract and report peaks, growth and allocation sites (slower)")
+    parser.add_argument("--recycle-after", type=int, metavar="N",
+                        help="replace a queue worker process after N contracts (with --queue)")
+    parser.add_argument("--recycle-mb", type=float, metavar="MB",
+                        help="replace a queue worker process once its RSS exceeds MB (with --queue)")
+    add_selection_arguments(parser)
+    args = parser.parse_args()
+    args.template = args.template or [TEMPLATE]
+    if args.merge and args.queue:
+        parser.error("--merge is not supported with --queue")
+    if (args.recycle_after or args.recycle_mb) and not args.queue:
+        parser.error("--recycle-after/--recycle-mb need --queue")
+
+    selection = JournalSelection.from_args(args)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        fetching = pool.submit(fetch_data.fetch, selection) if args.fetch else None
+        # The templates compile while the data downloads
+        renders = None if args.queue else make_renderers(args.template, args.engine, args.cache_dir)
+        if fetching is not None:
+            finish_fetch(fetching)
+    journals = [j for j in iter_records("journals.json", Journal) if selection.matches(j)]
+    args.out_dir.mkdir(exist_ok=True)
+
+    if args.queue:
+        run_queue(args, journals)
+        if args.index:
+            index_documents.update([args.out_dir])
+        print(f"\nDone. Contracts saved in {args.out_dir.resolve()}")
+        return
+
+    # Load data
+    contacts = load_contacts(args.offline)
+    merger = None
+    profiler = MemoryProfiler() if args.memprofile else None
+
+    for j in journals:
+        try:
+            if profiler is None:
+                filenames = generate_set(j, contacts, renders, args.out_dir)
+            else:
+                with profiler.document(j.get("number")):
+                    filenames = generate_set(j, contacts, renders, args.out_dir)
+            for filename in filenames:
+                print("Generated", filename)
+                if args.merge:
+                    # Appended as it is written, so only the combined document is held in memory
+                    if merger is None:
+                        merger = DocumentMerger(filename)
+                    else:
+                        merger.add(filename)
+        except PermanentJobError:
+            print("No client found for journal", j.get("number"))
+        except Exception as e:
+            print(f"Failed to generate for journal {j.get('number')}: {e}")
+
+    if merger is not None:
+        merger.save(args.merge)
+        print(f"Merged {merger.documents} contracts into {args.merge}")
+    print(f"Contact lookups: {dict(contacts.stats)}")
+    if profiler is not None:
+        profiler.report()
+    if args.cache_dir:
+        for suffix, render in renders:
+            print(f"Render cache{suffix}: {dict(render.stats)}")
+    if args.index:
+        index_documents.update([args.out_dir])
+    print(f"\nDone. Contracts saved in {args.out_dir.resolve()}")
+
 
-print(f"\nDone. Contracts saved in {OUT_DIR.resolve()}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
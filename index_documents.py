@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Full-text index over generated contracts, agreements and PDFs.
+
+    python index_documents.py                          # (re)index contracts/ and aftaler/
+    python index_documents.py contracts ~/pdfs --workers 4
+    python index_documents.py --search "Retten i Glostrup"
+    python index_documents.py --search '"17 år" OR years_17' --kind docx
+
+Only new and changed files are read; see core.search_index. Documents are
+tagged with their journal number when the filename starts with a journal's
+slug, as generate_contracts.py names them. Plain search words must all occur.
+Quoted phrases, OR, NOT, NEAR and prefix* use the FTS5 query syntax.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from core.records import Journal, iter_records
+from core.search_index import DEFAULT_PATH, KINDS, SearchIndex
+from core.utils import safe_slug
+
+DEFAULT_DIRS = [Path("contracts"), Path("aftaler")]
+
+
+def collect(paths: Iterable[Path]) -> List[Path]:
+    files: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(p for p in sorted(path.rglob("*")) if p.suffix.lower() in KINDS and not p.name.startswith("~$"))
+        elif path.suffix.lower() in KINDS:
+            files.append(path)
+    return files
+
+
+def journal_lookup(journals_file: Path = Path("journals.json")) -> Callable[[Path], Optional[str]]:
+    """Journal number of a generated file, from the ``<journal slug>_`` prefix of its name."""
+    numbers: Dict[str, str] = {}
+    if journals_file.exists():
+        for journal in iter_records(journals_file, Journal):
+            if journal.number:
+                numbers[journal.slug or safe_slug(journal.number)] = journal.number
+    return lambda path: numbers.get(path.stem.split("_", 1)[0])
+
+
+def update(paths: Iterable[Path], index_path: Path = DEFAULT_PATH, workers: int = 1) -> Dict[str, int]:
+    paths = list(paths)
+    index = SearchIndex(index_path)
+    try:
+        started = time.perf_counter()
+        stats = index.update(
+            collect(paths), journal_lookup(), prune=[p for p in paths if p.is_dir()], workers=workers
+        )
+        print(f"Index {index_path}: {stats} in {time.perf_counter() - started:.1f}s")
+        return stats
+    finally:
+        index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index generated documents and PDFs for full-text search.")
+    parser.add_argument("paths", nargs="*", type=Path, help="files or directories (default: contracts/ aftaler/)")
+    parser.add_argument("--index", type=Path, default=DEFAULT_PATH)
+    parser.add_argument("--workers", type=int, default=1, help="processes for text extraction")
+    parser.add_argument("--search", metavar="QUERY", help="query the index instead of updating it")
+    parser.add_argument("--kind", choices=sorted(set(KINDS.values())))
+    parser.add_argument("--journal", help="only documents of this journal number")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if not args.search:
+        update(args.paths or [p for p in DEFAULT_DIRS if p.exists()], args.index, args.workers)
+        return
+
+    index = SearchIndex(args.index)
+    started = time.perf_counter()
+    hits = index.search(args.search, limit=args.limit, kind=args.kind, journal=args.journal)
+    elapsed = (time.perf_counter() - started) * 1000
+    for hit in hits:
+        print(f"{hit.journal or '-':>8}  {hit.path}\n          {' '.join(hit.snippet.split())}")
+    print(f"{len(hits)} hit(s) in {elapsed:.1f} ms ({sum(index.counts().values())} documents indexed)")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Load-test the sync and generation paths against the local mock API.
+
+    python loadtest.py --journals 200000 --contacts 20000 --latency-ms 15 --throttle-rate 0.05
+    python loadtest.py --scenario generate --template templates/contract_template.docx --journals 2000
+
+Starts mock_legis.py on a free port, points the fetchers at it through
+LEGIS_API_BASE_URL and runs each scenario in a scratch directory, so
+contacts.json / journals.json in the working tree are never touched. Reports
+records/sec, memory and the retry counters of core.http. Nothing leaves the
+machine. For the in-process scenarios the memory is the RSS change across the
+scenario plus the process's peak RSS so far (ru_maxrss never goes down, so a
+later scenario inherits the peak of an earlier one), optionally with peak
+Python allocations via tracemalloc. The generate scenario reports the peak
+RSS of its own generator process. fetch-all and api-paged must return every
+record the mock serves (--contacts/--journals); a shortfall fails the run.
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parent
+SCENARIOS = ("fetch-all", "fetch-selected", "api-paged", "generate")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@contextmanager
+def mock_server(args: argparse.Namespace) -> Iterator[str]:
+    port = _free_port()
+    command = [
+        sys.executable, str(ROOT / "mock_legis.py"),
+        "--port", str(port),
+        "--contacts", str(args.contacts),
+        "--journals", str(args.journals),
+        "--max-page-size", str(args.max_page_size),
+        "--latency-ms", str(args.latency_ms),
+        "--throttle-rate", str(args.throttle_rate),
+        "--failure-rate", str(args.failure_rate),
+        "--api-key", "loadtest",
+    ]
+    if args.ignore_filters:
+        command.append("--ignore-filters")
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    root = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                urllib.request.urlopen(f"{root}/stats", timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Mock server did not start")
+                time.sleep(0.05)
+        yield root
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def server_stats(root: str) -> Dict[str, int]:
+    with urllib.request.urlopen(f"{root}/stats", timeout=5) as response:
+        return json.load(response)
+
+
+@contextmanager
+def measured(name: str, results: List[dict], trace_memory: bool = False) -> Iterator[dict]:
+    from core import http
+    from core.memprofile import rss_bytes
+
+    http.stats.clear()
+    if trace_memory:
+        tracemalloc.start()
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    result = {"scenario": name, "records": 0}
+    try:
+        yield result
+    finally:
+        elapsed = time.perf_counter() - started
+        if trace_memory:
+            result["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+        result.update(
+            seconds=round(elapsed, 3),
+            records_per_sec=round(result["records"] / elapsed, 1) if elapsed else None,
+            rss_delta_mb=round((rss_bytes() - rss_before) / 2**20, 1),
+            rss_peak_so_far_mb=round(_peak_rss_mb(), 1),
+            http=dict(http.stats),
+        )
+        results.append(result)
+
+
+def _count_json_array(path: str) -> int:
+    from core.records import iter_json_array
+
+    with open(path, encoding="utf-8") as fh:
+        return sum(1 for _ in iter_json_array(fh))
+
+
+def run_fetch_all(results: List[dict], trace_memory: bool = False, expected: Optional[int] = None) -> None:
+    import fetch_data
+    from core.selection import JournalSelection
+
+    with measured("fetch-all", results, trace_memory) as result:
+        result["expected"] = expected
+        fetch_data.fetch(JournalSelection())
+        result["records"] = _count_json_array("contacts.json") + _count_json_array("journals.json")
+
+
+def run_fetch_selected(results: List[dict], trace_memory: bool = False) -> None:
+    import fetch_data
+    from core.selection import JournalSelection
+
+    with measured("fetch-selected", results, trace_memory) as result:
+        fetch_data.fetch(JournalSelection(active_only=True))
+        result["records"] = _count_json_array("contacts.json") + _count_json_array("journals.json")
+
+
+def run_api_paged(results: List[dict], trace_memory: bool = False, expected: Optional[int] = None) -> None:
+    from core import api
+
+    with measured("api-paged", results, trace_memory) as result:
+        result["expected"] = expected
+        result["records"] = sum(1 for _ in api.paged("/Journals"))
+
+
+def run_generate(results: List[dict], template: Path, engine: str) -> None:
+    if not Path("journals.json").exists():
+        run_fetch_all(results)
+    # The generator runs in its own process, like in production; its memory is
+    # read back through RUSAGE_CHILDREN.
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, str(ROOT / "generate_contracts.py"),
+         "--template", str(template), "--engine", engine, "--out-dir", "contracts"],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    documents = sum(1 for _ in Path("contracts").glob("*.docx"))
+    results.append({
+        "scenario": f"generate ({engine})",
+        "records": documents,
+        "seconds": round(elapsed, 3),
+        "records_per_sec": round(documents / elapsed, 1) if elapsed else None,
+        "rss_peak_mb": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "exit_code": completed.returncode,
+        "tail": completed.stdout.splitlines()[-2:],
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test fetch_data / core.api / generate_contracts against mock_legis.py.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="repeatable; default: all fetch scenarios (+ generate when --template is given)")
+    parser.add_argument("--contacts", type=int, default=5000)
+    parser.add_argument("--journals", type=int, default=20000)
+    parser.add_argument("--max-page-size", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--ignore-filters", action="store_true", help="mock an API without filter support")
+    parser.add_argument("--template", type=Path, help="contract template for the generate scenario")
+    parser.add_argument("--engine", choices=["ooxml", "docxtpl"], default="ooxml")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report peak Python allocations (tracemalloc; slows the client down)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or [s for s in SCENARIOS if s != "generate" or args.template]
+    if "generate" in scenarios and not args.template:
+        parser.error("the generate scenario needs --template")
+    template = args.template.resolve() if args.template else None
+
+    results: List[dict] = []
+    with mock_server(args) as root, tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        os.environ["LEGIS_API_BASE_URL"] = f"{root}/public/v1.0"
+        os.environ["LEGIS_API_KEY"] = "loadtest"
+        sys.path.insert(0, str(ROOT))
+        os.chdir(workdir)
+        for scenario in scenarios:
+            if scenario == "fetch-all":
+                run_fetch_all(results, args.trace_memory, expected=args.contacts + args.journals)
+            elif scenario == "fetch-selected":
+                run_fetch_selected(results, args.trace_memory)
+            elif scenario == "api-paged":
+                run_api_paged(results, args.trace_memory, expected=args.journals)
+            else:
+                run_generate(results, template, args.engine)
+        served = server_stats(root)
+        os.chdir(ROOT)
+
+    # Fewer records than the mock serves means the fetch stopped early (e.g. paging)
+    incomplete = [r for r in results if r.get("expected") is not None and r["records"] != r["expected"]]
+    if args.json:
+        print(json.dumps({"results": results, "server": served}, indent=2))
+        if incomplete:
+            sys.exit(1)
+        return
+    for result in results:
+        line = f"{result['scenario']:<20} {result['records']:>9} records  {result['seconds']:>8.2f}s  {result['records_per_sec']:>10} rec/s"
+        if "python_peak_mb" in result:
+            line += f"  py-peak {result['python_peak_mb']} MB"
+        if "rss_delta_mb" in result:
+            line += f"  rss {result['rss_delta_mb']:+} MB (process peak so far {result['rss_peak_so_far_mb']} MB)"
+        else:
+            line += f"  rss peak {result['rss_peak_mb']} MB"
+        if result.get("http"):
+            line += f"  http {result['http']}"
+        if result.get("exit_code"):
+            line += f"  exit {result['exit_code']}: {result['tail']}"
+        print(line)
+    print(f"server: {served}")
+    for result in incomplete:
+        print(f"ERROR: {result['scenario']} fetched {result['records']} of {result['expected']} records", file=sys.stderr)
+    if incomplete:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Legis365 public API (offline testing and load tests).
+
+    python mock_legis.py --contacts 50000 --journals 1000000 --latency-ms 20 --throttle-rate 0.05
+
+Serves /public/v1.0/Contacts, /Journals (paged, ``page``/``pageSize``) and
+/Contacts/{id}, /Journals/{id}. Records are generated deterministically from
+their index, so a million journals cost no memory. Journals honour the filter
+parameters sent by fetch_data.py unless --ignore-filters is given. GET /stats
+returns request counters; point the fetchers at the mock with
+LEGIS_API_BASE_URL=http://127.0.0.1:<port>/public/v1.0.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import tornado.ioloop
+import tornado.web
+
+PREFIX = "/public/v1.0"
+LAWYERS = ("MK", "MB", "MEB", "CWI", "AD", "JL")
+JOURNAL_TYPES = tuple(str(uuid.UUID(int=0x6821B462 + n)) for n in range(6))
+CITIES = ("1970 Frederiksberg C", "7000 Fredericia", "5250 Odense SV", "2600 Glostrup", "8000 Aarhus C")
+EPOCH = date(2016, 2, 24)
+
+
+def contact_id(index: int) -> str:
+    return str(uuid.UUID(int=(1 << 64) + index))
+
+
+def journal_id(index: int) -> str:
+    return str(uuid.UUID(int=(2 << 64) + index))
+
+
+class Dataset:
+    def __init__(self, contacts: int, journals: int, active_ratio: float):
+        self.contacts = contacts
+        self.journals = journals
+        self.active_ratio = active_ratio
+        self._matches: Dict[Tuple[Tuple[str, str], ...], List[int]] = {}
+
+    def matching_journals(self, query: Tuple[Tuple[str, str], ...]) -> List[int]:
+        """Indices of the journals matching a filter query, computed once per query."""
+        if query not in self._matches:
+            matches = _journal_filter(query)
+            self._matches[query] = [i for i in range(self.journals) if matches(self.journal(i))]
+        return self._matches[query]
+
+    def contact(self, index: int) -> dict:
+        return {
+            "id": contact_id(index),
+            "number": None,
+            "createdAt": None,
+            "name": f"Klient {index} ApS",
+            "address": f"Testvej {index % 200 + 1}\r\n{CITIES[index % len(CITIES)]}",
+            "emails": [],
+            "phone": "",
+            "ssn": None,
+            "vatNo": None,
+            "enabled": True,
+            "engagementLetterConfirmed": False,
+            "legitimationConfirmed": False,
+            "legitimationDate": None,
+            "legitimationComment": None,
+            "riskAssessment": "Undetermined",
+        }
+
+    def journal(self, index: int) -> dict:
+        rng = random.Random(index)
+        active = rng.random() < self.active_ratio
+        created = EPOCH + timedelta(days=index * 3500 // max(self.journals, 1))
+        return {
+            "id": journal_id(index),
+            "createdAt": created.isoformat(),
+            "number": str(100000 + index),
+            "name": f"Sag {index}",
+            "address": f"Testvej {index % 200 + 1}\r\n{CITIES[index % len(CITIES)]}",
+            "phone": None,
+            "email": None,
+            "clientId": contact_id(rng.randrange(self.contacts)) if self.contacts else None,
+            "journalTypeId": JOURNAL_TYPES[rng.randrange(len(JOURNAL_TYPES))],
+            "teamId": None,
+            "departmentId": None,
+            "active": active,
+            "archived": not active,
+            "archivedAt": None if active else (created + timedelta(days=90)).isoformat(),
+            "archiveNumber": None,
+            "courtReference": None,
+            "clientReference": None,
+            "counterPartyReference": None,
+            "fixedFee": None,
+            "expectedFee": None,
+            "hourlyRate": None,
+            "lawyer": LAWYERS[rng.randrange(len(LAWYERS))],
+            "secretary": None,
+            "responsibleLawyer": None,
+            "lawyers": None,
+            "secretaries": None,
+            "responsibleLawyers": None,
+            "state": "Active" if active else "Archived",
+            "fields": [],
+        }
+
+
+FILTER_PARAMS = ("active", "journalTypeId", "lawyer", "createdFrom", "createdTo")
+
+
+def _journal_filter(query: Tuple[Tuple[str, str], ...]) -> Callable[[dict], bool]:
+    args = dict(query)
+    active = args.get("active")
+    journal_type = args.get("journalTypeId")
+    lawyer = args.get("lawyer")
+    created_from = args.get("createdFrom")
+    created_to = args.get("createdTo")
+
+    def matches(journal: dict) -> bool:
+        if active == "true" and not journal["active"]:
+            return False
+        if journal_type and journal["journalTypeId"] != journal_type:
+            return False
+        if lawyer and journal["lawyer"] != lawyer:
+            return False
+        if created_from and journal["createdAt"] < created_from:
+            return False
+        if created_to and journal["createdAt"] > created_to:
+            return False
+        return True
+
+    return matches
+
+
+class MockHandler(tornado.web.RequestHandler):
+    @property
+    def options(self) -> argparse.Namespace:
+        return self.application.settings["options"]
+
+    @property
+    def counters(self) -> Counter:
+        return self.application.settings["counters"]
+
+    @property
+    def data(self) -> Dataset:
+        return self.application.settings["dataset"]
+
+    async def prepare(self) -> None:
+        self.counters["requests"] += 1
+        opts = self.options
+        if opts.latency_ms:
+            jitter = random.uniform(-opts.jitter_ms, opts.jitter_ms) if opts.jitter_ms else 0
+            await asyncio.sleep(max(0.0, opts.latency_ms + jitter) / 1000)
+        if opts.api_key and self.request.headers.get("X-API-Key") != opts.api_key:
+            self.counters["unauthorized"] += 1
+            self.send_error(401)
+            return
+        roll = random.random()
+        if roll < opts.throttle_rate:
+            self.counters["throttled"] += 1
+            self.set_header("Retry-After", str(opts.retry_after))
+            self.send_error(429)
+        elif roll < opts.throttle_rate + opts.failure_rate:
+            self.counters["failed"] += 1
+            self.send_error(500)
+
+    def write_error(self, status_code: int, **kwargs) -> None:
+        self.finish({"error": self._reason})
+
+
+class CollectionHandler(MockHandler):
+    def get(self, collection: str) -> None:
+        page = max(1, int(self.get_query_argument("page", "1")))
+        page_size = min(int(self.get_query_argument("pageSize", "100")), self.options.max_page_size)
+        start = (page - 1) * page_size
+        if collection == "Contacts":
+            indices = range(start, min(start + page_size, self.data.contacts))
+            make = self.data.contact
+        else:
+            make = self.data.journal
+            query = tuple(
+                (name, self.get_query_argument(name))
+                for name in FILTER_PARAMS
+                if self.get_query_argument(name, None) and not self.options.ignore_filters
+            )
+            if query:
+                indices = self.data.matching_journals(query)[start:start + page_size]
+            else:
+                indices = range(start, min(start + page_size, self.data.journals))
+        results = [make(index) for index in indices]
+        self.counters[f"{collection.lower()}_served"] += len(results)
+        self.finish({"results": results, "page": page, "pageSize": page_size})
+
+
+class ItemHandler(MockHandler):
+    def get(self, collection: str, item_id: str) -> None:
+        try:
+            index = uuid.UUID(item_id).int - ((1 if collection == "Contacts" else 2) << 64)
+        except ValueError:
+            index = -1
+        total = self.data.contacts if collection == "Contacts" else self.data.journals
+        if not 0 <= index < total:
+            self.send_error(404)
+            return
+        self.counters[f"{collection.lower()}_served"] += 1
+        self.finish(self.data.contact(index) if collection == "Contacts" else self.data.journal(index))
+
+
+class StatsHandler(tornado.web.RequestHandler):
+    def get(self) -> None:
+        self.finish(dict(self.application.settings["counters"]))
+
+
+def make_app(options: argparse.Namespace) -> tornado.web.Application:
+    return tornado.web.Application(
+        [
+            (rf"{PREFIX}/(Contacts|Journals)", CollectionHandler),
+            (rf"{PREFIX}/(Contacts|Journals)/([^/]+)", ItemHandler),
+            (r"/stats", StatsHandler),
+        ],
+        options=options,
+        counters=Counter(),
+        dataset=Dataset(options.contacts, options.journals, options.active_ratio),
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Mock Legis365 API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--contacts", type=int, default=2500)
+    parser.add_argument("--journals", type=int, default=2200)
+    parser.add_argument("--active-ratio", type=float, default=0.37, help="share of journals that are active")
+    parser.add_argument("--max-page-size", type=int, default=500, help="server-side cap on pageSize")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="probability of a 429 response")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds sent with 429")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability of a 500 response")
+    parser.add_argument("--ignore-filters", action="store_true", help="behave like an API without filter support")
+    parser.add_argument("--api-key", help="require this X-API-Key")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    return parser
+
+
+def main(argv: Optional[list] = None) -> None:
+    options = build_parser().parse_args(argv)
+    # Injected 429/500s are expected; keep the access log quiet unless asked.
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("tornado.access").setLevel(logging.INFO if options.verbose else logging.CRITICAL)
+    if options.seed is not None:
+        random.seed(options.seed)
+    make_app(options).listen(options.port, address="127.0.0.1")
+    print(f"Mock Legis365 on http://127.0.0.1:{options.port}{PREFIX}", flush=True)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,39 @@
 #!/usr/bin/env python3
-import os, sys, subprocess, platform, shutil, venv
+"""Set up .venv and generate the contracts.
+
+    python run.py                 # or double-click Run.command
+    python run.py --refresh       # fetch even if the data is recent
+    python run.py --reinstall     # pip install even if requirements.txt is unchanged
+
+Requirements are only installed when requirements.txt (or the venv's Python)
+changed since the last successful install. The data is only fetched when
+journals.json/contacts.json are older than --max-age minutes
+(CONTRACTGEN_DATA_MAX_AGE_MIN, default 60); the fetch then runs while the
+template compiles. Rendered contracts are cached in .cache/renders, so
+unchanged contracts are copied instead of rendered again.
+"""
+import os, sys, subprocess, platform, shutil, venv, argparse, hashlib, time
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent
 VENV_DIR = ROOT / ".venv"
 REQ = ROOT / "requirements.txt"
+STAMP = VENV_DIR / ".requirements.sha256"
+DATA_FILES = [ROOT / "journals.json", ROOT / "contacts.json"]
+CACHE_DIR = ROOT / ".cache" / "renders"
+MAX_AGE_MIN = float(os.getenv("CONTRACTGEN_DATA_MAX_AGE_MIN", "60"))
 
 PY_EXE = None
 
-def ensure_venv():
+def requirements_fingerprint():
+    """Hash of requirements.txt and the venv's Python version (pyvenv.cfg)."""
+    h = hashlib.sha256(REQ.read_bytes())
+    cfg = VENV_DIR / "pyvenv.cfg"
+    if cfg.exists():
+        h.update(cfg.read_bytes())
+    return h.hexdigest()
+
+def ensure_venv(reinstall=False):
     global PY_EXE
     if not VENV_DIR.exists():
         print("Creating virtual environment .venv ...")
@@ -26,6 +51,11 @@ def ensure_venv():
         (ROOT / "requirements.txt").write_text(
             "docxtpl==0.20.1\nrequests>=2.31\npython-dotenv>=1.0\n"
         )
+    fingerprint = requirements_fingerprint()
+    if not reinstall and PY_EXE.exists() and STAMP.exists() and STAMP.read_text().strip() == fingerprint:
+        print("Requirements unchanged; skipping install")
+        return
+
     print("Upgrading pip and installing requirements ...")
     # Upgrade pip (use long flag for compatibility) and install requirements
     try:
@@ -38,10 +68,20 @@ def ensure_venv():
         subprocess.check_call([str(PIP_EXE), "install", "-r", str(REQ)])
     except subprocess.CalledProcessError:
         subprocess.check_call([str(PY_EXE), "-m", "pip", "install", "-r", str(REQ)])
+    # Only stamped after a successful install, so a failed one is retried next time
+    STAMP.write_text(fingerprint)
 
-def run(pyfile):
+def data_age_minutes():
+    """Minutes since the older of the data files was written; None if one is missing."""
+    try:
+        written = min(p.stat().st_mtime for p in DATA_FILES)
+    except FileNotFoundError:
+        return None
+    return (time.time() - written) / 60
+
+def run(pyfile, *args):
     print(f"Running {pyfile} ...")
-    subprocess.check_call([str(PY_EXE), str(ROOT / pyfile)])
+    subprocess.check_call([str(PY_EXE), str(ROOT / pyfile), *args])
 
 def notify_ok():
     if platform.system() == "Darwin":
@@ -55,16 +95,26 @@ def notify_ok():
             pass
 
 def main():
+    parser = argparse.ArgumentParser(description="Set up .venv, fetch data when stale and generate contracts.")
+    parser.add_argument("--reinstall", action="store_true", help="pip install even if requirements.txt is unchanged")
+    parser.add_argument("--refresh", action="store_true", help="fetch even if the data is recent")
+    parser.add_argument("--max-age", type=float, default=MAX_AGE_MIN, metavar="MINUTES",
+                        help="refetch when the data is older than this (default: %(default)s)")
+    args = parser.parse_args()
+
     os.chdir(ROOT)
-    ensure_venv()
+    ensure_venv(args.reinstall)
 
     # Ensure output folder exists
     (ROOT / "contracts").mkdir(exist_ok=True)
     (ROOT / "templates").mkdir(exist_ok=True)
 
-    # Fetch latest data & generate contracts
-    run("fetch_data.py")
-    run("generate_contracts.py")
+    # Fetch latest data (unless recent) & generate contracts
+    age = data_age_minutes()
+    fetch = args.refresh or age is None or age > args.max_age
+    if not fetch:
+        print(f"Data is {age:.0f} min old; skipping fetch (--refresh to force)")
+    run("generate_contracts.py", "--cache-dir", str(CACHE_DIR), *(["--fetch"] if fetch else []))
 
     print("\n✅ Done. Contracts saved in:", (ROOT / "contracts").resolve())
     notify_ok()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Headless HTTP API for extraction and rendering (runs next to the Streamlit UI).
+
+    python service.py --port 8502 --workers 4
+
+Endpoints (all POST):
+    /extract/contract        PDF body (or multipart field "file") -> JSON fields
+    /extract/payslip         PDF body (or multipart field "file") -> JSON fields
+                             (optional ?backend=pdfplumber|pdfminer; a document that
+                             exceeds the time budget returns its partial fields with
+                             X-Extraction-Incomplete: timeout)
+    /render/fratraedelse     JSON {"template", "contract_data", "payslip_data", "ui"} -> .docx
+    /render/batch            JSON {"template", "items": [{..., "filename"}]} -> .zip
+                             ("merge": true -> one .docx with a section per item;
+                             failed items are listed in X-Render-Errors)
+                             ("templates": [...] instead of "template" renders a
+                             document set: every template per item from one
+                             context, named <filename>_<template>.docx)
+
+Work runs in a shared process pool whose workers pre-compile the templates at
+start-up, so requests never pay for template parsing. Documents are streamed
+back in chunks; the batch zip is written entry by entry as renders complete.
+Set CONTRACTGEN_SERVICE_TOKEN to require ``Authorization: Bearer <token>``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import tornado.ioloop
+import tornado.web
+
+from core.extractors import ExtractionTimeout, extract_from_contract, extract_from_payslip
+from core.merge import DocumentMerger
+from core.ooxml import load_compiled
+from core import pdftext
+from core.docsets import render_set, resolve_set
+from core.pdftext import BACKENDS as PDF_BACKENDS
+from core.rendering import build_fratradelse_context, render_document
+from core.template_registry import registry as template_registry
+from core.utils import safe_slug
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+CHUNK_SIZE = 64 * 1024
+EXTRACTORS = {"contract": extract_from_contract, "payslip": extract_from_payslip}
+
+
+# --- Worker-side functions (run inside the process pool) -------------------
+
+def _warm_worker() -> None:
+    """Pool initializer: analyse every template and compile the .docx ones."""
+    # Requests are already spread over the pool; no nested page-range pools.
+    pdftext.set_max_workers(1)
+    for info in template_registry.templates():
+        if info.suffix == ".docx" and not info.error:
+            load_compiled(info.path)
+
+
+def _extract(kind: str, pdf_bytes: bytes, backend: Optional[str] = None) -> Tuple[Dict[str, str], bool]:
+    """Return (fields, complete); an exhausted time budget yields the partial fields."""
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(pdf_bytes)
+    try:
+        return EXTRACTORS[kind](tmp.name, backend=backend), True
+    except ExtractionTimeout as exc:
+        return exc.partial, False
+    finally:
+        os.unlink(tmp.name)
+
+
+def _render_fratraedelse(template: str, contract_data, payslip_data, ui) -> bytes:
+    info = template_registry.get(Path(template))
+    context = build_fratradelse_context(contract_data, payslip_data, ui, fields=info.variables)
+    return render_document(info.path, context, engine="ooxml")
+
+
+def _render_set(templates: List[str], contract_data, payslip_data, ui) -> List[Tuple[str, bytes]]:
+    """(name suffix, document) per template of the set, in order."""
+    members = resolve_set(templates)
+    return [(member.suffix, document) for member, document in render_set(members, contract_data, payslip_data, ui)]
+
+
+# --- Output names -----------------------------------------------------------
+
+def _docx_name(requested: Optional[str], default: str) -> str:
+    """Client-chosen name as a plain ASCII ``<slug>.docx``: no directories, quotes or control characters."""
+    if not requested:
+        return default
+    return f"{safe_slug(Path(_basename(requested)).stem)}.docx"
+
+
+def _basename(name: str) -> str:
+    return re.split(r"[\\/]", name)[-1]
+
+
+def _content_disposition(filename: str, display: Optional[str] = None) -> str:
+    """``attachment`` with the ASCII ``filename``, plus ``filename*`` (RFC 5987) for a non-ASCII original."""
+    header = f'attachment; filename="{filename}"'
+    if display:
+        display = re.sub(r"[\x00-\x1f\x7f]", "", f"{Path(_basename(display)).stem}{Path(filename).suffix}")
+        if display != filename:
+            header += f"; filename*=UTF-8''{quote(display, safe='')}"
+    return header
+
+
+# --- HTTP handlers ----------------------------------------------------------
+
+class BaseHandler(tornado.web.RequestHandler):
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        return self.application.settings["pool"]
+
+    def prepare(self) -> None:
+        token = self.application.settings.get("token")
+        if token and self.request.headers.get("Authorization") != f"Bearer {token}":
+            raise tornado.web.HTTPError(401)
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def write_error(self, status_code: int, **kwargs) -> None:
+        message = self._reason
+        if "exc_info" in kwargs and not isinstance(kwargs["exc_info"][1], tornado.web.HTTPError):
+            message = str(kwargs["exc_info"][1])
+        self.finish({"error": message})
+
+    def json_body(self) -> dict:
+        try:
+            return json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="Body must be JSON")
+
+    def template_path(self, name: Optional[str]) -> str:
+        # Only templates known to the registry can be rendered; no arbitrary paths.
+        available = {info.name: info for info in template_registry.templates()}
+        info = available.get(Path(name or "fratraedelse.md").name)
+        if info is None or info.error:
+            raise tornado.web.HTTPError(404, reason=f"Unknown template: {name}")
+        return str(info.path)
+
+    async def stream(self, payload: bytes) -> None:
+        for start in range(0, len(payload), CHUNK_SIZE):
+            self.write(payload[start:start + CHUNK_SIZE])
+            await self.flush()
+
+
+class ExtractHandler(BaseHandler):
+    async def post(self, kind: str) -> None:
+        files = self.request.files.get("file")
+        pdf_bytes = files[0]["body"] if files else self.request.body
+        if not pdf_bytes:
+            raise tornado.web.HTTPError(400, reason="Send a PDF as body or as multipart field 'file'")
+        backend = self.get_query_argument("backend", None)
+        if backend is not None and backend not in PDF_BACKENDS:
+            raise tornado.web.HTTPError(400, reason=f"Unknown PDF backend: {backend}")
+        fields, complete = await self.run(_extract, kind, pdf_bytes, backend)
+        if not complete:
+            self.set_header("X-Extraction-Incomplete", "timeout")
+        self.finish(fields)
+
+
+class RenderHandler(BaseHandler):
+    async def post(self) -> None:
+        body = self.json_body()
+        template = self.template_path(body.get("template"))
+        document = await self.run(
+            _render_fratraedelse,
+            template,
+            body.get("contract_data") or {},
+            body.get("payslip_data") or {},
+            body.get("ui") or {},
+        )
+        person = (body.get("ui") or {}).get("P_Name")
+        name = _docx_name(body.get("filename"), f"Fratraedelsesaftale_{safe_slug(person)}.docx")
+        display = body.get("filename") or (f"Fratraedelsesaftale_{person}.docx" if person else None)
+        self.set_header("Content-Type", DOCX_MIME)
+        self.set_header("Content-Disposition", _content_disposition(name, display))
+        await self.stream(document)
+        self.finish()
+
+
+class _ResponseWriter:
+    """Minimal unseekable file object that forwards zip output to the response."""
+
+    def __init__(self, handler: tornado.web.RequestHandler):
+        self.handler = handler
+
+    def write(self, data: bytes) -> int:
+        self.handler.write(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+class BatchRenderHandler(BaseHandler):
+    async def post(self) -> None:
+        body = self.json_body()
+        templates = [self.template_path(name) for name in body.get("templates") or [body.get("template")]]
+        items = body.get("items") or []
+        if not items:
+            raise tornado.web.HTTPError(400, reason="No items to render")
+
+        async def render_item(index: int, item: dict):
+            """(name, [(filename, document), ...], error) for one item and every template."""
+            ui = item.get("ui") or {}
+            # Zip entry names: never a path out of the extraction directory
+            name = _docx_name(item.get("filename"), f"{index:04d}_{safe_slug(ui.get('P_Name'))}.docx")
+            try:
+                documents = await self.run(
+                    _render_set,
+                    templates,
+                    item.get("contract_data") or {},
+                    item.get("payslip_data") or {},
+                    ui,
+                )
+                stem = Path(name).stem
+                return name, [(f"{stem}{suffix}.docx", document) for suffix, document in documents], None
+            except Exception as exc:
+                return name, None, str(exc)
+
+        tasks = [asyncio.ensure_future(render_item(index, item)) for index, item in enumerate(items, start=1)]
+        if body.get("merge"):
+            await self.merged(tasks)
+            return
+
+        self.set_header("Content-Type", "application/zip")
+        self.set_header("Content-Disposition", 'attachment; filename="aftaler.zip"')
+        errors = {}
+        with zipfile.ZipFile(_ResponseWriter(self), "w", zipfile.ZIP_DEFLATED) as archive:
+            # Entries are written in completion order so the client sees data early.
+            for next_done in asyncio.as_completed(tasks):
+                name, documents, error = await next_done
+                if error is not None:
+                    errors[name] = error
+                    continue
+                for filename, document in documents:
+                    archive.writestr(filename, document)
+                await self.flush()
+            if errors:
+                archive.writestr("errors.json", json.dumps(errors, ensure_ascii=False, indent=2))
+        self.finish()
+
+    async def merged(self, tasks) -> None:
+        # Items are appended in request order while later ones still render;
+        # merging runs on a thread so the IOLoop stays responsive.
+        loop = asyncio.get_running_loop()
+        merger: Optional[DocumentMerger] = None
+        errors = {}
+        for task in tasks:
+            name, documents, error = await task
+            if error is not None:
+                errors[name] = error
+                continue
+            for _, document in documents:
+                if merger is None:
+                    merger = await loop.run_in_executor(None, DocumentMerger, document)
+                else:
+                    await loop.run_in_executor(None, merger.add, document)
+        if merger is None:
+            raise tornado.web.HTTPError(422, reason="No item could be rendered")
+        output = BytesIO()
+        await loop.run_in_executor(None, merger.save, output)
+        if errors:
+            self.set_header("X-Render-Errors", json.dumps(errors))
+        self.set_header("Content-Type", DOCX_MIME)
+        self.set_header("Content-Disposition", 'attachment; filename="aftaler.docx"')
+        await self.stream(output.getvalue())
+        self.finish()
+
+
+def make_app(pool: ProcessPoolExecutor, token: Optional[str] = None) -> tornado.web.Application:
+    return tornado.web.Application(
+        [
+            (r"/extract/(contract|payslip)", ExtractHandler),
+            (r"/render/fratraedelse", RenderHandler),
+            (r"/render/batch", BatchRenderHandler),
+        ],
+        pool=pool,
+        token=token,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_warm_worker)
+    app = make_app(pool, token=os.getenv("CONTRACTGEN_SERVICE_TOKEN"))
+    app.listen(args.port, address=args.address, max_body_size=200 * 1024 * 1024)
+    print(f"ContractGenerator service on http://{args.address}:{args.port} ({args.workers} workers)")
+    try:
+        tornado.ioloop.IOLoop.current().start()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,52 @@
+"""Fratrædelsesaftale form.
+
+The form is split into fragments (``st.fragment``) that rerun on their own:
+toggling "Behold pensionsordning?" reruns only the "Løn og fordele" section.
+Each section writes its answers into one shared dict in the session state
+(``STATE_KEY_UI``), which the template section reads when it renders. A full
+rerun happens only when a PDF is uploaded or the debug checkbox changes, and
+the extracted fields are kept per file hash, so even then no PDF is read
+twice.
+
+Several payslips can be uploaded at once. New ones are extracted side by
+side in the PDF process pool and combined by period (see core.payslips).
+
+The template checks (empty fields) and the live preview belong to the
+template section. A section whose rerun changes what they show - a field the
+template prints becomes empty or filled, or any field it uses while the
+preview is on - asks for one full rerun (``st.rerun(scope="app")``); every
+other interaction stays inside its fragment. The preview cache re-renders
+only the preview sections that changed.
+"""
+import functools
+import hashlib
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 import streamlit as st
 
-from core.extractors import extract_from_contract, extract_from_payslip
-from core.rendering import build_fratradelse_context, render_docx, render_markdown_to_docx
+from core.extractors import ExtractionTimeout, extract_from_contract
+from core.payslips import Payslip, combine, extract_payslips, ordered, salary_changes
+from core.preview import load_preview
+from core.search_index import shared_index
+from core.rendering import build_fratradelse_context, render_document
+from core.template_registry import TemplateInfo, registry as template_registry
 from core.utils import safe_slug
 
 DEFAULT_TEMPLATE = Path("templates/fratraedelse.md")
 STATE_KEY_TEMPLATE = "fratraedelse_selected_template"
+STATE_KEY_PREVIEW = "fratraedelse_show_preview"
+STATE_KEY_UI = "fratraedelse_ui"
+STATE_KEY_EXTRACTED = "fratraedelse_extracted"
+# (contract_data, payslip_data) of the last full run, for the section fragments
+STATE_KEY_INPUTS = "fratraedelse_inputs"
+# True while render() runs; fragment-only reruns see False
+STATE_KEY_FULL_RUN = "fratraedelse_full_run"
+TIMEOUT_WARNINGS = {
+    "contract": "Kontrakten tog for lang tid at læse; kun nogle felter er udfyldt.",
+    "payslip": "Lønsedlen tog for lang tid at læse; kun nogle felter er udfyldt.",
+}
 
 
 def _write_temp_file(uploaded_file) -> str:
@@ -18,48 +55,163 @@ def _write_temp_file(uploaded_file) -> str:
         return tmp.name
 
 
-def render() -> None:
-    st.header("Auto-udfyld Fratrædelsesaftale")
+def _index_text(uploaded_file, role: str):
+    """text_callback adding an uploaded PDF to the full-text index, keyed by its content hash."""
+    sha256 = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+
+    def add(text: str) -> None:
+        try:
+            shared_index().add_text(f"upload:{role}:{sha256}", text, sha256, kind="pdf")
+        except Exception as exc:  # the form works without the index
+            st.caption(f"Søgeindekset kunne ikke opdateres: {exc}")
+
+    return add
+
+
+def _extract(uploaded_file, role: str, extractor) -> Tuple[Dict[str, str], str]:
+    """(fields, raw text) of an upload, read once per file content and kept in the session."""
+    sha256 = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    cache = st.session_state.setdefault(STATE_KEY_EXTRACTED, {})
+    cached = cache.get(role)
+    if cached is not None and cached[0] == sha256:
+        return cached[1], cached[2]
+
+    texts = []
+    index_text = _index_text(uploaded_file, role)
+
+    def keep_text(text: str) -> None:
+        texts.append(text)
+        index_text(text)
+
+    tmp_path = _write_temp_file(uploaded_file)
+    try:
+        fields = dict(extractor(tmp_path, text_callback=keep_text))
+    except ExtractionTimeout as exc:
+        st.warning(TIMEOUT_WARNINGS[role])
+        # Not kept: the next full rerun tries again
+        return dict(exc.partial), "".join(texts)
+    cache[role] = (sha256, fields, "".join(texts))
+    return fields, cache[role][2]
+
+
+def _extract_payslips(uploaded_files) -> List[Payslip]:
+    """Payslips of the uploads in upload order; only files not seen before are read."""
+    cache = st.session_state.setdefault(STATE_KEY_EXTRACTED, {}).setdefault("payslips", {})
+    hashes = [hashlib.sha256(uploaded.getvalue()).hexdigest() for uploaded in uploaded_files]
+    found: Dict[str, Payslip] = {sha256: cache[sha256] for sha256 in hashes if sha256 in cache}
+    new = {sha256: uploaded for sha256, uploaded in zip(hashes, uploaded_files) if sha256 not in found}
+    if new:
+        files = [(uploaded.name, _write_temp_file(uploaded)) for uploaded in new.values()]
+        for (sha256, uploaded), payslip in zip(new.items(), extract_payslips(files)):
+            found[sha256] = payslip
+            if payslip.text:
+                _index_text(uploaded, "payslip")(payslip.text)
+            if payslip.complete:
+                cache[sha256] = payslip
+            else:
+                # Not kept: the next full rerun tries again
+                st.warning(f"{uploaded.name}: {TIMEOUT_WARNINGS['payslip']}")
+    return [found[sha256] for sha256 in hashes]
+
+
+def _show_payslips(payslips: List[Payslip]) -> None:
+    with st.expander(f"Lønsedler ({len(payslips)})"):
+        st.dataframe(
+            [
+                {
+                    "Fil": payslip.name,
+                    "Fra": payslip.fields.get("PeriodFrom", ""),
+                    "Til": payslip.fields.get("PeriodTo", ""),
+                    "Månedsløn": payslip.fields.get("MonthlySalary", ""),
+                    "Bonus": payslip.fields.get("BonusAmount", ""),
+                }
+                for payslip in ordered(payslips)
+            ],
+            hide_index=True,
+        )
+        for change in salary_changes(payslips)[1:]:
+            st.caption(f"Lønændring {change.period or '?'}: {change.previous} → {change.salary} DKK")
+
+
+def _ui_state() -> Dict[str, Any]:
+    """The answers of every section; each fragment updates its own keys."""
+    return st.session_state.setdefault(STATE_KEY_UI, {})
+
+
+def _show_template_requirements(
+    info: TemplateInfo,
+    contract_data: Dict[str, str],
+    payslip_data: Dict[str, str],
+    ui: Dict[str, str],
+) -> None:
+    if info.error:
+        st.error(f"Skabelonen kunne ikke analyseres: {info.error}")
+        return
+    # Only the text fields the template prints need a value; conditionals are flags.
+    text_fields = sorted(info.variables - info.conditionals)
+    context = build_fratradelse_context(contract_data, payslip_data, ui, fields=text_fields)
+    missing = [name for name in text_fields if not context.get(name)]
+    st.caption(f"Skabelonen bruger {len(info.variables)} felter ({len(info.conditionals)} betingelser).")
+    if missing:
+        st.info("Tomme felter i skabelonen: " + ", ".join(missing))
+
+
+def _show_preview(
+    info: TemplateInfo,
+    contract_data: Dict[str, str],
+    payslip_data: Dict[str, str],
+    ui: Dict[str, str],
+) -> None:
+    # Sections are cached per template by the values they use, so a rerun after
+    # one field change only re-renders the sections that reference that field.
+    context = build_fratradelse_context(contract_data, payslip_data, ui, fields=info.variables)
+    result = load_preview(info.path).render(context)
+    st.caption(
+        f"Forhåndsvisning opdateret på {result.milliseconds:.1f} ms "
+        f"({result.rendered} af {result.sections} afsnit gengivet)"
+    )
+    with st.container(height=600):
+        st.html(result.html)
 
-    show_debug = st.checkbox("Vis rå PDF-tekst (debug)", value=False)
-    contract_debug_cb = None
-    payslip_debug_cb = None
-    if show_debug:
-        contract_expander = st.expander("Kontrakt: rå tekst")
-        payslip_expander = st.expander("Lønseddel: rå tekst")
-        contract_debug_cb = lambda text: contract_expander.text(text)
-        payslip_debug_cb = lambda text: payslip_expander.text(text)
 
-    col_contract, col_payslip = st.columns(2)
-    with col_contract:
-        contract_file = st.file_uploader(
-            "Upload ansættelseskontrakt (PDF)",
-            type=["pdf"],
-            key="contract_file",
-        )
-    with col_payslip:
-        payslip_file = st.file_uploader(
-            "Upload lønseddel (PDF)",
-            type=["pdf"],
-            key="payslip_file",
-        )
+def _template_status(info: TemplateInfo, contract_data: Dict[str, str], payslip_data: Dict[str, str]) -> None:
+    ui = dict(_ui_state())
+    _show_template_requirements(info, contract_data, payslip_data, ui)
+    if info.suffix == ".md" and not info.error and st.session_state.get(STATE_KEY_PREVIEW):
+        _show_preview(info, contract_data, payslip_data, ui)
 
-    contract_data: Dict[str, str] = {}
-    payslip_data: Dict[str, str] = {}
 
-    if contract_file is not None:
-        tmp_path = _write_temp_file(contract_file)
-        contract_data.update(extract_from_contract(tmp_path, debug_callback=contract_debug_cb))
+def _status_changed(before: Dict[str, Any]) -> bool:
+    """Whether the answers changed since ``before`` in a way the template checks or preview show."""
+    info = template_registry.get(Path(st.session_state.get(STATE_KEY_TEMPLATE) or DEFAULT_TEMPLATE))
+    if info is None or info.error:
+        return False
+    contract_data, payslip_data = st.session_state.get(STATE_KEY_INPUTS, ({}, {}))
+    old = build_fratradelse_context(contract_data, payslip_data, before, fields=info.variables)
+    new = build_fratradelse_context(contract_data, payslip_data, _ui_state(), fields=info.variables)
+    if info.suffix == ".md" and st.session_state.get(STATE_KEY_PREVIEW):
+        return old != new
+    text_fields = info.variables - info.conditionals
+    return {name for name in text_fields if not old.get(name)} != {name for name in text_fields if not new.get(name)}
 
-    if payslip_file is not None:
-        tmp_path = _write_temp_file(payslip_file)
-        payslip_data.update(extract_from_payslip(tmp_path, debug_callback=payslip_debug_cb))
 
-    defaults = {**contract_data, **payslip_data}
+def _section(render_section):
+    """``st.fragment`` that reruns the whole form only when the template checks would change."""
 
-    st.subheader("Ret/tilføj oplysninger")
-    ui = {}
+    @st.fragment
+    @functools.wraps(render_section)
+    def run(*args) -> None:
+        before = dict(_ui_state())
+        render_section(*args)
+        if not st.session_state.get(STATE_KEY_FULL_RUN) and _status_changed(before):
+            st.rerun(scope="app")
+
+    return run
 
+
+@_section
+def _company_section(defaults: Dict[str, str]) -> None:
+    ui = _ui_state()
     st.write("**Virksomhedsoplysninger**")
     ui["C_Name"] = st.text_input("Arbejdsgiver", defaults.get("C_Name", ""))
     ui["C_Address"] = st.text_input("Arbejdsgiver adresse", defaults.get("C_Address", ""))
@@ -71,6 +223,10 @@ def render() -> None:
     ui["P_Address"] = st.text_input("Medarbejder adresse", defaults.get("P_Address", ""))
     ui["MonthlySalary"] = st.text_input("Månedsløn (DKK)", defaults.get("MonthlySalary", ""))
 
+
+@_section
+def _dates_section(defaults: Dict[str, str]) -> None:
+    ui = _ui_state()
     st.write("**Datoer**")
     ui["EmploymentStart"] = st.text_input("Ansættelsesstart", defaults.get("EmploymentStart", ""))
     ui["ContractSignedDate"] = st.text_input("Kontraktunderskrivelsesdato", "")
@@ -79,6 +235,10 @@ def render() -> None:
     ui["ReleaseDate"] = st.text_input("Fritstillingsdato", "")
     ui["AcceptanceDeadline"] = st.text_input("Acceptfrist (fx 15. januar 2025)", "")
 
+
+@_section
+def _holiday_section() -> None:
+    ui = _ui_state()
     st.write("**Ferie**")
     ui["HolidayLeave"] = st.checkbox("Ferie afvikles automatisk i fritstillingsperiode?", value=False)
     if not ui["HolidayLeave"]:
@@ -86,6 +246,10 @@ def render() -> None:
     else:
         ui["NoHolidayDays"] = ""
 
+
+@_section
+def _benefits_section() -> None:
+    ui = _ui_state()
     st.write("**Løn og fordele**")
     ui["noOffset"] = st.checkbox("Ingen modregning af løn fra anden ansættelse?", value=False)
     ui["HealthInsuranceIncluded"] = st.checkbox("Behold sundhedsforsikring?", value=False)
@@ -99,6 +263,10 @@ def render() -> None:
 
     ui["LunchSchemeIncluded"] = st.checkbox("Med i frokostordning indtil fritstilling?", value=False)
 
+
+@_section
+def _phone_section() -> None:
+    ui = _ui_state()
     st.write("**Mobiltelefon**")
     ui["MobileCompIncluded"] = st.checkbox("Mobiltelefon med?", value=False)
     if ui["MobileCompIncluded"]:
@@ -110,6 +278,10 @@ def render() -> None:
         ui["PhoneNumber"] = ""
         ui["ManagerName"] = ""
 
+
+@_section
+def _compensation_section() -> None:
+    ui = _ui_state()
     st.write("**Anciennitet og funktionærlovens § 2a**")
     ui["years_12"] = st.checkbox("12+ års anciennitet?", value=False)
     ui["years_17"] = st.checkbox("17+ års anciennitet?", value=False)
@@ -123,6 +295,10 @@ def render() -> None:
     else:
         ui["fixedCompensationNumber"] = ""
 
+
+@_section
+def _bonus_section(defaults: Dict[str, str]) -> None:
+    ui = _ui_state()
     st.write("**Bonus (STI)**")
     bonus_type = st.radio("Bonustype", ["Ingen bonus", "Bonus1 - Programbaseret", "Bonus2 - Fast aftalt beløb"])
     ui["Bonus1"] = bonus_type == "Bonus1 - Programbaseret"
@@ -154,6 +330,10 @@ def render() -> None:
     else:
         ui["LTIRights"] = False
 
+
+@_section
+def _legal_section() -> None:
+    ui = _ui_state()
     st.write("**Juridisk bistand og andre forhold**")
     ui["noAssistance"] = st.checkbox("Medarbejderen er kun opfordret til (ikke bistået af) juridisk rådgiver?", value=False)
     if not ui["noAssistance"]:
@@ -170,11 +350,12 @@ def render() -> None:
 
     ui["Tax"] = st.checkbox("Skatteforhold (§ 7 U) skal medtages?", value=False)
 
+
+@st.fragment
+def _template_section(contract_data: Dict[str, str], payslip_data: Dict[str, str]) -> None:
     # Support both .docx and .md templates
-    docx_templates = sorted(Path("templates").glob("*.docx"))
-    md_templates = sorted(Path("templates").glob("*.md"))
-    templates = docx_templates + md_templates
-    template_paths = [str(path) for path in templates]
+    templates = template_registry.templates((".docx", ".md"))
+    template_paths = [str(info.path) for info in templates]
 
     if STATE_KEY_TEMPLATE not in st.session_state:
         st.session_state[STATE_KEY_TEMPLATE] = template_paths[0] if template_paths else ""
@@ -188,27 +369,92 @@ def render() -> None:
         key=STATE_KEY_TEMPLATE,
     )
 
+    template_info = template_registry.get(Path(selected_template or DEFAULT_TEMPLATE))
+    if template_info is not None:
+        if template_info.suffix == ".md" and not template_info.error:
+            st.toggle("Vis live forhåndsvisning", key=STATE_KEY_PREVIEW)
+        _template_status(template_info, contract_data, payslip_data)
+
     if st.button("Generér Fratrædelsesaftale"):
         template_path = Path(selected_template or DEFAULT_TEMPLATE)
-        if not template_path.exists():
+        if template_info is None or not template_path.exists():
             st.error(f"Skabelon ikke fundet: {template_path}")
             return
 
-        context = build_fratradelse_context(contract_data, payslip_data, ui)
+        ui = dict(_ui_state())
+        context = build_fratradelse_context(contract_data, payslip_data, ui, fields=template_info.variables)
 
-        # Determine output format based on template extension
-        if template_path.suffix == ".md":
-            buffer = render_markdown_to_docx(template_path, context)
-            filename = f"Fratraedelsesaftale_{safe_slug(context.get('P_Name'))}.docx"
-            mime_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        else:  # .docx
-            buffer = render_docx(template_path, context)
-            filename = f"Fratraedelsesaftale_{safe_slug(context.get('P_Name'))}.docx"
-            mime_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        # .docx and .md templates both produce a .docx; identical inputs come from the render cache
+        document = render_document(template_path, context)
+        # The name whether or not the template prints it
+        person = build_fratradelse_context(contract_data, payslip_data, ui, fields=["P_Name"]).get("P_Name")
+        filename = f"Fratraedelsesaftale_{safe_slug(person)}.docx"
+        mime_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
         st.download_button(
             "Download aftale",
-            buffer,
+            document,
             file_name=filename,
             mime=mime_type,
         )
+
+
+def render() -> None:
+    st.session_state[STATE_KEY_FULL_RUN] = True
+    st.header("Auto-udfyld Fratrædelsesaftale")
+
+    show_debug = st.checkbox("Vis rå PDF-tekst (debug)", value=False)
+
+    col_contract, col_payslip = st.columns(2)
+    with col_contract:
+        contract_file = st.file_uploader(
+            "Upload ansættelseskontrakt (PDF)",
+            type=["pdf"],
+            key="contract_file",
+        )
+    with col_payslip:
+        payslip_files = st.file_uploader(
+            "Upload lønsedler (PDF, gerne flere måneder)",
+            type=["pdf"],
+            accept_multiple_files=True,
+            key="payslip_files",
+        )
+
+    contract_data: Dict[str, str] = {}
+    payslip_data: Dict[str, str] = {}
+    contract_text: Optional[str] = None
+    payslip_text: Optional[str] = None
+
+    if contract_file is not None:
+        fields, contract_text = _extract(contract_file, "contract", extract_from_contract)
+        contract_data.update(fields)
+
+    if payslip_files:
+        payslips = _extract_payslips(payslip_files)
+        payslip_data.update(combine(payslips))
+        payslip_text = "\n\n".join(f"--- {payslip.name} ---\n{payslip.text}" for payslip in ordered(payslips))
+        if len(payslips) > 1:
+            _show_payslips(payslips)
+
+    if show_debug:
+        with st.expander("Kontrakt: rå tekst"):
+            if contract_text:
+                st.text(contract_text[:20000])
+        with st.expander("Lønseddel: rå tekst"):
+            if payslip_text:
+                st.text(payslip_text[:20000])
+
+    defaults = {**contract_data, **payslip_data}
+    st.session_state[STATE_KEY_INPUTS] = (contract_data, payslip_data)
+
+    st.subheader("Ret/tilføj oplysninger")
+    _company_section(defaults)
+    _dates_section(defaults)
+    _holiday_section()
+    _benefits_section()
+    _phone_section()
+    _compensation_section()
+    _bonus_section(defaults)
+    _legal_section()
+    _template_section(contract_data, payslip_data)
+    st.session_state[STATE_KEY_FULL_RUN] = False
@@ -4,8 +4,9 @@ from typing import Dict
 
 import streamlit as st
 
-from core.extractors import extract_from_contract
-from core.rendering import render_docx
+from core.extractors import ExtractionTimeout, extract_from_contract
+from core.rendering import render_document
+from core.template_registry import registry as template_registry
 from core.utils import safe_slug, format_date_long
 
 DEFAULT_TEMPLATE = Path("templates/Updated Memo - Termination.docx")
@@ -30,7 +31,11 @@ def render() -> None:
     contract_data: Dict[str, str] = {}
     if contract_file is not None:
         tmp_path = _write_temp_file(contract_file)
-        contract_data.update(extract_from_contract(tmp_path))
+        try:
+            contract_data.update(extract_from_contract(tmp_path))
+        except ExtractionTimeout as exc:
+            contract_data.update(exc.partial)
+            st.warning("Kontrakten tog for lang tid at læse; kun nogle felter er udfyldt.")
 
     st.subheader("Memo oplysninger")
     col_left, col_right = st.columns(2)
@@ -72,8 +77,8 @@ def render() -> None:
         "Preliminary_Decision_Date": preliminary_decision_date,
     }
 
-    templates = sorted(Path("templates").glob("*.docx"))
-    template_paths = [str(path) for path in templates]
+    templates = template_registry.templates((".docx",))
+    template_paths = [str(info.path) for info in templates]
 
     if STATE_KEY_TEMPLATE not in st.session_state:
         st.session_state[STATE_KEY_TEMPLATE] = template_paths[0] if template_paths else ""
@@ -87,16 +92,27 @@ def render() -> None:
         key=STATE_KEY_TEMPLATE,
     )
 
+    template_info = template_registry.get(Path(selected_template or DEFAULT_TEMPLATE))
+    if template_info is not None and not template_info.error:
+        missing = sorted(
+            name for name in template_info.variables - template_info.conditionals if not context.get(name)
+        )
+        if missing:
+            st.info("Tomme felter i skabelonen: " + ", ".join(missing))
+
     if st.button("Generér termination memo"):
         template_path = Path(selected_template or DEFAULT_TEMPLATE)
-        if not template_path.exists():
+        if template_info is None or not template_path.exists():
             st.error(f"Skabelon ikke fundet: {template_path}")
             return
-        buffer = render_docx(template_path, context)
-        filename = f"TerminationMemo_{safe_slug(context.get('P_Name'))}.docx"
+        # Only the fields the template uses go into the render (and its cache key)
+        document = render_document(
+            template_path, {name: value for name, value in context.items() if name in template_info.variables}
+        )
+        filename = f"TerminationMemo_{safe_slug(p_name)}.docx"
         st.download_button(
             "Download memo",
-            buffer,
+            document,
             file_name=filename,
             mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
         )